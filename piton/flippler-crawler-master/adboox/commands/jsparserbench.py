@@ -0,0 +1,98 @@
+"""
+Benchmark of parse_variables against the pyparsing grammar it replaced.
+ Payloads are files (script bodies or `var x = ...;` statements saved from
+ responses); without files, payloads shaped like the Lidl store search
+ and the Rewe market list are generated. Fails if the parsers disagree
+ or the speedup falls below --min-speedup.
+"""
+import json
+import time
+import random
+from scrapy.commands import ScrapyCommand
+from adboox.utils.js_parser import parse_variables, parse_variables_pyparsing
+
+
+def lidl_payload(stores=250, seed=0):
+    rnd = random.Random(seed)
+    results = [{
+        '__metadata': {'uri': 'https://spatial.virtualearth.net/REST/v1/data/Filialdaten-SEC({})'.format(n)},
+        'EntityID': 'DE{:05d}'.format(n),
+        'AR': n % 7,
+        'ShownStoreName': 'Lidl München {}'.format(n),
+        'AddressLine': 'Hauptstraße {}'.format(n),
+        'PostalCode': '{:05d}'.format(rnd.randint(1067, 99998)),
+        'Locality': 'Köln',
+        'Latitude': round(rnd.uniform(47.3, 55.0), 6),
+        'Longitude': round(rnd.uniform(5.9, 15.0), 6),
+        'OpeningTimes': 'Mo 08:00-21:00 Di 08:00-21:00 Mi 08:00-21:00 Do 08:00-21:00 Fr 08:00-21:00 Sa 08:00-20:00',
+        'Adresstyp': 1,
+    } for n in range(stores)]
+    # the Bing data source escapes non-ASCII characters
+    return 'var cb_data = {};'.format(json.dumps({'d': {'__copyright': 'Microsoft', 'results': results}}))
+
+
+def rewe_payload(markets=3000, seed=0):
+    rnd = random.Random(seed)
+    markets = [{
+        'id': str(4040000 + n),
+        'city': 'Stadt {}'.format(n),
+        'content': '<strong>REWE Markt</strong><br/>Marktstra\\u00dfe {}<br/>{:05d} Stadt {}'.format(
+            n, rnd.randint(1067, 99998), n),
+        'lat': '{:.6f}'.format(rnd.uniform(47.3, 55.0)),
+        'lon': '{:.6f}'.format(rnd.uniform(5.9, 15.0)),
+    } for n in range(markets)]
+    return '/* map data */\nvar gmapsTempData = {}, gmapsZoom = 6;\nvar gmapsCenter = [51.1, 10.4];'.format(
+        json.dumps(markets))
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options] [payload file ...]'
+
+    def short_desc(self):
+        return 'Benchmark the javascript literal parser against the pyparsing grammar'
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('--runs', type=int, default=3, help='runs per parser, the fastest counts (default: 3)')
+        parser.add_argument('--min-speedup', type=float, default=5.0,
+                            help='fail if the parser is not this many times faster (default: 5)')
+
+    def timed(self, func, text, runs):
+        best, result = None, None
+        for _ in range(max(runs, 1)):
+            started = time.perf_counter()
+            result = func(text)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def run(self, args, opts):
+        payloads = []
+        for path in args:
+            with open(path, encoding='utf-8') as f:
+                payloads.append((path, f.read()))
+        if not payloads:
+            payloads = [('lidl (generated)', lidl_payload()), ('rewe (generated)', rewe_payload())]
+
+        failures = 0
+        for name, text in payloads:
+            old_time, old = self.timed(parse_variables_pyparsing, text, opts.runs)
+            # the parser itself, not the parse cache
+            new_time, new = self.timed(parse_variables.__wrapped__, text, opts.runs)
+            speedup = old_time / new_time if new_time else float('inf')
+            problems = []
+            if old != new:
+                problems.append('results differ')
+            if speedup < opts.min_speedup:
+                problems.append('speedup below {}'.format(opts.min_speedup))
+            failures += bool(problems)
+            print('{:<24} {:>9} chars  pyparsing {:8.1f} ms  parser {:7.1f} ms  {:6.1f}x  {}'.format(
+                name, len(text), old_time * 1000, new_time * 1000, speedup, '; '.join(problems) or 'ok'))
+
+        if failures:
+            self.exitcode = 1
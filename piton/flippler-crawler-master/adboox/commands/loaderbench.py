@@ -0,0 +1,93 @@
+"""
+Benchmark of the StoreLoader input processor against the MapCompose chain
+ it replaced. Values are the text nodes and elements of HTML files (store
+ pages saved from responses); without files, store lists shaped like the
+ Hit and Norma pages are generated. Fails if the processors disagree on
+ any value or the speedup falls below --min-speedup.
+"""
+import time
+import random
+from w3lib import html
+from parsel import Selector
+from itemloaders.processors import MapCompose
+from scrapy.commands import ScrapyCommand
+from adboox.items import StoreLoader, replace_br, replace_escape, strip, clean_spaces
+
+CHAIN = MapCompose(replace_br, html.remove_tags, html.unquote_markup, replace_escape, strip, clean_spaces)
+
+
+def stores_html(stores=2000, seed=0):
+    rnd = random.Random(seed)
+    items = []
+    for n in range(stores):
+        items.append(
+            '<li class="item" data-uid="{uid}" data-lat="{lat:.6f}" data-lng="{lng:.6f}">\n'
+            '  <div class="store-information"><ul>\n'
+            '    <li class="name">\n      HIT Markt {n}\n    </li>\n'
+            '    <li>Stra&szlig;e des {n}. Juni&nbsp;{no}<br/>\n    </li>\n'
+            '    <li class="market-position">{zip:05d}&#32;M&uuml;nchen</li>\n'
+            '    <li>Tel.: 089 / {phone}<br>Fax: 089 / {phone}-9</li>\n'
+            '    <li>Mo.-Sa.:\t07:00 - 22:00 Uhr</li>\n'
+            '  </ul></div>\n'
+            '  <a href="/maerkte/{uid}/">Details</a>\n'
+            '</li>'.format(uid=1000 + n, n=n, no=rnd.randint(1, 200), zip=rnd.randint(1067, 99998),
+                           phone=rnd.randint(100000, 999999), lat=rnd.uniform(47.3, 55.0),
+                           lng=rnd.uniform(5.9, 15.0)))
+    return '<html><body><ul class="stores">\n{}\n</ul></body></html>'.format('\n'.join(items))
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options] [html file ...]'
+
+    def short_desc(self):
+        return 'Benchmark the StoreLoader input processor against the MapCompose chain'
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('--runs', type=int, default=3, help='runs per processor, the fastest counts (default: 3)')
+        parser.add_argument('--min-speedup', type=float, default=2.0,
+                            help='fail if the processor is not this many times faster (default: 2)')
+
+    def timed(self, proc, values, runs):
+        best, result = None, None
+        for _ in range(max(runs, 1)):
+            started = time.perf_counter()
+            # one value per call, like add_xpath of a single node
+            result = [proc(v) for v in values]
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def run(self, args, opts):
+        pages = []
+        for path in args:
+            with open(path, encoding='utf-8') as f:
+                pages.append((path, f.read()))
+        if not pages:
+            pages = [('stores (generated)', stores_html())]
+
+        proc = StoreLoader.default_input_processor
+        failures = 0
+        for name, text in pages:
+            sel = Selector(text=text)
+            values = sel.xpath('//text()').getall() + sel.xpath('//li').getall()
+            old_time, old = self.timed(CHAIN, values, opts.runs)
+            new_time, new = self.timed(proc, values, opts.runs)
+            speedup = old_time / new_time if new_time else float('inf')
+            problems = []
+            differ = sum(a != b for a, b in zip(old, new))
+            if differ:
+                problems.append('{} values differ'.format(differ))
+            if speedup < opts.min_speedup:
+                problems.append('speedup below {}'.format(opts.min_speedup))
+            failures += bool(problems)
+            print('{:<24} {:>7} values  MapCompose {:7.1f} ms  processor {:6.1f} ms  {:5.1f}x  {}'.format(
+                name, len(values), old_time * 1000, new_time * 1000, speedup, '; '.join(problems) or 'ok'))
+
+        if failures:
+            self.exitcode = 1
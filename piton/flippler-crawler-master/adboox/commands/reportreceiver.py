@@ -0,0 +1,116 @@
+"""
+Stand-in for the notification url receiving crawl reports, for local runs
+ and tests. It accepts plain JSON reports and chunked reports (see
+ adboox.utils.report), writes every complete report to <dir>/<id>.json
+ and prints a line per report.
+"""
+import os
+import gzip
+import json
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scrapy.commands import ScrapyCommand
+from adboox.utils.report import report_summary
+
+
+class ReportStore(object):
+    """
+    Chunks of the reports being received and the directory of the
+     complete reports
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.chunks = {}
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def add_chunk(self, report_id, sequence, body):
+        with self.lock:
+            self.chunks.setdefault(report_id, {})[sequence] = body
+
+    def commit(self, commit):
+        """
+        Returns the report of the commit message, or raises ValueError if
+         chunks are missing or corrupted
+        """
+        report_id = commit['ReportId']
+        with self.lock:
+            chunks = self.chunks.pop(report_id, {})
+        if sorted(chunks) != list(range(commit['Chunks'])):
+            raise ValueError('Report {} has chunks {} of {}'.format(report_id, sorted(chunks), commit['Chunks']))
+        stream = b''.join(chunks[n] for n in range(commit['Chunks']))
+        if len(stream) != commit['Size'] or hashlib.sha1(stream).hexdigest() != commit['Sha1']:
+            raise ValueError('Report {} does not match its size or digest'.format(report_id))
+        return json.loads(gzip.decompress(stream).decode('utf-8'))
+
+    def save(self, report_id, report):
+        with self.lock:
+            self.count += 1
+            report_id = report_id or 'report-{}'.format(self.count)
+        path = os.path.join(self.directory, '{}.json'.format(report_id))
+        with open(path, 'w') as f:
+            json.dump(report, f)
+        print('{} {}'.format(path, report_summary(report)), flush=True)
+
+
+class ReportHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, message=''):
+        body = message.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        report_id = self.headers.get('X-Report-Id')
+        try:
+            if report_id is None:
+                self.store.save(None, json.loads(body.decode('utf-8')))
+            elif self.headers.get('X-Report-Commit'):
+                commit = json.loads(body.decode('utf-8'))
+                self.store.save(report_id, self.store.commit(commit))
+            else:
+                self.store.add_chunk(report_id, int(self.headers['X-Report-Sequence']), body)
+        except (KeyError, ValueError, OSError) as e:
+            print('Rejected report {}: {}'.format(report_id, e), flush=True)
+            return self.reply(400, str(e))
+        self.reply(200)
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options]'
+
+    def short_desc(self):
+        return 'Receive crawl reports locally, in place of the notification url'
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('--host', default='127.0.0.1', help='address to listen on (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8099, help='port to listen on (default: 8099)')
+        parser.add_argument('--dir', default='reports', help='directory of the received reports (default: reports)')
+
+    def run(self, args, opts):
+        if not os.path.isdir(opts.dir):
+            os.makedirs(opts.dir)
+        handler = type('Handler', (ReportHandler,), {'store': ReportStore(opts.dir)})
+        server = ThreadingHTTPServer((opts.host, opts.port), handler)
+        print('Receiving reports on http://{}:{}/, saving them to {}'.format(opts.host, opts.port, opts.dir), flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,21 @@
+from scrapy.commands import ScrapyCommand
+from adboox.spiderloader import build_manifest, write_manifest, manifest_file
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+    default_settings = {'LOG_ENABLED': False}
+
+    def short_desc(self):
+        return 'Generate the spider manifest used by LazySpiderLoader'
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('-o', '--output', metavar='FILE', default=None,
+                            help='write the manifest to FILE (default: {})'.format(manifest_file()))
+
+    def run(self, args, opts):
+        manifest = build_manifest(self.settings.getlist('SPIDER_MODULES'))
+        write_manifest(manifest, opts.output)
+        print('Wrote {} spiders to {}'.format(len(manifest['spiders']), opts.output or manifest_file()))
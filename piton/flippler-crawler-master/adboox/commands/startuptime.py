@@ -0,0 +1,76 @@
+"""
+Benchmark of the startup cost of crawl jobs. Every spider is loaded in a
+ fresh interpreter, the way scrapyd starts a job; the command fails if
+ loading takes longer than STARTUP_TIME_BUDGET_MS or imports the modules
+ of spiders other than the loaded one and its base classes.
+"""
+import sys
+import json
+import subprocess
+from scrapy.commands import ScrapyCommand
+from scrapy.spiderloader import get_spider_loader
+
+PROBE = '''
+import sys, json, time
+started = time.perf_counter()
+from scrapy.utils.project import get_project_settings
+from scrapy.spiderloader import get_spider_loader
+loader = get_spider_loader(get_project_settings())
+loader.list()
+loader.load(sys.argv[1])
+print(json.dumps({
+    'ms': (time.perf_counter() - started) * 1000.0,
+    'modules': sorted(m for m in sys.modules if m.startswith(tuple(sys.argv[2:]))),
+}))
+'''
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    requires_crawler_process = False
+    default_settings = {'LOG_ENABLED': False}
+
+    def syntax(self):
+        return '[options] [spider ...]'
+
+    def short_desc(self):
+        return 'Measure the time a job takes to load its spider'
+
+    def add_options(self, parser):
+        super(Command, self).add_options(parser)
+        parser.add_argument('--runs', type=int, default=3,
+                            help='measurements per spider, the fastest counts (default: 3)')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='maximum load time (default: STARTUP_TIME_BUDGET_MS)')
+
+    def probe(self, spider_name, packages):
+        out = subprocess.check_output([sys.executable, '-c', PROBE, spider_name] + packages)
+        return json.loads(out.decode('utf-8').strip().splitlines()[-1])
+
+    def run(self, args, opts):
+        budget = opts.budget_ms or self.settings.getfloat('STARTUP_TIME_BUDGET_MS')
+        packages = [p + '.' for p in self.settings.getlist('SPIDER_MODULES')]
+        loader = get_spider_loader(self.settings)
+        names = args or sorted(loader.list())
+        spider_modules = {loader.load(name).__module__ for name in names}
+        if hasattr(loader, 'manifest') and loader.manifest:
+            spider_modules = {entry['module'] for entry in loader.manifest['spiders'].values()}
+
+        failures = 0
+        for name in names:
+            results = [self.probe(name, packages) for _ in range(max(opts.runs, 1))]
+            ms = min(r['ms'] for r in results)
+            # spiders may extend the spiders of other modules
+            needed = {cls.__module__ for cls in loader.load(name).__mro__}
+            others = sorted(set(results[0]['modules']) & spider_modules - needed)
+            problems = []
+            if budget and ms > budget:
+                problems.append('over budget of {:.0f} ms'.format(budget))
+            if others:
+                problems.append('imports {}'.format(', '.join(others)))
+            failures += bool(problems)
+            print('{:<16} {:8.1f} ms  {}'.format(name, ms, '; '.join(problems) or 'ok'))
+
+        if failures:
+            print('{} of {} spiders failed'.format(failures, len(names)))
+            self.exitcode = 1
@@ -0,0 +1,30 @@
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from adboox.utils.memo import configure_parse_cache, reset_parse_cache
+
+
+class ParseCacheExtension(object):
+    """
+    Configures the parse cache (adboox.utils.memo) from the PARSE_CACHE_*
+     settings of the crawler, so command line settings (-s) and the
+     settings of every crawler apply. Hits and misses are put into the
+     stats when the spider closes.
+    """
+
+    def __init__(self, crawler):
+        self.stats = crawler.stats
+        self.cache = configure_parse_cache(crawler.settings)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('PARSE_CACHE_ENABLED'):
+            reset_parse_cache()
+            raise NotConfigured
+        ext = cls(crawler)
+        crawler.signals.connect(ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def spider_closed(self, spider):
+        self.stats.set_value('parse_cache/hits', self.cache.hits)
+        self.stats.set_value('parse_cache/misses', self.cache.misses)
+        reset_parse_cache()
@@ -1,4 +1,12 @@
+import logging
+import numpy as np
+from math import sqrt, degrees, radians, cos
+from adboox.geolib.tools import EARTH_RADIUS_KM
 from adboox.geolib.tools.geocircle import GeoCircle
+from adboox.geolib.tools.geopoint import GeoPoint
+from adboox.geolib.tools.sweepcell import SweepCell
+
+logger = logging.getLogger(__name__)
 
 
 class GeoCircleWithMeta(GeoCircle):
@@ -6,12 +14,42 @@ class GeoCircleWithMeta(GeoCircle):
     Geocircle with additional attribute meta (default = None).
     You can store whatever you want there
     """
+    __slots__ = ('meta',)
 
     def __init__(self, lat, lng, radius, meta=None):
         super(GeoCircleWithMeta, self).__init__(lat, lng, radius)
         self.meta = meta
 
 
+def cap_radius(circle, max_radius):
+    """
+    Returns the circle with its radius shrunk to max_radius (if given).
+     Endpoints with a fixed search radius do not cover any more than
+     that, so the uncovered gap is logged.
+    """
+    if max_radius is None or circle.radius <= max_radius:
+        return circle
+
+    logger.warning('Query location %s, %s needs radius %.1f km, but the endpoint covers only %.1f km',
+                   circle.lat, circle.lng, circle.radius, max_radius)
+    return GeoCircleWithMeta(circle.lat, circle.lng, max_radius, circle.meta)
+
+
+def move_into(circle, border, quad_map, quad_index, max_radius=None):
+    """
+    Moves the circle to the closest point of the border (a PreparedPolygon).
+     The radius of the new circle is chosen to contain every filled part
+     of the map (a GeoCoverageRaster) within the original circle, but is
+     not larger than max_radius (see cap_radius). Meta is taken from the
+     indexed point closest to the new centre.
+    """
+    p = GeoPoint(*border.nearest_boundary_point(circle.lat, circle.lng))
+    radius = quad_map.covering_radius(p, circle)
+    match = quad_index.search(p)
+    moved = GeoCircleWithMeta(p.lat, p.lng, radius, match.meta if match is not None else None)
+    return cap_radius(moved, max_radius)
+
+
 class LocationIterator(object):
     """
     Iterator yielding locations, iterating through the
@@ -36,7 +74,136 @@ class LocationIterator(object):
                 circle = circle.step(self.radius / 10.0, 0)
 
             if circle.lat > self.quad_tree.p2.lat:
-                circle.lat = self.quad_tree.p1.lat
+                circle = GeoCircleWithMeta(self.quad_tree.p1.lat, circle.lng, circle.radius)
                 circle = circle.step(0, self.radius)
             if circle.lng > self.quad_tree.p2.lng:
                 break
+
+
+class CoveringLocationIterator(object):
+    """
+    Iterator yielding a small set of circles that together cover every
+     filled part of the quad map of some territory.
+
+    Centres are laid out on a hexagonal lattice, which is the cheapest
+     way to cover a plane with equal circles (about 2.6 times fewer
+     circles than a square grid with the same radius). Lattice points
+     whose circle does not touch the filled map are skipped.
+
+    When snap_km is given, the lattice is built for radius - snap_km and
+     every centre is moved to the closest indexed point (usually a
+     zipcode). If that point is farther than snap_km, the radius grows by
+     the excess, so the circle still contains its lattice circle. This
+     lets endpoints that are queried by zipcode use the planner too.
+     Centres without any indexed point are skipped.
+
+    max_radius is the largest radius the endpoint actually searches
+     within. Circles are never grown beyond it (see cap_radius).
+
+    When border (a PreparedPolygon) is given, centres left outside of it
+     are moved to the closest point of the border, and their radius is
+     changed to still cover the filled map within the original circle,
+     so no query is issued outside the territory and the coverage stays
+     the same.
+    """
+
+    # The lattice is computed in km around every row's latitude. The scale
+    # of longitude slightly changes between neighbouring rows, so the
+    # lattice radius is shrunk a little to keep the circles overlapping.
+    lattice_shrink = 0.95
+
+    def __init__(self, quad_tree, quad_index, radius, snap_km=0, border=None, max_radius=None):
+        if radius <= snap_km:
+            raise ValueError('radius must be greater than snap_km')
+
+        self.radius = radius
+        self.snap_km = snap_km
+        self.max_radius = max_radius
+        self.quad_tree = quad_tree
+        self.quad_index = quad_index
+        self.border = border
+
+    def lattice(self):
+        """
+        Returns arrays of latitudes and longitudes of the lattice points
+         spanning the quad map
+        """
+        cell = (self.radius - self.snap_km) * self.lattice_shrink
+        row_step = degrees(1.5 * cell / EARTH_RADIUS_KM)
+        col_step_km = sqrt(3) * cell
+
+        p1, p2 = self.quad_tree.p1, self.quad_tree.p2
+        row_lats = np.arange(p1.lat, p2.lat + degrees(cell / EARTH_RADIUS_KM) + row_step, row_step)
+        lats, lngs = [], []
+        for n, lat in enumerate(row_lats):
+            col_step = degrees(col_step_km / EARTH_RADIUS_KM / cos(radians(lat)))
+            # every odd row is shifted by half of the column step
+            start = p1.lng + (col_step / 2.0 if n % 2 else 0)
+            row_lngs = np.arange(start, p2.lng + col_step, col_step)
+            lats.append(np.full(len(row_lngs), lat))
+            lngs.append(row_lngs)
+        return np.concatenate(lats), np.concatenate(lngs)
+
+    def centres(self):
+        """
+        Returns arrays of latitudes and longitudes of the lattice points
+         whose circle touches the filled map
+        """
+        lats, lngs = self.lattice()
+        covered = self.quad_tree.filled_within_circles(lats, lngs, self.radius)
+        return lats[covered], lngs[covered]
+
+    def __iter__(self):
+        seen = set()
+        for lat, lng in zip(*self.centres()):
+            circle = GeoCircleWithMeta(float(lat), float(lng), self.radius)
+            match = self.quad_index.search(circle)
+            if self.snap_km:
+                if match is None:
+                    logger.warning('No zipcode to query the location %s, %s from', circle.lat, circle.lng)
+                    continue
+                radius = max(self.radius, self.radius - self.snap_km + circle.distance(match))
+                circle = cap_radius(GeoCircleWithMeta(match.lat, match.lng, radius, match.meta),
+                                    self.max_radius)
+            elif match is not None:
+                circle.meta = match.meta
+                if self.border is not None and not self.border.contains_point(circle):
+                    circle = move_into(circle, self.border, self.quad_tree, self.quad_index,
+                                       self.max_radius)
+
+            key = (circle.lat, circle.lng)
+            if key in seen:
+                continue
+
+            seen.add(key)
+            yield circle
+
+
+class SweepCellIterator(object):
+    """
+    Iterator yielding the coarsest quad cells of some territory, whose
+     circumcircle is not larger than radius and touches the filled
+     parts of the quad map. Those cells are the starting points of an
+     adaptive sweep.
+    """
+
+    def __init__(self, quad_tree, radius, max_level, territory=None):
+        self.radius = radius
+        self.max_level = max_level
+        self.quad_tree = quad_tree
+        self.territory = territory
+
+    def __iter__(self):
+        root = SweepCell(self.quad_tree.p1, self.quad_tree.p2,
+                         self.max_level, territory=self.territory)
+        cells = [root]
+        while cells:
+            cell = cells.pop()
+            circle = cell.query_circle()
+            if not self.quad_tree.filled_within(circle):
+                continue
+
+            if circle.radius <= self.radius or cell.level >= self.max_level:
+                yield cell
+            else:
+                cells.extend(reversed(cell.split()))
@@ -0,0 +1,237 @@
+"""
+Contains geocoding of German zipcodes in both directions:
+ zipcode to centroid and bounding box, and location to closest zipcode.
+"""
+import numpy as np
+from math import floor, sqrt
+from adboox.geolib.locations.germany import GermanyInfoCache
+from adboox.geolib.tools import distance, EARTH_RADIUS_KM
+from adboox.geolib.tools.area import Area
+from adboox.geolib.tools.geopoint import GeoPoint, GeoPointWithMeta
+from adboox.geolib.tools.kdtree import chord_to_km, _to_xyz, _point_xyz
+
+# Size (in degrees) of the grid cells used by batch reverse geocoding
+GRID_CELL_DEG = 0.1
+
+_geocoder = None
+
+
+def germany_geocoder():
+    """
+    Returns the geocoder of the national zipcode index. It is built
+     once per process, on top of the memory mapped geo cache.
+    """
+    global _geocoder
+    if _geocoder is None:
+        info = GermanyInfoCache().get()
+        _geocoder = Geocoder(info.indexes[r'.*'])
+    return _geocoder
+
+
+def normalize_postcode(value):
+    """
+    Returns the postcode as a string of five digits (store finders give
+     them as int or str, sometimes without the leading zero), or None
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, np.integer)):
+        value = str(value)
+    value = str(value).strip()
+    if not value.isdigit() or len(value) > 5:
+        return None
+    return value.zfill(5)
+
+
+class Geocoder(object):
+    """
+    Geocodes zipcodes in both directions. Zipcodes are indexed by
+     a hash (scalar lookups) and a sorted array (batch lookups) of their
+     centroids and bounding boxes; locations are reverse geocoded with
+     a grid of places, falling back to their k-d tree far from any place.
+
+    A zipcode may be listed for several places; its centroid is the
+     mean of their locations and its city the first of them.
+
+    :param index: GeoKDTree of places with 'zipcode' and 'city' meta
+    """
+
+    def __init__(self, index):
+        self.index = index
+        zipcodes = np.asarray(index.meta['zipcode'], dtype=np.str_)
+        cities = np.asarray(index.meta['city'], dtype=np.str_)
+        self.place_zipcodes = zipcodes
+        self.place_cities = cities
+
+        codes, first, inverse, counts = np.unique(
+            zipcodes, return_index=True, return_inverse=True, return_counts=True)
+        self.codes = codes
+        self.cities = cities[first]
+        self.lats = np.bincount(inverse, weights=index.lats) / counts
+        self.lngs = np.bincount(inverse, weights=index.lngs) / counts
+        by_code = np.argsort(inverse, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        self.lat_min = np.minimum.reduceat(index.lats[by_code], starts)
+        self.lat_max = np.maximum.reduceat(index.lats[by_code], starts)
+        self.lng_min = np.minimum.reduceat(index.lngs[by_code], starts)
+        self.lng_max = np.maximum.reduceat(index.lngs[by_code], starts)
+        self.rows = {code: n for n, code in enumerate(codes.tolist())}
+        self._grid = None
+        self._neighbourhoods = {}
+
+    def _row(self, postcode):
+        postcode = normalize_postcode(postcode)
+        return self.rows.get(postcode) if postcode else None
+
+    def locate(self, postcode):
+        """
+        Returns the centroid of the zipcode with 'zipcode' and 'city'
+         meta, or None for unknown zipcodes
+        """
+        n = self._row(postcode)
+        if n is None:
+            return None
+        p = GeoPoint(float(self.lats[n]), float(self.lngs[n]))
+        return GeoPointWithMeta(p, {'zipcode': str(self.codes[n]), 'city': str(self.cities[n])})
+
+    def bounds(self, postcode):
+        """
+        Returns the bounding box (an Area) of the places of the zipcode,
+         or None for unknown zipcodes
+        """
+        n = self._row(postcode)
+        if n is None:
+            return None
+        return Area(GeoPoint(float(self.lat_min[n]), float(self.lng_min[n])),
+                    GeoPoint(float(self.lat_max[n]), float(self.lng_max[n])))
+
+    def locate_many(self, postcodes):
+        """
+        Batch version of locate. Returns arrays of latitudes and
+         longitudes, NaN for unknown zipcodes.
+        """
+        normalized = [normalize_postcode(p) or '' for p in postcodes]
+        queries = np.array(normalized, dtype=self.codes.dtype)
+        rows = np.clip(np.searchsorted(self.codes, queries), 0, max(len(self.codes) - 1, 0))
+        found = self.codes[rows] == queries if len(self.codes) else np.zeros(len(queries), bool)
+        lats = np.where(found, self.lats[rows], np.nan)
+        lngs = np.where(found, self.lngs[rows], np.nan)
+        return lats, lngs
+
+    def reverse(self, lat, lng):
+        """
+        Returns zipcode, city and distance (in km) of the place closest
+         to given location, or (None, None, None) if there are no places
+        """
+        grid = self._grid or self._build_grid()
+        row = int(floor((lat - grid['lat0']) / GRID_CELL_DEG))
+        col = int(floor((lng - grid['lng0']) / GRID_CELL_DEG))
+        nrows, ncols = grid['shape']
+        n, km = None, None
+        if 1 <= row < nrows - 1 and 1 <= col < ncols - 1:
+            candidates, candidates_xyz = self._neighbourhood(row * ncols + col)
+            if len(candidates):
+                dots = candidates_xyz.dot(_point_xyz(lat, lng))
+                best = int(dots.argmax())
+                n, km = int(candidates[best]), float(chord_to_km(sqrt(max(2.0 - 2.0 * dots[best], 0.0))))
+        if n is None or km > grid['reach']:
+            n, km = self.index.nearest(lat, lng)
+        if n is None:
+            return None, None, None
+        return str(self.place_zipcodes[n]), str(self.place_cities[n]), km
+
+    def reverse_many(self, lats, lngs):
+        """
+        Batch version of reverse. Returns arrays of zipcodes, cities and
+         distances (in km).
+        """
+        lats, lngs = distance.as_arrays(lats, lngs)
+        places, dists = self._nearest_places(lats, lngs)
+        return self.place_zipcodes[places], self.place_cities[places], dists
+
+    def _nearest_places(self, lats, lngs):
+        """
+        Finds the closest places with a grid: the queries of each cell
+         are compared with the places of the cell and its neighbours at
+         once, by the dot products of their unit vectors. Queries whose
+         closest place may lie farther away are answered by the k-d tree.
+        """
+        grid = self._grid or self._build_grid()
+        tree = self.index
+        places = np.zeros(len(lats), dtype=np.intp)
+        dists = np.full(len(lats), np.inf)
+        rows = np.floor((lats - grid['lat0']) / GRID_CELL_DEG).astype(np.intp)
+        cols = np.floor((lngs - grid['lng0']) / GRID_CELL_DEG).astype(np.intp)
+        nrows, ncols = grid['shape']
+        inside = (rows >= 1) & (rows < nrows - 1) & (cols >= 1) & (cols < ncols - 1)
+
+        xyz = _to_xyz(lats, lngs)
+        cells = rows * ncols + cols
+        if len(lats) == 1:
+            groups = [(int(cells[0]), np.nonzero(inside)[0])]
+        else:
+            order = np.nonzero(inside)[0]
+            order = order[np.argsort(cells[order], kind='stable')]
+            unique_cells, starts = np.unique(cells[order], return_index=True)
+            ends = np.append(starts[1:], len(order))
+            groups = ((int(cell), order[start:end]) for cell, start, end in zip(unique_cells, starts, ends))
+        for cell, queries in groups:
+            if not len(queries):
+                continue
+            candidates, candidates_xyz = self._neighbourhood(cell)
+            if not len(candidates):
+                continue
+            dots = xyz[queries].dot(candidates_xyz.T)
+            best = dots.argmax(axis=1)
+            places[queries] = candidates[best]
+            dots = np.minimum(dots[np.arange(len(queries)), best], 1.0)
+            dists[queries] = chord_to_km(np.sqrt(2.0 - 2.0 * dots))
+
+        # places farther than the neighbouring cells reach are not in the grid search
+        for n in np.nonzero(dists > grid['reach'])[0]:
+            place, km = tree.nearest(lats[n], lngs[n])
+            if place is not None:
+                places[n], dists[n] = place, km
+        return places, dists
+
+    def _neighbourhood(self, cell):
+        """
+        Returns places (in input order) and unit vectors of the places
+         in the cell and its eight neighbours; cached per cell
+        """
+        cached = self._neighbourhoods.get(cell)
+        if cached is None:
+            grid = self._grid
+            ncols = grid['shape'][1]
+            row, col = divmod(cell, ncols)
+            # positions in the tree, whose points are stored in tree order
+            positions = np.concatenate([grid['cells'][r * ncols + c]
+                                        for r in range(row - 1, row + 2)
+                                        for c in range(col - 1, col + 2)])
+            cached = self.index.order[positions], self.index.xyz[positions]
+            self._neighbourhoods[cell] = cached
+        return cached
+
+    def _build_grid(self):
+        tree = self.index
+        lats, lngs = tree.lats[tree.order], tree.lngs[tree.order]
+        lat0 = lats.min() - GRID_CELL_DEG if len(lats) else 0.0
+        lng0 = lngs.min() - GRID_CELL_DEG if len(lngs) else 0.0
+        rows = np.floor((lats - lat0) / GRID_CELL_DEG).astype(np.intp)
+        cols = np.floor((lngs - lng0) / GRID_CELL_DEG).astype(np.intp)
+        nrows = int(rows.max()) + 2 if len(rows) else 2
+        ncols = int(cols.max()) + 2 if len(cols) else 2
+        cells = rows * ncols + cols
+        order = np.argsort(cells, kind='stable')
+        bounds = np.searchsorted(cells[order], np.arange(nrows * ncols + 1))
+        # a query is at least one cell away from the edge of its neighbourhood
+        widest = min(max(abs(lats.min()), abs(lats.max())) + GRID_CELL_DEG, 89.0) if len(lats) else 0.0
+        reach = np.radians(GRID_CELL_DEG) * EARTH_RADIUS_KM * np.cos(np.radians(widest))
+        self._grid = {
+            'lat0': lat0,
+            'lng0': lng0,
+            'shape': (nrows, ncols),
+            'cells': [order[bounds[n]:bounds[n + 1]] for n in range(nrows * ncols)],
+            'reach': reach,
+        }
+        return self._grid
@@ -1,64 +1,166 @@
+import os
 import re
+import pkgutil
 import logging
 import itertools
+from math import ceil, log
+import numpy as np
 from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from adboox import __version__
-from adboox.utils import load_csv_data
-from adboox.utils.progress import ProgressTracer
-from adboox.geolib.locations import LocationIterator
-from adboox.geolib.tools.cache import Cache
+from adboox.utils.cities import de_cities_dataset
+from adboox.utils.arrayfile import source_hash
+from adboox.geolib.locations import LocationIterator, CoveringLocationIterator, \
+    SweepCellIterator, GeoCircleWithMeta, move_into, cap_radius
+from adboox.geolib.tools.cache import ArrayCache
 from adboox.geolib.tools.geopoint import GeoPoint
-from adboox.geolib.tools.geomap import GeoQuadMap
-from adboox.geolib.tools.geoindex import GeoQuadIndex
-from adboox.geolib.tools.geocircle import GeoCircle
-from adboox.geolib.tools import DEFAULT_MAX_RECURSION_LEVEL, DEFAULT_RADIUS_AROUND_ZIPCODE_KM
+from adboox.geolib.tools.raster import GeoCoverageRaster
+from adboox.geolib.tools.kdtree import GeoKDTree
+from adboox.geolib.tools.polygon import PreparedPolygon
+from adboox.geolib.tools import partition
+from adboox.geolib.tools import DEFAULT_MAX_RECURSION_LEVEL, DEFAULT_RASTER_LEVEL, \
+    DEFAULT_RADIUS_AROUND_ZIPCODE_KM
 
 GermanyInfo = namedtuple('GermanyInfo', ['maps', 'indexes'])
 logger = logging.getLogger(__name__)
 
+# Territories are keyed by regular expressions over the zipcode. 'zones'
+# splits Germany into its ten postcode zones (by the leading digit), which
+# roughly follow the borders of the federal states.
+TERRITORIES = {
+    'germany': (r'.*',),
+    'zones': tuple(str(digit) for digit in range(10)),
+}
+DEFAULT_TERRITORIES = 'germany'
 
-class GermanyInfoCache(Cache):
-    def __init__(self, name=None):
-        name = name or 'de_cache_{}'.format(__version__)
+# Margin (latitude, longitude in degrees) of a territory's map around its zipcodes
+TERRITORY_MARGIN_DEG = (0.1, 0.15)
+# Maximum size (in degrees) of the cells of a territory's map
+TERRITORY_CELL_DEG = 0.01
+
+_border = None
+
+
+def germany_border():
+    """
+    Returns the border of Germany (data/de_border.geojson, including
+     territorial waters) as a PreparedPolygon. It is loaded once per process.
+    """
+    global _border
+    if _border is None:
+        _border = PreparedPolygon.from_geojson(pkgutil.get_data('adboox', 'data/de_border.geojson'))
+    return _border
+
+
+class GermanyInfoCache(ArrayCache):
+    """
+    Coverage maps and zipcode indexes of the German territories, stored as
+     flat arrays. Coverage maps are clipped to the border of Germany.
+     The file is rebuilt when de_cities.csv, de_border.geojson or
+     schema_version change; bump schema_version whenever the layout of
+     the arrays does.
+
+    :param territories: name of the partition of Germany (see TERRITORIES)
+    :param workers: number of processes building the territories; defaults
+     to the number of CPUs
+    """
+    schema_version = 1
+
+    def __init__(self, name=None, territories=DEFAULT_TERRITORIES, workers=None):
+        if territories not in TERRITORIES:
+            raise ValueError('Unknown territories {!r}'.format(territories))
+        name = name or 'de_cache_{}_{}'.format(__version__, territories)
         super(GermanyInfoCache, self).__init__(name)
+        self.territories = territories
+        self.workers = workers
+
+    def source_hash(self):
+        return source_hash(pkgutil.get_data('adboox', 'data/de_cities.csv') +
+                           pkgutil.get_data('adboox', 'data/de_border.geojson'))
+
+    def to_arrays(self, obj):
+        arrays = {}
+        territories = []
+        for n, k in enumerate(sorted(obj.maps.keys())):
+            raster, index = obj.maps[k], obj.indexes[k]
+            prefix = '{}/'.format(n)
+            arrays[prefix + 'cells'] = raster.cells
+            for name, a in index.to_arrays().items():
+                arrays[prefix + 'index/' + name] = a
+            for name, column in index.meta.items():
+                arrays[prefix + 'meta/' + name] = np.asarray(column, dtype=np.str_)
+            territories.append({
+                'key': k,
+                'p1': [raster.p1.lat, raster.p1.lng],
+                'p2': [raster.p2.lat, raster.p2.lng],
+                'max_level': raster.max_level,
+                'leaf_size': index.leaf_size,
+                'meta': sorted(index.meta.keys()),
+            })
+        return arrays, {'territories': territories}
+
+    def from_arrays(self, arrays, attrs):
+        maps = {}
+        indexes = {}
+        for n, t in enumerate(attrs['territories']):
+            prefix = '{}/'.format(n)
+            k = t['key']
+            maps[k] = GeoCoverageRaster(GeoPoint(*t['p1']), GeoPoint(*t['p2']),
+                                        max_level=t['max_level'], cells=arrays[prefix + 'cells'])
+            tree_arrays = {name[len(prefix + 'index/'):]: a for name, a in arrays.items()
+                           if name.startswith(prefix + 'index/')}
+            meta = {name: arrays[prefix + 'meta/' + name] for name in t['meta']}
+            indexes[k] = GeoKDTree.from_arrays(tree_arrays, meta=meta, leaf_size=t['leaf_size'])
+        return GermanyInfo(maps, indexes)
 
     def make_new(self):
-        # points are north-east to south-west
-        territories = (
-            (r'.*', (GeoPoint(55.036449, 14.735913), GeoPoint(47.214631, 6.298413))),
-        )
-        maps = {kv[0]: GeoQuadMap(*kv[1], max_level=DEFAULT_MAX_RECURSION_LEVEL)
-                for kv in territories}
-
-        indexes = {kv[0]: GeoQuadIndex(*kv[1], max_level=DEFAULT_MAX_RECURSION_LEVEL)
-                   for kv in territories}
-        territory_keys = [kv[0] for kv in territories]
-
-        def _print_progress(pos, totalsize):
-            progress = float(pos) / totalsize * 100.0
-            logger.info('Building geo cache %.2f%% is complete.' % progress)
-
-        de_cities = load_csv_data('de_cities.csv')
-        tracer = ProgressTracer(len(de_cities), _print_progress, cb_num=20)
-        for city in de_cities:
-            zipcode = city['PostalCode']
-            latitude = float(city['Latitude'])
-            longitude = float(city['Longitude'])
-            name = city['CityName']
-            circle = GeoCircle(latitude, longitude, DEFAULT_RADIUS_AROUND_ZIPCODE_KM)
-
-            for k in territory_keys:
-                if not re.match(k, name):
+        keys = TERRITORIES[self.territories]
+        points = {k: ([], [], [], []) for k in keys}
+
+        de_cities = de_cities_dataset()
+        for n, zipcode in enumerate(de_cities.zipcodes.tolist()):
+            for k in keys:
+                if not re.match(k, zipcode):
                     continue
 
-                maps[k].draw_circle(circle)
-                indexes[k].insert(circle, meta={'zipcode': zipcode})
-                tracer.step()
+                values = (float(de_cities.lats[n]), float(de_cities.lngs[n]), zipcode, de_cities.name(n))
+                for column, value in zip(points[k], values):
+                    column.append(value)
                 break
 
+        jobs = [(k,) + points[k] for k in keys if points[k][0]]
+        workers = min(self.workers or os.cpu_count() or 1, len(jobs))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                built = list(executor.map(build_territory, jobs))
+        else:
+            built = [build_territory(job) for job in jobs]
+
+        maps = {k: raster for k, raster, _ in built}
+        indexes = {k: index for k, _, index in built}
         return GermanyInfo(maps, indexes)
 
 
+def build_territory(job):
+    """
+    Builds the coverage map and zipcode index of a territory from
+     a (key, lats, lngs, zipcodes, names) tuple
+    """
+    k, lats, lngs, zipcodes, names = job
+    logger.info('Building geo cache of territory %s (%s zipcodes)', k, len(lats))
+    # the map spans the zipcodes plus a margin for the circles around them
+    margin_lat, margin_lng = TERRITORY_MARGIN_DEG
+    p1 = GeoPoint(min(lats) - margin_lat, min(lngs) - margin_lng)
+    p2 = GeoPoint(max(lats) + margin_lat, max(lngs) + margin_lng)
+    span = max(p2.lat - p1.lat, p2.lng - p1.lng)
+    max_level = min(max(int(ceil(log(span / TERRITORY_CELL_DEG, 2))), 1), DEFAULT_RASTER_LEVEL)
+    raster = GeoCoverageRaster(p1, p2, max_level=max_level)
+    raster.draw_circles(lats, lngs, DEFAULT_RADIUS_AROUND_ZIPCODE_KM)
+    raster.clip(germany_border())
+    index = GeoKDTree(lats, lngs, meta={'zipcode': zipcodes, 'city': names})
+    return k, raster, index
+
+
 class GermanyLocationIterator(object):
     def __init__(self, radius):
         cache = GermanyInfoCache()
@@ -70,3 +172,115 @@ class GermanyLocationIterator(object):
         lix = [LocationIterator(self.de_info.maps[k], self.de_info.indexes[k], self.radius)
                for k in self.de_info.maps.keys()]
         return itertools.chain(*lix)
+
+
+class GermanyQueryPlanner(object):
+    """
+    Plans the query locations of a store finder sweep over Germany.
+
+    :param radius: effective search radius (in km) of the store finder
+    :param snap_km: maximum distance (in km) a query location may be moved
+     to reach a zipcode centroid. Should be set for endpoints which are
+     queried by zipcode or city name instead of coordinates.
+
+    Yields GeoCircleWithMeta objects; meta contains the zipcode and
+    the city name closest to the query location. Query locations always
+    lie within the border of Germany (see germany_border).
+
+    For endpoints which silently cap their results, sweep_cells, split and
+    locate plan an adaptive sweep instead: coarse cells are queried first
+    and only the cells whose response hit the cap are split and queried
+    again.
+
+    :param territories: name of the partition of Germany (see TERRITORIES).
+     Every territory is covered separately, so partitions with more
+     territories need somewhat more queries along their borders.
+
+    :param max_radius: largest radius (in km) the endpoint searches within.
+     Should be set for endpoints with a fixed server-side radius; query
+     locations which would need a larger radius are capped and logged.
+
+    shard and shard_cells split a sweep into n balanced, spatially compact
+    parts, so several crawler processes can share one national sweep.
+    """
+    def __init__(self, radius, snap_km=0, territories=DEFAULT_TERRITORIES, max_radius=None):
+        cache = GermanyInfoCache(territories=territories)
+
+        self.radius = radius
+        self.snap_km = snap_km
+        self.max_radius = max_radius
+        self.de_info = cache.get()
+        self.border = germany_border()
+
+    def __iter__(self):
+        lix = [CoveringLocationIterator(self.de_info.maps[k], self.de_info.indexes[k],
+                                        self.radius, self.snap_km, border=self.border,
+                                        max_radius=self.max_radius)
+               for k in sorted(self.de_info.maps.keys())]
+        seen = set()
+        for circle in itertools.chain(*lix):
+            # neighbouring territories may snap to the same zipcode
+            key = (circle.lat, circle.lng)
+            if key not in seen:
+                seen.add(key)
+                yield circle
+
+    def shard(self, k, n):
+        """
+        Returns the query locations of the k-th (from 1 to n) of n
+         balanced shards of the sweep
+        """
+        return partition.shard(self, k, n)
+
+    def shard_cells(self, k, n, max_level=DEFAULT_MAX_RECURSION_LEVEL):
+        """
+        Returns the starting cells of the k-th (from 1 to n) of n shards
+         of an adaptive sweep
+        """
+        return partition.shard(self.sweep_cells(max_level), k, n, locate=lambda cell: cell.query_circle())
+
+    def contains(self, lat, lng, margin_km=0):
+        """
+        Checks if the location lies within the border of Germany,
+         or not farther than margin_km from it
+        """
+        return bool(self.border.contains_within([lat], [lng], margin_km)[0])
+
+    def sweep_cells(self, max_level=DEFAULT_MAX_RECURSION_LEVEL):
+        """
+        Returns the starting cells of an adaptive sweep
+        """
+        lix = [SweepCellIterator(self.de_info.maps[k], self.radius, max_level, territory=k)
+               for k in sorted(self.de_info.maps.keys())]
+        return itertools.chain(*lix)
+
+    def split(self, cell):
+        """
+        Returns the subcells of the cell, which are worth querying
+        """
+        return cell.split(self.de_info.maps[cell.territory])
+
+    def locate(self, cell):
+        """
+        Returns the query circle of the cell. With snap_km set, the circle
+         is moved to the closest zipcode centroid; otherwise a circle lying
+         outside the border is moved to the closest point of the border.
+         Moved circles still contain the whole cell (or all of the
+         territory within it), unless that needs more than max_radius.
+        """
+        circle = cell.query_circle()
+        index = self.de_info.indexes[cell.territory]
+        match = index.search(circle)
+        if match is None:
+            return GeoCircleWithMeta(circle.lat, circle.lng, circle.radius)
+
+        if not self.snap_km and not self.border.contains_point(circle):
+            return move_into(circle, self.border, self.de_info.maps[cell.territory], index,
+                             self.max_radius)
+
+        if self.snap_km:
+            radius = circle.radius + circle.distance(match)
+            return cap_radius(GeoCircleWithMeta(match.lat, match.lng, radius, match.meta),
+                              self.max_radius)
+
+        return GeoCircleWithMeta(circle.lat, circle.lng, circle.radius, match.meta)
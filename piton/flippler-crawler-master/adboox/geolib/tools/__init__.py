@@ -1,2 +1,4 @@
 DEFAULT_MAX_RECURSION_LEVEL = 8
+DEFAULT_RASTER_LEVEL = 10
 DEFAULT_RADIUS_AROUND_ZIPCODE_KM = 3
+EARTH_RADIUS_KM = 6371
@@ -1,4 +1,8 @@
 import pickle
+import logging
+from adboox.utils.arrayfile import ArrayFile, ArrayFileError, write_arrays
+
+logger = logging.getLogger(__name__)
 
 
 class Cache(object):
@@ -14,14 +18,14 @@ class Cache(object):
 
     def _open(self):
         try:
-            with open(self._tmp_file_name(), mode='r') as f:
+            with open(self._tmp_file_name(), mode='rb') as f:
                 obj = pickle.load(f)
             return obj
         except Exception:
             pass
 
     def _save(self, obj):
-        with open(self._tmp_file_name(), mode='w') as f:
+        with open(self._tmp_file_name(), mode='wb') as f:
             pickle.dump(obj, f, protocol=-1)
 
     def get(self):
@@ -32,3 +36,53 @@ class Cache(object):
         obj = self.make_new()
         self._save(obj)
         return obj
+
+
+class ArrayCache(Cache):
+    """
+    Cache of objects made of flat numpy arrays, stored in the binary
+     format of adboox.utils.arrayfile and opened with mmap.
+
+    The file is rebuilt when its schema_version differs from the class
+     attribute or when source_hash() of the data it was built from changes.
+     Subclasses implement make_new, to_arrays and from_arrays.
+    """
+    schema_version = 1
+
+    def _tmp_file_name(self):
+        return '/tmp/' + self.name + '.arr'
+
+    def source_hash(self):
+        """
+        Returns the hash of the data the cached object is built from
+        """
+        return None
+
+    def to_arrays(self, obj):
+        """
+        Returns (arrays, attrs) for the object; arrays is a dict of
+         numpy arrays and attrs a JSON serializable dict.
+        """
+        raise NotImplementedError
+
+    def from_arrays(self, arrays, attrs):
+        """
+        Builds the object back from the arrays and attrs
+        """
+        raise NotImplementedError
+
+    def _open(self):
+        path = self._tmp_file_name()
+        try:
+            f = ArrayFile(path, version=self.schema_version, source=self.source_hash())
+        except (IOError, OSError):
+            return None
+        except ArrayFileError as e:
+            logger.info('Rebuilding %s: %s', path, e)
+            return None
+        return self.from_arrays(f.arrays, f.attrs)
+
+    def _save(self, obj):
+        arrays, attrs = self.to_arrays(obj)
+        write_arrays(self._tmp_file_name(), arrays, self.schema_version,
+                     source=self.source_hash(), attrs=attrs)
@@ -0,0 +1,155 @@
+"""
+Contains vectorized great circle distance calculations over
+arrays of latitudes and longitudes (in degrees).
+
+The formula is the same as in GeoPoint.__distance__
+ (see http://gis-lab.info/qa/great-circles.html), so the results
+ match the scalar implementation.
+"""
+import numpy as np
+from adboox.geolib.tools import EARTH_RADIUS_KM
+
+# Number of rows of a distance matrix calculated at once. Bounds the memory
+# of many-to-many calculations to chunk_size * len(other points) floats.
+DEFAULT_CHUNK_SIZE = 1024
+
+
+def as_arrays(lats, lngs):
+    """
+    Returns latitudes and longitudes as contiguous float arrays
+    """
+    lats = np.ascontiguousarray(lats, dtype=np.float64)
+    lngs = np.ascontiguousarray(lngs, dtype=np.float64)
+    if lats.shape != lngs.shape:
+        raise ValueError('latitudes and longitudes differ in shape')
+    return lats, lngs
+
+
+class _Trig(object):
+    """
+    Sine and cosine of latitudes and longitudes in radians,
+    computed once per set of points.
+    """
+
+    def __init__(self, lats, lngs):
+        lats, lngs = as_arrays(lats, lngs)
+        lat_rad = np.radians(lats)
+        self.lng_rad = np.radians(lngs)
+        self.sin_lat = np.sin(lat_rad)
+        self.cos_lat = np.cos(lat_rad)
+
+    def __len__(self):
+        return len(self.lng_rad)
+
+    def slice(self, start, end):
+        part = _Trig.__new__(_Trig)
+        part.lng_rad = self.lng_rad[start:end]
+        part.sin_lat = self.sin_lat[start:end]
+        part.cos_lat = self.cos_lat[start:end]
+        return part
+
+
+def _distances(t1, t2):
+    """
+    Distances between (broadcast) points of the given trig sets
+    """
+    delta = t2.lng_rad - t1.lng_rad
+    c_delta = np.cos(delta)
+    s_delta = np.sin(delta)
+    cl2_c_delta = t2.cos_lat * c_delta
+
+    y = np.hypot(t2.cos_lat * s_delta, t1.cos_lat * t2.sin_lat - t1.sin_lat * cl2_c_delta)
+    x = t1.sin_lat * t2.sin_lat + t1.cos_lat * cl2_c_delta
+    return np.arctan2(y, x) * EARTH_RADIUS_KM
+
+
+def _column(t):
+    col = _Trig.__new__(_Trig)
+    col.lng_rad = t.lng_rad[:, np.newaxis]
+    col.sin_lat = t.sin_lat[:, np.newaxis]
+    col.cos_lat = t.cos_lat[:, np.newaxis]
+    return col
+
+
+def distances(lat, lng, lats, lngs):
+    """
+    Calculates distances (in km) from a single point to many points.
+    """
+    return _distances(_Trig([lat], [lng]), _Trig(lats, lngs))
+
+
+def point_distances(p, points):
+    """
+    Calculates distances (in km) from a single point to many points.
+    Both must provide precomputed lng_rad, sin_lat and cos_lat,
+    e.g. a GeoPoint and a GeoPointSet.
+    """
+    return _distances(p, points)
+
+
+def paired_distances(lats1, lngs1, lats2, lngs2):
+    """
+    Calculates distances (in km) between points of two sets pairwise;
+    the arrays are broadcast against each other.
+    """
+    return _distances(_Trig(lats1, lngs1), _Trig(lats2, lngs2))
+
+
+def within_radius(lat, lng, radius, lats, lngs):
+    """
+    Returns a boolean mask of the points which are
+    within radius (in km) from the given point.
+    """
+    return distances(lat, lng, lats, lngs) <= radius
+
+
+def iter_pairwise_distances(lats1, lngs1, lats2, lngs2, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yields (offset, block) pairs, where block holds the distances (in km)
+    between points offset:offset + len(block) of the first set and all
+    points of the second set.
+    """
+    t1 = _Trig(lats1, lngs1)
+    t2 = _Trig(lats2, lngs2)
+    for start in range(0, len(t1), chunk_size):
+        part = _column(t1.slice(start, start + chunk_size))
+        yield start, _distances(part, t2)
+
+
+def pairwise_distances(lats1, lngs1, lats2, lngs2, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Returns the matrix of distances (in km) between each point
+    of the first set (rows) and each point of the second set (columns).
+    """
+    lats1, lngs1 = as_arrays(lats1, lngs1)
+    result = np.empty((len(lats1), len(np.atleast_1d(lats2))), dtype=np.float64)
+    for start, block in iter_pairwise_distances(lats1, lngs1, lats2, lngs2, chunk_size):
+        result[start:start + len(block)] = block
+    return result
+
+
+def nearest(lats1, lngs1, lats2, lngs2, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    For each point of the first set finds the closest point of the second set.
+    Returns arrays of indexes (into the second set) and distances (in km).
+    """
+    lats1, lngs1 = as_arrays(lats1, lngs1)
+    indexes = np.empty(len(lats1), dtype=np.intp)
+    dists = np.empty(len(lats1), dtype=np.float64)
+    for start, block in iter_pairwise_distances(lats1, lngs1, lats2, lngs2, chunk_size):
+        end = start + len(block)
+        indexes[start:end] = block.argmin(axis=1)
+        dists[start:end] = block[np.arange(len(block)), indexes[start:end]]
+    return indexes, dists
+
+
+def any_within_radius(lats1, lngs1, radius, lats2, lngs2, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Returns a boolean mask of the points of the first set, which have
+    at least one point of the second set within radius (in km).
+    """
+    lats1, lngs1 = as_arrays(lats1, lngs1)
+    mask = np.empty(len(lats1), dtype=bool)
+    for start, block in iter_pairwise_distances(lats1, lngs1, lats2, lngs2, chunk_size):
+        mask[start:start + len(block)] = (block <= radius).any(axis=1)
+    return mask
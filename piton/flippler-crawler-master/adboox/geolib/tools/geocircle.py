@@ -2,6 +2,7 @@
 Contains representation of a circle on the globe.
 """
 
+from adboox.geolib.tools import distance
 from adboox.geolib.tools.geopoint import GeoPoint
 
 
@@ -11,6 +12,7 @@ class GeoCircle(GeoPoint):
     Usually, in location crawling, we search for stores within a circle
     around some geo point and radius.
     """
+    __slots__ = ('radius',)
 
     def __init__(self, lat, lng, radius):
         super(GeoCircle, self).__init__(lat, lng)
@@ -22,6 +24,13 @@ class GeoCircle(GeoPoint):
         """
         return self.distance(p) <= self.radius
 
+    def contains_points(self, lats, lngs):
+        """
+        Returns a boolean array, telling which of the points given
+        as arrays of latitudes and longitudes are within the circle.
+        """
+        return distance.within_radius(self.lat, self.lng, self.radius, lats, lngs)
+
     def intersects_area(self, area):
         """
         Returns true, if the circle intercects area
@@ -33,5 +42,5 @@ class GeoCircle(GeoPoint):
         Returns the new circle, with center in point on the globe, that is
         away from current in delta latitude and delta longitude, both in km.
         """
-        p = super(GeoCircle, self).step(dlat, dlon)
-        return GeoCircle(p.lat, p.lng, self.radius)
+        lat, lng = self._step_coords(dlat, dlon)
+        return self.__class__(lat, lng, self.radius)
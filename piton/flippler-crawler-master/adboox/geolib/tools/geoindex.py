@@ -3,18 +3,12 @@ Contains implementation of reverse index - from coordinates to metadata.
 
 """
 from collections import deque
-from adboox.geolib.tools.geopoint import GeoPoint
+from adboox.geolib.tools.geopoint import GeoPointWithMeta
+from adboox.geolib.tools.pointset import GeoPointSet
 from adboox.geolib.tools.quadtree import GenericGeoQuadTree
 
-
-class GeoPointWithMeta(GeoPoint):
-    """
-    Geo Point with additional metadata
-    """
-
-    def __init__(self, point, meta=None):
-        super(GeoPointWithMeta, self).__init__(point.lat, point.lng)
-        self.meta = meta
+# Below this number of candidates the scalar distance loop is faster
+VECTORIZED_SEARCH_MIN_CANDIDATES = 32
 
 
 class GeoQuadIndex(GenericGeoQuadTree):
@@ -25,11 +19,16 @@ class GeoQuadIndex(GenericGeoQuadTree):
     def __init__(self, p1, p2, level=0, max_level=8, points_maxlen=None):
         super(GeoQuadIndex, self).__init__(p1, p2, max_level, level)
         self.points = deque(maxlen=points_maxlen)
+        # search candidates of this node, built on demand
+        self._candidates = None
+        self._point_set = None
 
     def insert(self, p, meta=None):
         """
         Inserts a point to index with given meta
         """
+        self._candidates = None
+        self._point_set = None
         if self.level < self.max_level:
             self.make_subtrees()
 
@@ -48,23 +47,32 @@ class GeoQuadIndex(GenericGeoQuadTree):
 
         return result
 
-    def _search_points_close_to(self, query_p):
+    def _search_node(self, query_p):
+        """
+        Returns the node, whose points are the candidates
+         for the closest match to query_p
+        """
         if self.level < self.max_level:
-
-            result = self.points
-
             for subtree in self._subtrees:
                 if subtree.contains_point(query_p):
-                    result = subtree._search_points_close_to(query_p)
+                    node = subtree._search_node(query_p)
+                    if node.candidates:
+                        return node
                     break
 
-            if len(result) > 0:
-                return result
-            else:
-                return self._all_points()
+        return self
 
-        else:
-            return self.points
+    @property
+    def candidates(self):
+        if self._candidates is None:
+            self._candidates = self._all_points()
+        return self._candidates
+
+    @property
+    def point_set(self):
+        if self._point_set is None:
+            self._point_set = GeoPointSet.from_points(self.candidates)
+        return self._point_set
 
     def search(self, query_p):
         """
@@ -72,7 +80,8 @@ class GeoQuadIndex(GenericGeoQuadTree):
          given query_p. Result contains associated metadata
          in the field `meta`
         """
-        candidates = self._search_points_close_to(query_p)
+        node = self._search_node(query_p)
+        candidates = node.candidates
 
         if not candidates:
             return None
@@ -80,6 +89,10 @@ class GeoQuadIndex(GenericGeoQuadTree):
         if len(candidates) == 1:
             return candidates[0]
 
+        if len(candidates) > VECTORIZED_SEARCH_MIN_CANDIDATES:
+            n, _ = node.point_set.nearest(query_p)
+            return candidates[n]
+
         best_match = candidates[0]
         for match in candidates:
             if match.distance(query_p) \
@@ -2,8 +2,10 @@
 Contains implementation of quad tee data structure
  (http://en.wikipedia.org/wiki/Quadtree)
 """
+from functools import reduce
 from math import pi, sin, cos
 from adboox.geolib.tools.geopoint import GeoPoint
+from adboox.geolib.tools.geocircle import GeoCircle
 from adboox.geolib.tools.quadtree import GenericGeoQuadTree
 
 
@@ -74,6 +76,32 @@ class GeoQuadMap(GenericGeoQuadTree):
 
         return self.intersects_circle(circle)
 
+    def filled_within(self, circle):
+        """
+        Checks if any filled part of the map lies within the circle.
+         Uses the same loose intersection test as draw_circle, so it may
+         answer True for parts that only touch the circle, but it never
+         misses a filled part.
+        """
+        if not self.intersects_circle(circle):
+            return False
+
+        if self.full:
+            return True
+
+        for subtree in self._subtrees:
+            if subtree.filled_within(circle):
+                return True
+
+        return False
+
+    def filled_within_circles(self, lats, lngs, radius):
+        """
+        Batch version of filled_within, for circles of equal radius.
+         Returns a list of booleans.
+        """
+        return [self.filled_within(GeoCircle(lat, lng, radius)) for lat, lng in zip(lats, lngs)]
+
     def filled_at(self, point):
         """
         Checks if the map is filled at given point
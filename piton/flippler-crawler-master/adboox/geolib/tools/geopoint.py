@@ -2,31 +2,41 @@
 Contains implementation of point on earth surface.
 """
 from math import radians, sin, cos, atan2, sqrt, degrees
-
-EARTH_RADIUS_KM = 6371
+from adboox.geolib.tools import EARTH_RADIUS_KM
+from adboox.geolib.tools import distance
 
 
 class GeoPoint(object):
     """
     Represents a point on the globe,
     with latitude and longitude.
+
+    Sine and cosine of the latitude are calculated once, so points
+     must not be changed after creation - make a new one instead.
     """
+    __slots__ = ('lat', 'lng', 'lng_rad', 'sin_lat', 'cos_lat')
 
     def __init__(self, lat, lng):
         self.lat = lat
         self.lng = lng
-        self.lat_rad = radians(lat)
         self.lng_rad = radians(lng)
+        lat_rad = radians(lat)
+        self.sin_lat = sin(lat_rad)
+        self.cos_lat = cos(lat_rad)
+
+    @property
+    def lat_rad(self):
+        return radians(self.lat)
 
     def __distance__(self, lat2_rad, lng2_rad):
         """
         see http://gis-lab.info/qa/great-circles.html
         """
+        return self._distance(sin(lat2_rad), cos(lat2_rad), lng2_rad)
 
-        cl1 = cos(self.lat_rad)
-        cl2 = cos(lat2_rad)
-        sl1 = sin(self.lat_rad)
-        sl2 = sin(lat2_rad)
+    def _distance(self, sl2, cl2, lng2_rad):
+        cl1 = self.cos_lat
+        sl1 = self.sin_lat
         delta = lng2_rad - self.lng_rad
         c_delta = cos(delta)
         s_delta = sin(delta)
@@ -40,14 +50,33 @@ class GeoPoint(object):
         Calculates distance (in km)
         between this and given points on the globe.
         """
-        return self.__distance__(other.lat_rad, other.lng_rad)
+        return self._distance(other.sin_lat, other.cos_lat, other.lng_rad)
+
+    def distances(self, lats, lngs):
+        """
+        Calculates distances (in km) between this point and
+        points given as arrays of latitudes and longitudes.
+        """
+        return distance.distances(self.lat, self.lng, lats, lngs)
 
     def step(self, dlat, dlon):
         """
         Returns the next point on the globe, making a step
         from current in delta latitude and delta longitude, both in km.
         """
-        dlat = degrees(dlat / EARTH_RADIUS_KM)
-        dlng = degrees(dlon / EARTH_RADIUS_KM / cos(radians(self.lat)))
+        return GeoPoint(*self._step_coords(dlat, dlon))
+
+    def _step_coords(self, dlat, dlon):
+        return (self.lat + degrees(dlat / EARTH_RADIUS_KM),
+                self.lng + degrees(dlon / EARTH_RADIUS_KM / self.cos_lat))
+
+
+class GeoPointWithMeta(GeoPoint):
+    """
+    Geo Point with additional metadata
+    """
+    __slots__ = ('meta',)
 
-        return GeoPoint(lat=self.lat + dlat, lng=self.lng + dlng)
+    def __init__(self, point, meta=None):
+        super(GeoPointWithMeta, self).__init__(point.lat, point.lng)
+        self.meta = meta
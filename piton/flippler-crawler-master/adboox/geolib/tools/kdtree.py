@@ -0,0 +1,276 @@
+"""
+Contains implementation of a bulk-loaded k-d tree
+ (http://en.wikipedia.org/wiki/K-d_tree) over points on the globe.
+
+Points are indexed as 3d unit vectors. The straight (chord) distance
+ between two unit vectors grows monotonically with their great circle
+ distance, so pruning by chord distance is exact - unlike pruning by
+ latitude and longitude, which breaks down near the poles and around
+ the antimeridian.
+"""
+import heapq
+import numpy as np
+from math import sin, radians, cos
+from adboox.geolib.tools import EARTH_RADIUS_KM
+from adboox.geolib.tools.geopoint import GeoPoint, GeoPointWithMeta
+
+DEFAULT_LEAF_SIZE = 16
+
+# Arrays which fully describe a built tree
+TREE_ARRAYS = ('lats', 'lngs', 'order', 'xyz', 'node_start', 'node_end',
+               'node_left', 'node_right', 'node_lo', 'node_hi')
+
+
+def _to_xyz(lats, lngs):
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lng_rad = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lat = np.cos(lat_rad)
+    return np.column_stack((cos_lat * np.cos(lng_rad), cos_lat * np.sin(lng_rad), np.sin(lat_rad)))
+
+
+def _point_xyz(lat, lng):
+    lat_rad = radians(lat)
+    lng_rad = radians(lng)
+    return np.array((cos(lat_rad) * cos(lng_rad), cos(lat_rad) * sin(lng_rad), sin(lat_rad)))
+
+
+def chord_to_km(chord):
+    """
+    Converts chord length(s) between unit vectors to great circle distance (in km)
+    """
+    return 2.0 * np.arcsin(np.minimum(np.asarray(chord) / 2.0, 1.0)) * EARTH_RADIUS_KM
+
+
+def km_to_chord(km):
+    """
+    Converts great circle distance (in km) to chord length between unit vectors
+    """
+    angle = min(km / EARTH_RADIUS_KM, np.pi)
+    return 2.0 * sin(angle / 2.0)
+
+
+class GeoKDTree(object):
+    """
+    Balanced index of points on the globe with associated metadata
+     (usually zipcode and city name), built at once from arrays of
+     latitudes and longitudes.
+
+    :param lats: latitudes of the points
+    :param lngs: longitudes of the points
+    :param meta: dict of metadata columns, each column being a sequence
+     with the same length as lats. Metadata of the n-th point is
+     {key: column[n] for key, column in meta.items()}.
+    :param leaf_size: maximum number of points in a leaf node
+    """
+
+    def __init__(self, lats, lngs, meta=None, leaf_size=DEFAULT_LEAF_SIZE):
+        self.lats = np.ascontiguousarray(lats, dtype=np.float64)
+        self.lngs = np.ascontiguousarray(lngs, dtype=np.float64)
+        self.meta = meta or {}
+        self.leaf_size = leaf_size
+        self._build()
+
+    @classmethod
+    def from_arrays(cls, arrays, meta=None, leaf_size=DEFAULT_LEAF_SIZE):
+        """
+        Restores a tree from the arrays returned by to_arrays, without
+         building it again. The arrays may be read-only (e.g. memory mapped).
+        """
+        tree = cls.__new__(cls)
+        for name in TREE_ARRAYS:
+            setattr(tree, name, arrays[name])
+        tree.meta = meta or {}
+        tree.leaf_size = leaf_size
+        return tree
+
+    def to_arrays(self):
+        """
+        Returns dict of the arrays describing the tree (without metadata)
+        """
+        return {name: getattr(self, name) for name in TREE_ARRAYS}
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _build(self):
+        xyz = _to_xyz(self.lats, self.lngs)
+        order = np.arange(len(xyz))
+
+        starts, ends, lefts, rights = [], [], [], []
+
+        def add_node(start, end):
+            starts.append(start)
+            ends.append(end)
+            lefts.append(-1)
+            rights.append(-1)
+            return len(starts) - 1
+
+        if len(xyz):
+            pending = [add_node(0, len(xyz))]
+        else:
+            pending = []
+
+        while pending:
+            node = pending.pop()
+            start, end = starts[node], ends[node]
+            if end - start <= self.leaf_size:
+                continue
+
+            idx = order[start:end]
+            spread = xyz[idx].max(axis=0) - xyz[idx].min(axis=0)
+            dim = int(spread.argmax())
+            mid = (end - start) // 2
+            order[start:end] = idx[np.argpartition(xyz[idx, dim], mid)]
+
+            lefts[node] = add_node(start, start + mid)
+            rights[node] = add_node(start + mid, end)
+            pending.extend((lefts[node], rights[node]))
+
+        # points are stored in tree order, so every node is a contiguous slice
+        self.order = order
+        self.xyz = np.ascontiguousarray(xyz[order])
+        self.node_start = np.array(starts, dtype=np.intp)
+        self.node_end = np.array(ends, dtype=np.intp)
+        self.node_left = np.array(lefts, dtype=np.intp)
+        self.node_right = np.array(rights, dtype=np.intp)
+        self.node_lo = np.array([self.xyz[s:e].min(axis=0) for s, e in zip(starts, ends)])
+        self.node_hi = np.array([self.xyz[s:e].max(axis=0) for s, e in zip(starts, ends)])
+
+    def _min_dist2(self, node, q):
+        """
+        Squared distance from q to the bounding box of the node
+        """
+        d = np.maximum(self.node_lo[node] - q, 0) + np.maximum(q - self.node_hi[node], 0)
+        return float(d.dot(d))
+
+    def _knn(self, q, k, max_dist2=np.inf):
+        best_d2 = np.empty(0)
+        best_idx = np.empty(0, dtype=np.intp)
+        bound = max_dist2
+
+        queue = [(0.0, 0)] if len(self) else []
+        while queue:
+            d2, node = heapq.heappop(queue)
+            if d2 > bound:
+                break
+
+            left = self.node_left[node]
+            if left >= 0:
+                for child in (left, self.node_right[node]):
+                    child_d2 = self._min_dist2(child, q)
+                    if child_d2 <= bound:
+                        heapq.heappush(queue, (child_d2, child))
+                continue
+
+            start, end = self.node_start[node], self.node_end[node]
+            diff = self.xyz[start:end] - q
+            d2s = np.einsum('ij,ij->i', diff, diff)
+            best_d2 = np.concatenate((best_d2, d2s))
+            best_idx = np.concatenate((best_idx, np.arange(start, end)))
+            if len(best_d2) > k:
+                keep = np.argpartition(best_d2, k - 1)[:k]
+                best_d2, best_idx = best_d2[keep], best_idx[keep]
+            if len(best_d2) == k:
+                bound = min(max_dist2, float(best_d2.max()))
+
+        within = best_d2 <= max_dist2
+        best_d2, best_idx = best_d2[within], best_idx[within]
+        ranking = np.argsort(best_d2, kind='stable')
+        return self.order[best_idx[ranking]], chord_to_km(np.sqrt(best_d2[ranking]))
+
+    def _radius(self, q, chord):
+        chord2 = chord * chord
+        found = []
+        pending = [0] if len(self) else []
+        while pending:
+            node = pending.pop()
+            if self._min_dist2(node, q) > chord2:
+                continue
+
+            left = self.node_left[node]
+            if left >= 0:
+                pending.extend((left, self.node_right[node]))
+                continue
+
+            start, end = self.node_start[node], self.node_end[node]
+            diff = self.xyz[start:end] - q
+            d2s = np.einsum('ij,ij->i', diff, diff)
+            found.append(np.arange(start, end)[d2s <= chord2])
+
+        if not found:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(self.order[np.concatenate(found)])
+
+    def point_meta(self, n):
+        """
+        Returns metadata of the n-th point (in input order)
+        """
+        meta = {}
+        for key, column in self.meta.items():
+            value = column[n]
+            # numpy columns hold numpy scalars, e.g. numpy.str_
+            meta[key] = value.item() if isinstance(value, np.generic) else value
+        return meta
+
+    def point(self, n):
+        """
+        Returns the n-th point (in input order) with its metadata
+        """
+        p = GeoPoint(float(self.lats[n]), float(self.lngs[n]))
+        return GeoPointWithMeta(p, self.point_meta(n))
+
+    def k_nearest(self, lat, lng, k, max_distance=None):
+        """
+        Returns arrays of indexes and distances (in km) of the k points
+         closest to the given location, closest first. With max_distance
+         (in km) given, farther points are left out.
+        """
+        max_dist2 = np.inf if max_distance is None else km_to_chord(max_distance) ** 2
+        return self._knn(_point_xyz(lat, lng), k, max_dist2)
+
+    def nearest(self, lat, lng):
+        """
+        Returns index and distance (in km) of the point closest
+         to the given location, or (None, None) if the index is empty.
+        """
+        indexes, dists = self.k_nearest(lat, lng, 1)
+        if not len(indexes):
+            return None, None
+        return int(indexes[0]), float(dists[0])
+
+    def within_radius(self, lat, lng, radius):
+        """
+        Returns sorted array of indexes of points within radius (in km)
+        """
+        return self._radius(_point_xyz(lat, lng), km_to_chord(radius))
+
+    def query_nearest(self, lats, lngs, k=1):
+        """
+        Batch version of k_nearest. Returns (n, k) arrays of indexes and
+         distances; missing neighbours have index -1 and distance inf.
+        """
+        qs = _to_xyz(lats, lngs)
+        indexes = np.full((len(qs), k), -1, dtype=np.intp)
+        dists = np.full((len(qs), k), np.inf)
+        for n, q in enumerate(qs):
+            idx, dist = self._knn(q, k)
+            indexes[n, :len(idx)] = idx
+            dists[n, :len(dist)] = dist
+        return indexes, dists
+
+    def query_radius(self, lats, lngs, radius):
+        """
+        Batch version of within_radius. Returns list of index arrays.
+        """
+        chord = km_to_chord(radius)
+        return [self._radius(q, chord) for q in _to_xyz(lats, lngs)]
+
+    def search(self, query_p):
+        """
+        Returns the point closest to given query_p, with associated
+         metadata in the field `meta`. Same interface as GeoQuadIndex.search.
+        """
+        n, _ = self.nearest(query_p.lat, query_p.lng)
+        if n is None:
+            return None
+        return self.point(n)
@@ -0,0 +1,59 @@
+"""
+Contains functions splitting sets of locations into balanced parts.
+"""
+import numpy as np
+from adboox.geolib.tools import distance
+
+
+def bisect(lats, lngs, n):
+    """
+    Splits points into n spatially compact parts of (almost) equal size
+     by recursive coordinate bisection: each set of points is cut across
+     its wider extent, in proportion to the number of parts on each side.
+     Returns an array of part numbers (0 to n - 1), one per point.
+    """
+    lats, lngs = distance.as_arrays(lats, lngs)
+    labels = np.zeros(len(lats), dtype=np.intp)
+    pending = [(np.arange(len(lats)), 0, n)]
+    while pending:
+        idx, first, parts = pending.pop()
+        if parts == 1 or not len(idx):
+            labels[idx] = first
+            continue
+
+        lat_span = np.ptp(lats[idx])
+        lng_span = np.ptp(lngs[idx]) * np.cos(np.radians(lats[idx].mean()))
+        keys = lats[idx] if lat_span >= lng_span else lngs[idx]
+        order = idx[np.argsort(keys, kind='stable')]
+        left = parts // 2
+        cut = int(round(len(idx) * float(left) / parts))
+        pending.append((order[:cut], first, left))
+        pending.append((order[cut:], first + left, parts - left))
+    return labels
+
+
+def parse_shard(value):
+    """
+    Parses shard given as 'k/N' (k from 1 to N) to a (k, N) tuple
+    """
+    try:
+        k, n = [int(v) for v in str(value).split('/')]
+    except ValueError:
+        raise ValueError('Shard must be given as k/N, not {!r}'.format(value))
+    if not 1 <= k <= n:
+        raise ValueError('Shard {!r} is out of range'.format(value))
+    return k, n
+
+
+def shard(items, k, n, locate=None):
+    """
+    Returns the k-th (from 1 to n) of n balanced, spatially compact parts
+     of items. Items are points (GeoPoint, GeoCircle), or are turned into
+     points by locate. The result does not depend on the order of items.
+    """
+    items = list(items)
+    points = [locate(item) if locate else item for item in items]
+    # sort first, so every process gets the same parts
+    order = sorted(range(len(items)), key=lambda i: (points[i].lat, points[i].lng))
+    labels = bisect([points[i].lat for i in order], [points[i].lng for i in order], n)
+    return [items[i] for i, label in zip(order, labels) if label == k - 1]
@@ -0,0 +1,76 @@
+"""
+Contains struct-of-arrays container of points on the globe.
+"""
+import numpy as np
+from adboox.geolib.tools import distance
+from adboox.geolib.tools.geopoint import GeoPoint, GeoPointWithMeta
+
+
+class GeoPointSet(object):
+    """
+    Set of points on the globe, kept as arrays of latitudes and
+     longitudes with precomputed trigonometry instead of one object
+     per point. Distances from a point to the whole set take a single
+     array operation.
+
+    :param lats: latitudes of the points
+    :param lngs: longitudes of the points
+    :param meta: optional sequence of metadata, one per point
+    """
+    __slots__ = ('lats', 'lngs', 'lng_rad', 'sin_lat', 'cos_lat', 'meta')
+
+    def __init__(self, lats, lngs, meta=None):
+        self.lats, self.lngs = distance.as_arrays(lats, lngs)
+        lat_rad = np.radians(self.lats)
+        self.lng_rad = np.radians(self.lngs)
+        self.sin_lat = np.sin(lat_rad)
+        self.cos_lat = np.cos(lat_rad)
+        self.meta = meta
+
+    @classmethod
+    def from_points(cls, points):
+        """
+        Makes a set from GeoPoint objects, keeping the meta
+         of GeoPointWithMeta objects
+        """
+        points = list(points)
+        lats = [p.lat for p in points]
+        lngs = [p.lng for p in points]
+        meta = [getattr(p, 'meta', None) for p in points]
+        return cls(lats, lngs, meta)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def __getitem__(self, n):
+        p = GeoPoint(float(self.lats[n]), float(self.lngs[n]))
+        if self.meta is None:
+            return p
+        return GeoPointWithMeta(p, self.meta[n])
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self[n]
+
+    def distances(self, p):
+        """
+        Calculates distances (in km) from given point to each point of the set
+        """
+        return distance.point_distances(p, self)
+
+    def within(self, circle):
+        """
+        Returns a boolean mask of the points within the circle
+        """
+        return self.distances(circle) <= circle.radius
+
+    def nearest(self, p):
+        """
+        Returns index and distance (in km) of the point closest
+         to given point, or (None, None) if the set is empty.
+        """
+        if not len(self):
+            return None, None
+        dists = self.distances(p)
+        n = int(dists.argmin())
+        return n, float(dists[n])
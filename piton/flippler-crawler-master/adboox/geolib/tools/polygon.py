@@ -0,0 +1,235 @@
+"""
+Contains implementation of a polygon on the globe, prepared
+ for fast batch point-in-polygon tests.
+"""
+import json
+import numpy as np
+from math import pi
+from adboox.geolib.tools import EARTH_RADIUS_KM
+from adboox.geolib.tools import distance
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * pi / 180.0
+
+# Size (in degrees) of the grid cells the edges are bucketed into
+DEFAULT_CELL_DEG = 0.1
+
+# Cell states of the prepared grid
+OUTSIDE, INSIDE, BOUNDARY = 0, 1, 2
+
+
+class PreparedPolygon(object):
+    """
+    Polygon (or several polygons) on the globe, with edges bucketed
+     into a grid of cells over its bounding box. Cells which no edge
+     crosses are classified as inside or outside once, so most points
+     are tested with a single lookup; only points in boundary cells are
+     tested against the edges of their row of cells.
+
+    Edges are straight lines in latitude/longitude, which is what
+     Natural Earth and GeoJSON data assume.
+
+    :param rings: sequence of rings, each being a sequence of (lat, lng)
+     points. Rings are combined with the even-odd rule, so holes are
+     rings inside other rings.
+    :param cell_deg: size of the grid cells (in degrees)
+    """
+
+    def __init__(self, rings, cell_deg=DEFAULT_CELL_DEG):
+        starts, ends = [], []
+        for ring in rings:
+            ring = np.asarray(ring, dtype=np.float64)
+            starts.append(ring)
+            ends.append(np.roll(ring, -1, axis=0))
+        starts = np.concatenate(starts)
+        ends = np.concatenate(ends)
+        self.lat1, self.lng1 = starts[:, 0], starts[:, 1]
+        self.lat2, self.lng2 = ends[:, 0], ends[:, 1]
+
+        self.lat_min, self.lng_min = starts.min(axis=0)
+        self.lat_max, self.lng_max = starts.max(axis=0)
+        self.cell_deg = cell_deg
+        self.nrows = max(1, int(np.ceil((self.lat_max - self.lat_min) / cell_deg)))
+        self.ncols = max(1, int(np.ceil((self.lng_max - self.lng_min) / cell_deg)))
+        self._prepare()
+
+    @classmethod
+    def from_geojson(cls, data, cell_deg=DEFAULT_CELL_DEG):
+        """
+        Makes a polygon from GeoJSON (str or bytes) holding a Polygon or
+         MultiPolygon geometry, a Feature or a FeatureCollection.
+        """
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        obj = json.loads(data)
+        geometries = []
+        pending = [obj]
+        while pending:
+            o = pending.pop()
+            if o['type'] == 'FeatureCollection':
+                pending.extend(o['features'])
+            elif o['type'] == 'Feature':
+                pending.append(o['geometry'])
+            else:
+                geometries.append(o)
+
+        rings = []
+        for g in geometries:
+            polygons = [g['coordinates']] if g['type'] == 'Polygon' else g['coordinates']
+            for polygon in polygons:
+                # GeoJSON positions are (lng, lat)
+                rings.extend([[(lat, lng) for lng, lat in ring[:-1]] for ring in polygon])
+        return cls(rings, cell_deg=cell_deg)
+
+    def _prepare(self):
+        # bucket every edge into the cells its bounding box overlaps
+        buckets = [[] for _ in range(self.nrows * self.ncols)]
+        rows1, rows2 = self._rows(np.minimum(self.lat1, self.lat2)), self._rows(np.maximum(self.lat1, self.lat2))
+        cols1, cols2 = self._cols(np.minimum(self.lng1, self.lng2)), self._cols(np.maximum(self.lng1, self.lng2))
+        for edge, (r1, r2, c1, c2) in enumerate(zip(rows1, rows2, cols1, cols2)):
+            for row in range(r1, r2 + 1):
+                for col in range(c1, c2 + 1):
+                    buckets[row * self.ncols + col].append(edge)
+
+        self.cell_edges = [np.array(b, dtype=np.intp) for b in buckets]
+
+        # the ray cast from a point crosses only edges of its row of cells
+        self.row_edges = []
+        for row in range(self.nrows):
+            edges = buckets[row * self.ncols:(row + 1) * self.ncols]
+            self.row_edges.append(np.unique(np.array(sum(edges, []), dtype=np.intp)))
+
+        # cells which no edge crosses are wholly inside or outside,
+        # so testing their centres is enough
+        self.state = np.full((self.nrows, self.ncols), BOUNDARY, dtype=np.uint8)
+        empty = np.array([not len(b) for b in buckets]).reshape(self.nrows, self.ncols)
+        for row in range(self.nrows):
+            cols = np.nonzero(empty[row])[0]
+            lats = np.full(len(cols), self.lat_min + (row + 0.5) * self.cell_deg)
+            lngs = self.lng_min + (cols + 0.5) * self.cell_deg
+            inside = self._crossings(lats, lngs, self.row_edges[row])
+            self.state[row, cols] = np.where(inside, INSIDE, OUTSIDE)
+
+    def _rows(self, lats):
+        rows = np.floor((np.asarray(lats) - self.lat_min) / self.cell_deg).astype(np.intp)
+        return np.clip(rows, 0, self.nrows - 1)
+
+    def _cols(self, lngs):
+        cols = np.floor((np.asarray(lngs) - self.lng_min) / self.cell_deg).astype(np.intp)
+        return np.clip(cols, 0, self.ncols - 1)
+
+    def _crossings(self, lats, lngs, edges):
+        """
+        Even-odd test of the points against the given edges, casting
+         rays to the east. Horizontal edges never straddle a ray.
+        """
+        lat1, lng1 = self.lat1[edges], self.lng1[edges]
+        lat2, lng2 = self.lat2[edges], self.lng2[edges]
+        lats = np.asarray(lats)[:, np.newaxis]
+        lngs = np.asarray(lngs)[:, np.newaxis]
+        straddles = (lat1 > lats) != (lat2 > lats)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cross_lng = lng1 + (lats - lat1) * (lng2 - lng1) / (lat2 - lat1)
+        crossings = (straddles & (cross_lng > lngs)).sum(axis=1)
+        return crossings % 2 == 1
+
+    def contains(self, lats, lngs):
+        """
+        Checks which of the points are inside the polygon.
+         Returns a boolean array.
+        """
+        lats, lngs = distance.as_arrays(lats, lngs)
+        result = np.zeros(lats.shape, dtype=bool)
+        in_box = (lats >= self.lat_min) & (lats <= self.lat_max) & \
+            (lngs >= self.lng_min) & (lngs <= self.lng_max)
+        idx = np.nonzero(in_box)[0]
+        rows, cols = self._rows(lats[idx]), self._cols(lngs[idx])
+        state = self.state[rows, cols]
+        result[idx[state == INSIDE]] = True
+
+        # points in boundary cells are tested with the edges of their row
+        boundary = np.nonzero(state == BOUNDARY)[0]
+        for row in np.unique(rows[boundary]):
+            in_row = idx[boundary[rows[boundary] == row]]
+            result[in_row] = self._crossings(lats[in_row], lngs[in_row], self.row_edges[row])
+        return result
+
+    def contains_point(self, p):
+        """
+        Returns true, if the polygon contains given point
+        """
+        return bool(self.contains([p.lat], [p.lng])[0])
+
+    def _edge_projections(self, lats, lngs, edges):
+        """
+        Projects the points onto the edges, treating the neighbourhood of
+         each point as flat. Returns the position of the projections along
+         the edges (0 - start, 1 - end) and their distances (in km).
+        """
+        lat1, lng1 = self.lat1[edges], self.lng1[edges]
+        lat2, lng2 = self.lat2[edges], self.lng2[edges]
+        scale = np.cos(np.radians(lats))[:, np.newaxis]
+        # coordinates in km, relative to the points
+        x1 = (lng1 - lngs[:, np.newaxis]) * scale * KM_PER_DEGREE
+        y1 = (lat1 - lats[:, np.newaxis]) * KM_PER_DEGREE
+        x2 = (lng2 - lngs[:, np.newaxis]) * scale * KM_PER_DEGREE
+        y2 = (lat2 - lats[:, np.newaxis]) * KM_PER_DEGREE
+        dx, dy = x2 - x1, y2 - y1
+        length2 = dx * dx + dy * dy
+        t = np.clip(-(x1 * dx + y1 * dy) / np.where(length2 > 0, length2, 1), 0, 1)
+        return t, np.hypot(x1 + t * dx, y1 + t * dy)
+
+    def boundary_distances(self, lats, lngs, edges=None):
+        """
+        Calculates distances (in km) from the points to the closest
+         edge of the polygon (or of the given edges)
+        """
+        lats, lngs = distance.as_arrays(lats, lngs)
+        if edges is None:
+            edges = np.arange(len(self.lat1))
+        _, dists = self._edge_projections(lats, lngs, edges)
+        return dists.min(axis=1)
+
+    def nearest_boundary_point(self, lat, lng):
+        """
+        Returns latitude and longitude of the point on the edge of
+         the polygon closest to given location
+        """
+        edges = np.arange(len(self.lat1))
+        t, dists = self._edge_projections(np.array([lat]), np.array([lng]), edges)
+        edge = int(dists[0].argmin())
+        t = t[0, edge]
+        return (float(self.lat1[edge] + t * (self.lat2[edge] - self.lat1[edge])),
+                float(self.lng1[edge] + t * (self.lng2[edge] - self.lng1[edge])))
+
+    def contains_within(self, lats, lngs, margin_km):
+        """
+        Checks which of the points are inside the polygon or not farther
+         than margin_km from its edge. Returns a boolean array.
+        """
+        lats, lngs = distance.as_arrays(lats, lngs)
+        result = self.contains(lats, lngs)
+
+        # only edges bucketed into cells near the point may be within margin
+        reach_lat = margin_km / KM_PER_DEGREE
+        widest = min(max(abs(self.lat_min), abs(self.lat_max)) + reach_lat, 89.0)
+        reach_lng = reach_lat / np.cos(np.radians(widest))
+        reach_rows = int(np.ceil(reach_lat / self.cell_deg))
+        reach_cols = int(np.ceil(reach_lng / self.cell_deg))
+
+        outside = np.nonzero(~result)[0]
+        outside = outside[(lats[outside] >= self.lat_min - reach_lat) &
+                          (lats[outside] <= self.lat_max + reach_lat) &
+                          (lngs[outside] >= self.lng_min - reach_lng) &
+                          (lngs[outside] <= self.lng_max + reach_lng)]
+        cells = self._rows(lats[outside]) * self.ncols + self._cols(lngs[outside])
+        for cell in np.unique(cells):
+            row, col = divmod(int(cell), self.ncols)
+            edges = [self.cell_edges[r * self.ncols + c]
+                     for r in range(max(row - reach_rows, 0), min(row + reach_rows + 1, self.nrows))
+                     for c in range(max(col - reach_cols, 0), min(col + reach_cols + 1, self.ncols))]
+            edges = np.unique(np.concatenate(edges))
+            if not len(edges):
+                continue
+            points = outside[cells == cell]
+            result[points] = self.boundary_distances(lats[points], lngs[points], edges) <= margin_km
+        return result
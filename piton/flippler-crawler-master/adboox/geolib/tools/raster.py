@@ -0,0 +1,233 @@
+"""
+Contains implementation of an array backed coverage map.
+"""
+import numpy as np
+from math import pi, cos, degrees, radians, sqrt, floor
+from adboox.geolib.tools import EARTH_RADIUS_KM
+from adboox.geolib.tools import distance
+from adboox.geolib.tools.area import Area
+
+# Maximum number of cells tested at once by draw_circles
+DRAW_CHUNK_CELLS = 2 ** 20
+
+
+class GeoCoverageRaster(Area):
+    """
+    Map of a territory, formed from circles around some points, known
+     to be part of the territory. It has the interface of GeoQuadMap,
+     but keeps the map in a boolean raster of 2^max_level x 2^max_level
+     cells, so point lookups take constant time and circles are drawn
+     in batches with array operations.
+
+    A cell is marked as filled if its centre is closer to a circle than
+     the circle's radius plus the half-diagonal of the cell. As with
+     GeoQuadMap, the map may be slightly larger than the circles, but it
+     never misses a part of them.
+
+    cells may be a read-only array (e.g. memory mapped from the geo
+     cache); such a map can be queried, but not drawn on.
+    """
+
+    def __init__(self, p1, p2, max_level=10, cells=None):
+        super(GeoCoverageRaster, self).__init__(p1, p2)
+        self.max_level = max_level
+        size = 2 ** max_level
+        if cells is None:
+            cells = np.zeros((size, size), dtype=bool)
+        self.cells = cells
+        self.dlat = (self.p2.lat - self.p1.lat) / cells.shape[0]
+        self.dlng = (self.p2.lng - self.p1.lng) / cells.shape[1]
+        # cells are widest (in km) at the southern edge
+        self.half_diagonal = sqrt(
+            pow(radians(self.dlat) * EARTH_RADIUS_KM, 2) +
+            pow(radians(self.dlng) * EARTH_RADIUS_KM * cos(radians(self.p1.lat)), 2)) / 2.0
+
+    @property
+    def full(self):
+        return bool(self.cells.all())
+
+    def _rows(self, lats):
+        return np.floor((np.asarray(lats, dtype=np.float64) - self.p1.lat) / self.dlat).astype(np.intp)
+
+    def _cols(self, lngs):
+        return np.floor((np.asarray(lngs, dtype=np.float64) - self.p1.lng) / self.dlng).astype(np.intp)
+
+    def _cell_centres(self, rows, cols):
+        return (self.p1.lat + (np.asarray(rows) + 0.5) * self.dlat,
+                self.p1.lng + (np.asarray(cols) + 0.5) * self.dlng)
+
+    def _window(self, lat, lng, radius):
+        """
+        Returns the ranges of rows and columns of cells, which may
+         intersect the circle
+        """
+        dlat = degrees((radius + self.half_diagonal) / EARTH_RADIUS_KM)
+        widest = min(abs(lat) + dlat, 89.0)
+        dlng = dlat / cos(radians(widest))
+        nrows, ncols = self.cells.shape
+        row_from = max(int(floor((lat - dlat - self.p1.lat) / self.dlat)), 0)
+        row_to = min(int(floor((lat + dlat - self.p1.lat) / self.dlat)) + 1, nrows)
+        col_from = max(int(floor((lng - dlng - self.p1.lng) / self.dlng)), 0)
+        col_to = min(int(floor((lng + dlng - self.p1.lng) / self.dlng)) + 1, ncols)
+        return row_from, row_to, col_from, col_to
+
+    def _window_cells(self, lat, lng, radius):
+        """
+        Returns row and column indexes of the cells intersecting the circle
+        """
+        row_from, row_to, col_from, col_to = self._window(lat, lng, radius)
+        if row_from >= row_to or col_from >= col_to:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+
+        rows, cols = np.mgrid[row_from:row_to, col_from:col_to]
+        rows, cols = rows.ravel(), cols.ravel()
+        lats, lngs = self._cell_centres(rows, cols)
+        near = distance.distances(lat, lng, lats, lngs) <= radius + self.half_diagonal
+        return rows[near], cols[near]
+
+    def draw_circles(self, lats, lngs, radii):
+        """
+        Draws many circles on the map at once, marking
+        contents within the circles as filled.
+        """
+        lats, lngs = distance.as_arrays(lats, lngs)
+        radii = np.broadcast_to(np.asarray(radii, dtype=np.float64), lats.shape)
+        if not len(lats):
+            return
+
+        # window of cells around each circle, as offsets from its centre cell
+        reach = radii.max() + self.half_diagonal
+        span_lat = degrees(reach / EARTH_RADIUS_KM)
+        widest = min(max(abs(self.p1.lat), abs(self.p2.lat)) + span_lat, 89.0)
+        span_lng = span_lat / cos(radians(widest))
+        half_rows = int(np.ceil(span_lat / self.dlat)) + 1
+        half_cols = int(np.ceil(span_lng / self.dlng)) + 1
+        drows, dcols = np.mgrid[-half_rows:half_rows + 1, -half_cols:half_cols + 1]
+        drows, dcols = drows.ravel(), dcols.ravel()
+        nrows, ncols = self.cells.shape
+
+        # circles are drawn in chunks to bound the size of temporary arrays
+        chunk_size = max(1, DRAW_CHUNK_CELLS // len(drows))
+        for start in range(0, len(lats), chunk_size):
+            part = slice(start, start + chunk_size)
+            rows = self._rows(lats[part])[:, np.newaxis] + drows
+            cols = self._cols(lngs[part])[:, np.newaxis] + dcols
+            cell_lats, cell_lngs = self._cell_centres(rows, cols)
+            dists = distance.paired_distances(lats[part, np.newaxis], lngs[part, np.newaxis],
+                                              cell_lats, cell_lngs)
+            hit = (dists <= radii[part, np.newaxis] + self.half_diagonal) & \
+                (rows >= 0) & (rows < nrows) & (cols >= 0) & (cols < ncols)
+            self.cells[rows[hit], cols[hit]] = True
+
+    def draw_circle(self, circle):
+        """
+        Draws a circle on a map, marking
+        contents within the circle as filled.
+        """
+        rows, cols = self._window_cells(circle.lat, circle.lng, circle.radius)
+        self.cells[rows, cols] = True
+
+    def circle_adds_area(self, circle):
+        """
+        Checks if this circle will
+        change something when drawn.
+        """
+        rows, cols = self._window_cells(circle.lat, circle.lng, circle.radius)
+        return not self.cells[rows, cols].all()
+
+    def filled_within(self, circle):
+        """
+        Checks if any filled part of the map lies within the circle.
+        """
+        rows, cols = self._window_cells(circle.lat, circle.lng, circle.radius)
+        return bool(self.cells[rows, cols].any())
+
+    def covering_radius(self, p, circle):
+        """
+        Returns the radius of the smallest circle around point p, which
+         contains every filled part of the map within given circle.
+        """
+        rows, cols = self._window_cells(circle.lat, circle.lng, circle.radius)
+        filled = self.cells[rows, cols]
+        lats, lngs = self._cell_centres(rows[filled], cols[filled])
+        if not len(lats):
+            return 0.0
+        return float(p.distances(lats, lngs).max()) + self.half_diagonal
+
+    def filled_within_circles(self, lats, lngs, radius):
+        """
+        Batch version of filled_within, for circles of equal radius.
+         Returns a boolean array.
+        """
+        lats, lngs = distance.as_arrays(lats, lngs)
+        result = np.zeros(lats.shape, dtype=bool)
+        for n, (lat, lng) in enumerate(zip(lats, lngs)):
+            rows, cols = self._window_cells(lat, lng, radius)
+            result[n] = self.cells[rows, cols].any()
+        return result
+
+    def filled_at_points(self, lats, lngs):
+        """
+        Checks if the map is filled at given points. Returns a boolean array.
+        """
+        rows = self._rows(lats)
+        cols = self._cols(lngs)
+        nrows, ncols = self.cells.shape
+        inside = (rows >= 0) & (rows < nrows) & (cols >= 0) & (cols < ncols)
+        result = np.zeros(rows.shape, dtype=bool)
+        result[inside] = self.cells[rows[inside], cols[inside]]
+        return result
+
+    def filled_at(self, point):
+        """
+        Checks if the map is filled at given point
+        """
+        row = int(floor((point.lat - self.p1.lat) / self.dlat))
+        col = int(floor((point.lng - self.p1.lng) / self.dlng))
+        nrows, ncols = self.cells.shape
+        if 0 <= row < nrows and 0 <= col < ncols:
+            return bool(self.cells[row, col])
+        return False
+
+    def filled_at_circle_edge(self, c):
+        """
+        Checks if the map is filled at the edge of the circle.
+         Actually performs check in 10 points on the circle.
+        """
+        n = 10
+        angles = np.arange(n) * (2.0 * pi / n)
+        dlat = np.degrees(c.radius * np.sin(angles) / EARTH_RADIUS_KM)
+        dlng = np.degrees(c.radius * np.cos(angles) / EARTH_RADIUS_KM / cos(radians(c.lat)))
+        return bool(self.filled_at_points(c.lat + dlat, c.lng + dlng).any())
+
+    def visualize(self, x, y, width, height, draw_function):
+        """
+        Visualizes the map via calling user defined
+        draw_function(x, y, width, height)
+        for each filled cell of the map.
+        """
+        nrows, ncols = self.cells.shape
+        cell_width = float(width) / ncols
+        cell_height = float(height) / nrows
+        for row, col in zip(*np.nonzero(self.cells)):
+            # rows grow to the north, the drawing grows to the bottom
+            draw_function(x + col * cell_width, y + (nrows - row - 1) * cell_height,
+                          cell_width, cell_height)
+
+    def clip(self, polygon):
+        """
+        Clears the cells lying outside given PreparedPolygon. Cells whose
+         centre is within the cell half-diagonal of the polygon are kept,
+         so the map never loses a part of the polygon.
+        """
+        rows, cols = np.nonzero(self.cells)
+        lats, lngs = self._cell_centres(rows, cols)
+        outside = ~polygon.contains_within(lats, lngs, self.half_diagonal)
+        self.cells[rows[outside], cols[outside]] = False
+
+    def set_full(self):
+        """
+        Marks current map as totally filled
+        """
+        self.cells[:] = True
@@ -0,0 +1,51 @@
+"""
+Contains implementation of a cell of an adaptive store finder sweep.
+"""
+from adboox.geolib.tools.geocircle import GeoCircle
+from adboox.geolib.tools.quadtree import GenericGeoQuadTree
+
+
+class SweepCell(GenericGeoQuadTree):
+    """
+    Square area queried with its circumcircle. If the query of a cell
+     hits the result cap of the endpoint, the cell is split into four
+     subcells, which are queried again.
+
+    Cells travel in request meta, so a cell does not keep its subtrees
+     once they are handed out by split.
+    """
+
+    def __init__(self, p1, p2, max_level, level=0, territory=None):
+        super(SweepCell, self).__init__(p1, p2, max_level, level=level)
+        self.territory = territory
+
+    def query_circle(self):
+        """
+        Returns the smallest circle containing the whole cell
+        """
+        return GeoCircle((self.p1.lat + self.p2.lat) / 2.0,
+                         (self.p1.lng + self.p2.lng) / 2.0,
+                         self.p1.distance(self.p2) / 2.0)
+
+    def split(self, quad_map=None):
+        """
+        Returns the four subcells of the cell, leaving out those
+         which do not touch filled parts of the given quad map.
+         Cells at max_level are not split any more.
+        """
+        if self.level >= self.max_level:
+            return []
+
+        self.make_subtrees()
+        subtrees, self._subtrees = self._subtrees, []
+        if quad_map is None:
+            return subtrees
+
+        return [s for s in subtrees if quad_map.filled_within(s.query_circle())]
+
+    def _instantiate_subtree(self, *args, **kwargs):
+        """
+        Override base class' method. Need to pass max_level and territory
+        constructor parameters.
+        """
+        return self.__class__(*args, max_level=self.max_level, territory=self.territory, **kwargs)
@@ -4,7 +4,8 @@ from urllib.parse import urljoin
 from w3lib import html
 from scrapy import Item, Field
 from scrapy.loader import ItemLoader
-from itemloaders.processors import Identity, TakeFirst, MapCompose
+from itemloaders.utils import arg_to_iter
+from itemloaders.processors import Identity, TakeFirst
 
 _clean_spaces_re = re.compile("\s+", re.U)
 
@@ -44,6 +45,32 @@ def split(value):
 def strip(value):
     return value.strip()
 
+
+def normalize_text(value):
+    """
+    Same as replace_br, remove_tags, unquote_markup, replace_escape, strip
+     and clean_spaces applied in turn. Steps which can not change the value
+     are skipped, so text without markup is normalized in a single pass.
+    """
+    if '<' in value:
+        value = html.remove_tags(replace_br(value))
+    if '&' in value or '<![CDATA[' in value:
+        value = html.unquote_markup(value)
+    # str.split splits on the characters re matches with \s
+    return ' '.join(value.split())
+
+
+class NormalizeText(object):
+    """
+    Input processor equivalent to MapCompose(normalize_text), without its
+     per call overhead; a single string is processed directly.
+    """
+
+    def __call__(self, value):
+        if isinstance(value, str):
+            return [normalize_text(value)]
+        return [normalize_text(v) for v in arg_to_iter(value)]
+
 class BaseItem(Item):
     def to_dict(self):
         return {
@@ -99,8 +126,9 @@ class LoaderMixin(object):
 
 class StoreLoader(LoaderMixin, ItemLoader):
     default_item_class = StoreItem
-    default_input_processor = MapCompose(replace_br, html.remove_tags, html.unquote_markup,
-                                         replace_escape, strip, clean_spaces)
+    # same as MapCompose(replace_br, html.remove_tags, html.unquote_markup,
+    #                    replace_escape, strip, clean_spaces)
+    default_input_processor = NormalizeText()
     default_output_processor = TakeFirst()
 
     Monday_in = Identity()
@@ -0,0 +1,199 @@
+"""
+Resident launcher of spider jobs (run.py --serve). The launcher imports
+ scrapy, twisted and all spiders and opens the shared datasets once, then
+ forks a child per job, which starts crawling right away.
+
+Jobs are JSON files in a job directory, submitted by run.py --submit:
+
+    {"spider": "1-stores", "args": {"shard": "1/4"}, "settings": {}}
+
+A job file moves through the states <id>.job (queued), <id>.running and
+ <id>.done or <id>.failed. The child writes the log of the crawl to
+ <id>.log and its finish reason and stats to <id>.result.
+
+The reactor must not be installed before the fork, so preloading imports
+ twisted modules but never twisted.internet.reactor.
+"""
+import os
+import sys
+import json
+import time
+import importlib
+import errno
+import signal
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+JOB, RUNNING, DONE, FAILED = '.job', '.running', '.done', '.failed'
+
+
+def submit(job_dir, spider, args=None, settings=None):
+    """
+    Queues a job in the job directory and returns its id
+    """
+    job = {'spider': spider, 'args': args or {}, 'settings': settings or {}}
+    fd, tmp_path = tempfile.mkstemp(dir=job_dir, prefix='.tmp-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(job, f)
+    # ids sort in order of submission
+    job_id = '{:.6f}-{}-{}'.format(time.time(), os.getpid(), spider)
+    os.rename(tmp_path, os.path.join(job_dir, job_id + JOB))
+    return job_id
+
+
+def preload(settings):
+    """
+    Imports the modules and opens the datasets jobs share. Whatever is
+     loaded here is inherited by the forked jobs, with memory pages shared
+     until they are written to.
+    """
+    importlib.import_module('scrapy.crawler')
+    from scrapy.spiderloader import get_spider_loader
+    from adboox.geolib.locations.germany import GermanyInfoCache, germany_border
+    from adboox.geolib.locations.geocoder import germany_geocoder
+    from adboox.utils.cities import de_cities_dataset
+
+    loader = get_spider_loader(settings)
+    for name in loader.list():
+        loader.load(name)
+    de_cities_dataset()
+    GermanyInfoCache().get()
+    germany_border()
+    germany_geocoder()
+    if 'twisted.internet.reactor' in sys.modules:
+        raise RuntimeError('A reactor was installed while preloading, jobs can not be forked')
+
+
+def run_job(settings, job_dir, job_id, job):
+    """
+    Runs the crawl of a job in the current (forked) process and writes
+     its result. Returns the exit status.
+    """
+    from scrapy.crawler import CrawlerProcess
+
+    settings = settings.copy()
+    settings.setdict(job.get('settings') or {}, priority='cmdline')
+    settings.set('LOG_FILE', os.path.join(job_dir, job_id + '.log'), priority='cmdline')
+    process = CrawlerProcess(settings)
+    crawler = process.create_crawler(job['spider'])
+    errors = []
+    d = process.crawl(crawler, **(job.get('args') or {}))
+    d.addErrback(lambda failure: errors.append(failure.getTraceback()))
+    process.start()
+
+    try:
+        stats = crawler.stats.get_stats()
+    except (AttributeError, RuntimeError):
+        # the crawl failed before it started
+        stats = {}
+    result = {
+        'spider': job['spider'],
+        'finish_reason': stats.get('finish_reason'),
+        'errors': errors,
+        'stats': json.loads(json.dumps(stats, default=str)),
+    }
+    with open(os.path.join(job_dir, job_id + '.result'), 'w') as f:
+        json.dump(result, f, indent=2, sort_keys=True)
+    return 0 if result['finish_reason'] == 'finished' else 1
+
+
+class Launcher(object):
+    """
+    Polls the job directory and forks a child per job, running at most
+     max_jobs of them at once.
+
+    :param settings: project settings, shared by all jobs
+    :param job_dir: directory of the job files
+    :param max_jobs: maximum number of jobs running at once
+    :param poll_interval: seconds between scans of the job directory
+    """
+
+    def __init__(self, settings, job_dir, max_jobs=None, poll_interval=0.2):
+        self.settings = settings
+        self.job_dir = job_dir
+        self.max_jobs = max_jobs or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.children = {}
+        self.stopping = False
+
+    def _path(self, job_id, state):
+        return os.path.join(self.job_dir, job_id + state)
+
+    def pending(self):
+        """
+        Returns ids of the queued jobs, oldest first
+        """
+        return sorted(name[:-len(JOB)] for name in os.listdir(self.job_dir)
+                      if name.endswith(JOB) and not name.startswith('.'))
+
+    def start(self):
+        if not os.path.isdir(self.job_dir):
+            os.makedirs(self.job_dir)
+        started = time.time()
+        preload(self.settings)
+        logger.info('Preloaded in %.2f s, waiting for jobs in %s', time.time() - started, self.job_dir)
+
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        while not self.stopping or self.children:
+            self.reap()
+            if not self.stopping:
+                for job_id in self.pending()[:self.max_jobs - len(self.children)]:
+                    self.launch(job_id)
+            time.sleep(self.poll_interval)
+
+    def _stop(self, signum, frame):
+        logger.info('Stopping, waiting for %s running jobs', len(self.children))
+        self.stopping = True
+
+    def launch(self, job_id):
+        try:
+            # claiming the job by renaming it, so it is never run twice
+            os.rename(self._path(job_id, JOB), self._path(job_id, RUNNING))
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return
+            raise
+
+        try:
+            with open(self._path(job_id, RUNNING)) as f:
+                job = json.load(f)
+        except (IOError, ValueError) as e:
+            logger.error('Invalid job %s: %s', job_id, e)
+            os.rename(self._path(job_id, RUNNING), self._path(job_id, FAILED))
+            return
+
+        pid = os.fork()
+        if pid == 0:
+            status = 1
+            try:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                status = run_job(self.settings, self.job_dir, job_id, job)
+            except BaseException:
+                logger.exception('Job %s failed', job_id)
+            finally:
+                logging.shutdown()
+                os._exit(status)
+
+        logger.info('Started job %s (%s) in process %s', job_id, job['spider'], pid)
+        self.children[pid] = job_id
+
+    def reap(self):
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if not pid:
+                return
+
+            job_id = self.children.pop(pid, None)
+            if job_id is None:
+                continue
+            ok = os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0
+            os.rename(self._path(job_id, RUNNING), self._path(job_id, DONE if ok else FAILED))
+            logger.info('Job %s %s', job_id, 'done' if ok else 'failed')
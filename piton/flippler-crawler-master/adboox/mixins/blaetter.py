@@ -1,15 +1,12 @@
 from __future__ import unicode_literals
 import logging
 from urllib.parse import urljoin
-from collections import defaultdict
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
 
 class BlaetterkatalogMixin(object):
-    resource_valid_dates = defaultdict(lambda: [])
-
     def catalog_page_failed(self, failure):
         request = failure.request
         resource_key = request.meta.get('resource_key')
@@ -35,7 +32,9 @@ class BlaetterkatalogMixin(object):
             url = base_path + prefix + str(i) + '.' + ext
             resource.urls.append(url)
 
-        ignore_date_parsing = response.meta.get('ignore_date_parsing', False)
+        # a window found with the catalog link (Netto) takes precedence
+        ignore_date_parsing = response.meta.get('ignore_date_parsing', False) or \
+            self.resources.valid_between(resource_key) is not None
 
         if not ignore_date_parsing:
             try:
@@ -43,11 +42,12 @@ class BlaetterkatalogMixin(object):
                 valid_to_raw = response.xpath('//valid/to/text()').extract_first()
                 valid_from = self.parse_valid_dt(valid_from_raw)
                 valid_to = self.parse_valid_dt(valid_to_raw)
-                valid_between_key = valid_from + '-' + valid_to
-                self.resource_valid_dates[valid_between_key].append(resource_key)
+                self.resources.set_valid_between(resource_key, valid_from, valid_to)
             except Exception as ex:
                 logger.error('Unable to get valid dates for {} (error: {})'.format(response.url, ex))
 
+        self.resource_finished(resource_key)
+
     @staticmethod
     def parse_valid_dt(dt_raw):
         try:
@@ -57,19 +57,6 @@ class BlaetterkatalogMixin(object):
 
     def gen_resource_report(self, resource):
         report = super(BlaetterkatalogMixin, self).gen_resource_report(resource)
-        resource_key = ([k for k, v in self.resources.items() if v == resource] or [None])[0]
-        if not resource_key:
-            logger.error('Unable to find resource key for {}'.format(resource))
-            return report
-
-        valid_between = [k for k, v in self.resource_valid_dates.items() if resource_key in v]
-        if not valid_between:
+        if 'ValidBetween' not in report:
             logger.error('Unable to find valid between dates for resource {}'.format(resource))
-            return report
-
-        valid_from, valid_to = valid_between[0].split('-', 1)
-        report['ValidBetween'] = {
-            'StartDate': valid_from,
-            'EndDate': valid_to
-        }
         return report
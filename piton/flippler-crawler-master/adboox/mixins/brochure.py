@@ -23,7 +23,8 @@ class DirectBrochureDownloadMixin(object):
             return False
         else:
             stores = [store] if store else []
-            resource = Resource.from_kw(urls=[url], stores=stores, key=resource_key, type='Pdf')
+            resource = Resource.from_kw(urls=[url], stores=stores, key=resource_key, type='Pdf',
+                                       store_index=self.store_index)
             self.resources[resource_key] = resource
             return True
 
@@ -0,0 +1,101 @@
+import logging
+from adboox.geolib.locations.germany import GermanyQueryPlanner, DEFAULT_TERRITORIES
+from adboox.geolib.tools.partition import parse_shard
+
+logger = logging.getLogger(__name__)
+
+
+class GeoSweepMixin(object):
+    """
+    Sweeps Germany with radius searches planned by GermanyQueryPlanner.
+
+    search_radius is the effective search radius (in km) of the store finder.
+    Endpoints that are queried by zipcode or city name should set snap_km,
+    so that the query locations are moved to zipcode centroids.
+    Endpoints which search within their own fixed radius should set
+    fixed_radius, so that query locations are never planned with a radius
+    larger than search_radius.
+    Spiders implement make_search_request(location, n), location being a
+    GeoCircleWithMeta with zipcode and city in its meta. Its radius is the
+    radius the query has to cover.
+
+    With sweep_mode 'adaptive', coarse cells are queried first. Spiders
+    pass the number of results of a response to refine_search, which
+    re-queries the subcells of a cell whose response hit max_results.
+    Other sweeps can not be refined; capped responses are logged and
+    counted in the sweep/capped_results stat.
+
+    With shard set to 'k/N' (spider argument, e.g. -a shard=2/4), the spider
+    sweeps only the k-th of N balanced parts of Germany, so N processes
+    can split one national sweep. territories selects the partition of
+    Germany the sweep is planned on (see geolib.locations.germany.TERRITORIES).
+    """
+    search_radius = None
+    snap_km = 0
+    fixed_radius = False
+    sweep_mode = 'plan'
+    max_results = None
+    max_sweep_level = 10
+    shard = None
+    territories = DEFAULT_TERRITORIES
+
+    def make_search_request(self, location, n):
+        raise NotImplementedError
+
+    def search_requests(self):
+        # spider arguments are passed as strings
+        radius = float(self.search_radius)
+        max_radius = radius if self.fixed_radius else None
+        self.planner = GermanyQueryPlanner(radius, float(self.snap_km), self.territories, max_radius)
+        self.sweep_requests = 0
+        shard = parse_shard(self.shard) if self.shard else None
+
+        if self.sweep_mode == 'adaptive':
+            max_level = int(self.max_sweep_level)
+            if shard:
+                cells = self.planner.shard_cells(shard[0], shard[1], max_level)
+            else:
+                cells = list(self.planner.sweep_cells(max_level))
+            logger.info('Sweeping %s cells adaptively (radius: %s km, shard: %s)',
+                        len(cells), radius, self.shard)
+            for cell in cells:
+                yield self.make_cell_request(cell)
+        else:
+            locations = self.planner.shard(*shard) if shard else list(self.planner)
+            logger.info('Sweeping %s locations (radius: %s km, shard: %s)',
+                        len(locations), radius, self.shard)
+            for location in locations:
+                yield self.make_search_request(location, self.next_sweep_number())
+
+    def make_cell_request(self, cell):
+        location = self.planner.locate(cell)
+        request = self.make_search_request(location, self.next_sweep_number())
+        request.meta['sweep_cell'] = cell
+        return request
+
+    def next_sweep_number(self):
+        n = self.sweep_requests
+        self.sweep_requests += 1
+        return n
+
+    def refine_search(self, response, n_results):
+        """
+        Returns requests for the subcells of the cell queried by response,
+        if the number of its results hit the result cap of the endpoint.
+        """
+        if not self.max_results or n_results < int(self.max_results):
+            return []
+
+        cell = response.meta.get('sweep_cell')
+        if cell is None:
+            # planned (not adaptive) sweeps can not be refined
+            self.crawler.stats.inc_value('sweep/capped_results')
+            logger.warning('Results are capped at %s and the search can not be refined (%s)',
+                           self.max_results, response.url)
+            return []
+
+        subcells = self.planner.split(cell)
+        if not subcells:
+            logger.warning('Results are capped at the finest sweep level (cell: %s - %s)',
+                           (cell.p1.lat, cell.p1.lng), (cell.p2.lat, cell.p2.lng))
+        return [self.make_cell_request(subcell) for subcell in subcells]
@@ -1,7 +1,7 @@
-import json
-from adboox.utils.encoders import ItemEncoder
+from adboox.utils.accumulator import store_accumulator
+from adboox.utils.report import iter_json
 from scrapy.exceptions import DontCloseSpider
-from scrapy.signals import spider_idle
+from scrapy.signals import spider_idle, spider_closed, item_scraped, item_dropped, item_error
 
 
 class SendStoresWhenIdleMixin(object):
@@ -11,15 +11,30 @@ class SendStoresWhenIdleMixin(object):
     @classmethod
     def from_crawler(cls, crawler, *a, **kw):
         spider = super(SendStoresWhenIdleMixin, cls).from_crawler(crawler, *a, **kw)
+        # keyed by store id, see adboox.utils.accumulator
+        spider.stores = spider.store_accumulator = store_accumulator()
         crawler.signals.connect(spider.spider_idle, spider_idle)
+        crawler.signals.connect(spider.store_scraped, item_scraped)
+        crawler.signals.connect(spider.store_dropped, item_dropped)
+        crawler.signals.connect(spider.store_dropped, item_error)
+        crawler.signals.connect(spider.close_stores, spider_closed)
         return spider
 
+    def store_scraped(self, item, spider):
+        self.store_accumulator.item_scraped(item)
+
+    def store_dropped(self, item, spider):
+        self.store_accumulator.item_dropped(item)
+
+    def close_stores(self, spider):
+        self.store_accumulator.close()
+
     def spider_idle(self, spider):
         if self.stores:
-            stores = list(self.stores.values())
+            stores = self.stores.values()
             if self.outfile:
                 with open(self.outfile, 'w') as f:
-                    json.dump(stores, f, cls=ItemEncoder)
+                    f.writelines(iter_json(stores))
             r = self.send_results(stores)
             spider.crawler.engine.schedule(r, spider)
             self.stores = None
@@ -4,8 +4,110 @@
 #
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: http://doc.scrapy.org/en/latest/topics/item-pipeline.html
+import logging
+from adboox.geolib.locations.germany import germany_border
+from adboox.geolib.locations.geocoder import germany_geocoder, normalize_postcode
+from adboox.geolib.tools.geopoint import GeoPoint
+
+logger = logging.getLogger(__name__)
 
 
 class AdbooxPipeline(object):
     def process_item(self, item, spider):
         return item
+
+
+class GeocodingPipeline(object):
+    """
+    Normalizes PostCode to a string of five digits and completes stores
+     with the geocoder of de_cities: a missing GeoLocation is set to the
+     centroid of the PostCode, a missing PostCode (and City) to those of
+     the zipcode closest to the GeoLocation. Stores whose GeoLocation lies
+     farther than GEOCODING_MAX_MISMATCH_KM from the centroid of their
+     PostCode are counted. A PostCode or GeoLocation which can not be
+     parsed is counted and left as it is.
+    """
+
+    def __init__(self, stats, max_mismatch_km):
+        self.stats = stats
+        self.max_mismatch_km = max_mismatch_km
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats, crawler.settings.getfloat('GEOCODING_MAX_MISMATCH_KM', 30))
+
+    def process_item(self, item, spider):
+        raw_postcode = item.get('PostCode')
+        missing_postcode = raw_postcode is None or not str(raw_postcode).strip()
+        postcode = normalize_postcode(raw_postcode)
+        if postcode:
+            item['PostCode'] = postcode
+        elif not missing_postcode:
+            # kept as scraped, it is not replaced by a geocoded one
+            self.stats.inc_value('stores/invalid_postcode')
+            logger.debug('Store %s has an invalid PostCode %r', item.get('StoreId'), raw_postcode)
+
+        geo = item.get('GeoLocation')
+        if not postcode and not geo:
+            return item
+
+        location = None
+        if geo:
+            try:
+                location = float(geo['Lat']), float(geo['Lon'])
+            except (KeyError, TypeError, ValueError):
+                # GermanyBorderPipeline counts stores/invalid_geolocation
+                self.stats.inc_value('stores/geocoding_skipped')
+                logger.debug('Store %s has an invalid GeoLocation %r', item.get('StoreId'), geo)
+                return item
+
+        geocoder = germany_geocoder()
+        centroid = geocoder.locate(postcode) if postcode else None
+        if location is None and centroid is not None:
+            item['GeoLocation'] = {'Lat': str(centroid.lat), 'Lon': str(centroid.lng)}
+            self.stats.inc_value('stores/geocoded_location')
+        elif location is not None and missing_postcode:
+            zipcode, city, _ = geocoder.reverse(*location)
+            if zipcode:
+                item['PostCode'] = zipcode
+                if not item.get('City'):
+                    item['City'] = city
+                self.stats.inc_value('stores/geocoded_postcode')
+        elif location is not None and centroid is not None:
+            if centroid.distance(GeoPoint(*location)) > self.max_mismatch_km:
+                self.stats.inc_value('stores/postcode_mismatch')
+                logger.debug('Store %s lies far from its postcode %s (%s, %s)',
+                             item.get('StoreId'), postcode, *location)
+        return item
+
+
+class GermanyBorderPipeline(object):
+    """
+    Counts and logs stores, whose GeoLocation lies farther than
+     STORE_BORDER_MARGIN_KM outside the border of Germany. Those are
+     usually geocoding errors of the store finder.
+    """
+
+    def __init__(self, stats, margin_km):
+        self.stats = stats
+        self.margin_km = margin_km
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats, crawler.settings.getfloat('STORE_BORDER_MARGIN_KM', 5))
+
+    def process_item(self, item, spider):
+        geo = item.get('GeoLocation')
+        if not geo:
+            return item
+
+        try:
+            lat, lng = float(geo['Lat']), float(geo['Lon'])
+        except (KeyError, TypeError, ValueError):
+            self.stats.inc_value('stores/invalid_geolocation')
+            return item
+
+        if not germany_border().contains_within([lat], [lng], self.margin_km)[0]:
+            self.stats.inc_value('stores/outside_border')
+            logger.warning('Store %s lies outside of Germany (%s, %s)', item.get('StoreId'), lat, lng)
+        return item
@@ -1,14 +1,43 @@
+import json
 import logging
-import sys
+import argparse
 
 from scrapy.crawler import CrawlerProcess
+from scrapy.utils.log import configure_logging
 from scrapy.utils.project import get_project_settings
 
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Runs a spider, or serves jobs from a job directory')
+    parser.add_argument('spider', nargs='?', help='name of the spider to run')
+    parser.add_argument('-a', dest='args', action='append', default=[], metavar='NAME=VALUE',
+                        help='spider argument (may be repeated)')
+    parser.add_argument('--serve', metavar='JOB_DIR',
+                        help='preload spiders and datasets once, then fork a process per job in JOB_DIR')
+    parser.add_argument('--submit', metavar='JOB_DIR', help='queue the spider as a job in JOB_DIR')
+    parser.add_argument('--max-jobs', type=int, default=None, help='jobs running at once (--serve)')
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    process = CrawlerProcess(settings=get_project_settings())
-    spider_name = sys.argv[1]
-    if spider_name in process.spider_loader.list():
-        process.crawl(spider_name)
-        process.start()
+    opts = parse_args()
+    settings = get_project_settings()
+    spider_args = dict(a.split('=', 1) for a in opts.args)
+
+    if opts.serve:
+        from adboox.launcher import Launcher
+        configure_logging(settings)
+        Launcher(settings, opts.serve, max_jobs=opts.max_jobs).start()
+    elif opts.submit:
+        if not opts.spider:
+            raise SystemExit('--submit needs the name of a spider')
+        from adboox.launcher import submit
+        print(json.dumps({'job': submit(opts.submit, opts.spider, spider_args)}))
     else:
-        logging.error("there is no spider for '{}'".format(spider_name))
+        process = CrawlerProcess(settings=settings)
+        spider_name = opts.spider
+        if spider_name in process.spider_loader.list():
+            process.crawl(spider_name, **spider_args)
+            process.start()
+        else:
+            logging.error("there is no spider for '{}'".format(spider_name))
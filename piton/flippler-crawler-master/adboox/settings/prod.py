@@ -15,6 +15,12 @@ BOT_NAME = 'adboox'
 
 SPIDER_MODULES = ['adboox.spiders']
 NEWSPIDER_MODULE = 'adboox.spiders'
+# spiders are listed from adboox/data/spiders.json (`scrapy spidermanifest`)
+# and only the module of the spider a job runs is imported
+SPIDER_LOADER_CLASS = 'adboox.spiderloader.LazySpiderLoader'
+COMMANDS_MODULE = 'adboox.commands'
+# `scrapy startuptime` fails if a job takes longer to load its spider
+STARTUP_TIME_BUDGET_MS = 1500
 
 USER_AGENTS = [
     'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/49.0.2623.87 Safari/537.36',
@@ -30,6 +36,36 @@ DOWNLOADER_MIDDLEWARES = {
 
 DOWNLOAD_HANDLERS = {'s3': None}
 
+ITEM_PIPELINES = {
+    'adboox.pipelines.GeocodingPipeline': 200,
+    'adboox.pipelines.GermanyBorderPipeline': 300,
+}
+# stores farther than this outside the border are reported as suspicious
+STORE_BORDER_MARGIN_KM = 5
+# stores farther than this from the centroid of their postcode are counted as mismatches
+GEOCODING_MAX_MISMATCH_KM = 30
+EXTENSIONS = {
+    'adboox.extensions.ParseCacheExtension': 500,
+}
+# parse results of rarely changing resources (adboox.utils.memo); the
+# directory must be private to the crawler's user, None for ~/.cache/adboox
+PARSE_CACHE_ENABLED = True
+PARSE_CACHE_DIR = None
+PARSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+PARSE_CACHE_TTL = 7 * 24 * 3600
+
+# reports are POSTed to the notification url as gzip compressed chunks of at
+# most REPORT_CHUNK_BYTES (adboox.utils.report); the receiver must support it
+REPORT_CHUNKED = False
+REPORT_CHUNK_BYTES = 1024 * 1024
+# brochure resources are reported as soon as they are finished, followed by a
+# final report reconciling their stores; the receiver must support it
+REPORT_PROGRESSIVE = False
+# stores of store spiders are collected in a temporary sqlite database under
+# STORE_ACCUMULATOR_DIR (the temp directory if None), see adboox.utils.accumulator
+STORE_ACCUMULATOR = 'adboox.utils.accumulator.SqliteStoreAccumulator'
+STORE_ACCUMULATOR_DIR = None
+
 # COOKIES_DEBUG = True
 AUTOTHROTTLE_ENABLED = True
 FILESERVER_PATH = '/data'
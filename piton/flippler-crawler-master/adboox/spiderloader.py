@@ -0,0 +1,159 @@
+"""
+Spider loader backed by a generated manifest (adboox/data/spiders.json),
+ which maps spider names to their modules and classes. Jobs import only
+ the module of the spider they run, instead of every spider module.
+
+The manifest is generated by `scrapy spidermanifest`. It records a hash
+ of the sources of the spider modules; if they changed since, the loader
+ falls back to scrapy's SpiderLoader, which imports all of them.
+"""
+import os
+import json
+import pkgutil
+import hashlib
+import logging
+from importlib import import_module
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PATH = 'data/spiders.json'
+MANIFEST_VERSION = 1
+
+
+def iter_module_files(packages):
+    """
+    Yields (module name, file path) of the modules of the packages,
+     recursively and sorted, importing only the packages themselves
+    """
+    for package_name in packages:
+        package = import_module(package_name)
+        yield package_name, package.__file__
+        paths = getattr(package, '__path__', None)
+        if not paths:
+            continue
+        infos = sorted(pkgutil.iter_modules(paths), key=lambda info: info.name)
+        for info in infos:
+            name = '{}.{}'.format(package_name, info.name)
+            if info.ispkg:
+                for item in iter_module_files([name]):
+                    yield item
+            else:
+                yield name, os.path.join(info.module_finder.path, info.name + '.py')
+
+
+def sources_hash(packages):
+    """
+    Returns hash of the names and sources of the modules of the packages
+    """
+    h = hashlib.sha1()
+    for name, path in iter_module_files(packages):
+        h.update(name.encode('utf-8') + b'\0')
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def build_manifest(packages):
+    """
+    Imports all modules of the packages and returns the manifest of
+     their spiders
+    """
+    from scrapy.utils.spider import iter_spider_classes
+    try:
+        from scrapy.utils.misc import walk_modules_iter as walk_modules
+    except ImportError:
+        from scrapy.utils.misc import walk_modules
+
+    spiders = {}
+    for package_name in packages:
+        for module in walk_modules(package_name):
+            for cls in iter_spider_classes(module):
+                spiders[cls.name] = {'module': module.__name__, 'class': cls.__name__}
+    return {
+        'version': MANIFEST_VERSION,
+        'packages': list(packages),
+        'sources': sources_hash(packages),
+        'spiders': dict(sorted(spiders.items())),
+    }
+
+
+def manifest_file():
+    return os.path.join(os.path.dirname(__file__), MANIFEST_PATH)
+
+
+def write_manifest(manifest, path=None):
+    with open(path or manifest_file(), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def read_manifest(packages):
+    """
+    Returns the manifest of the packages, or None if it is missing
+     or outdated
+    """
+    try:
+        manifest = json.loads(pkgutil.get_data('adboox', MANIFEST_PATH).decode('utf-8'))
+    except (IOError, OSError, ValueError):
+        logger.warning('Spider manifest %s is missing or invalid', MANIFEST_PATH)
+        return None
+
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('packages') != list(packages):
+        logger.warning('Spider manifest %s was built for other spider modules', MANIFEST_PATH)
+        return None
+    try:
+        outdated = manifest.get('sources') != sources_hash(packages)
+    except (ImportError, IOError, OSError):
+        outdated = True
+    if outdated:
+        logger.warning('Spider manifest %s is outdated, run `scrapy spidermanifest`', MANIFEST_PATH)
+        return None
+    return manifest
+
+
+class LazySpiderLoader(object):
+    """
+    Spider loader (SPIDER_LOADER_CLASS) which lists spiders from the
+     manifest and imports the module of a spider when it is loaded.
+     Without a valid manifest it behaves like scrapy's SpiderLoader.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.spider_modules = settings.getlist('SPIDER_MODULES')
+        self.manifest = read_manifest(self.spider_modules)
+        self._spiders = {}
+        self._loader = None
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(settings)
+
+    def _fallback(self):
+        if self._loader is None:
+            from scrapy.spiderloader import SpiderLoader
+            self._loader = SpiderLoader(self.settings)
+        return self._loader
+
+    def load(self, spider_name):
+        if self.manifest is None:
+            return self._fallback().load(spider_name)
+
+        if spider_name not in self._spiders:
+            try:
+                entry = self.manifest['spiders'][spider_name]
+            except KeyError:
+                raise KeyError('Spider not found: {}'.format(spider_name))
+            module = import_module(entry['module'])
+            self._spiders[spider_name] = getattr(module, entry['class'])
+        return self._spiders[spider_name]
+
+    def list(self):
+        if self.manifest is None:
+            return self._fallback().list()
+        return list(self.manifest['spiders'].keys())
+
+    def find_by_request(self, request):
+        if self.manifest is None:
+            return self._fallback().find_by_request(request)
+        return [name for name in self.list() if self.load(name).handles_request(request)]
@@ -1,13 +1,11 @@
 from __future__ import unicode_literals
 import os
 import re
-import json
 import logging
 import tempfile
 from urllib.parse import urljoin
 import hashlib
 import shutil
-import pprint
 from datetime import datetime
 from scrapy import signals
 from scrapy.http.request import Request
@@ -16,7 +14,8 @@ from scrapy.exceptions import DontCloseSpider
 from adboox import settings
 from adboox.exceptions import FatalError
 from adboox.utils.os_level import fix_permissions
-from adboox.utils.encoders import ItemEncoder
+from adboox.utils.report import ChunkedReport, iter_json, report_summary
+from adboox.utils.types import ResourceRegistry, StoreIndex
 from adboox.utils.url import get_ext_from_url
 
 logger = logging.getLogger(__name__)
@@ -51,10 +50,15 @@ class BaseAdbooxSpider(Spider):
         logger.error('Unable to notify {} about job {}'.format(self.notification_url, self.jobid))
 
     def send_data(self, data):
-        logger.info('Sending report: {}'.format(pprint.pformat(data)))
+        logger.info('Sending report: %s', report_summary(data))
+        if getattr(settings, 'REPORT_CHUNKED', False):
+            report = ChunkedReport(self.notification_url, data, getattr(settings, 'REPORT_CHUNK_BYTES', 1024 * 1024),
+                                   errback=self.notification_failed)
+            return report.next_request()
+
         headers = {'Content-Type': 'application/json'}
         r = Request(url=self.notification_url, method='POST', headers=headers,
-                    body=json.dumps(data, cls=ItemEncoder),
+                    body=''.join(iter_json(data)),
                     callback=lambda _: None, errback=self.notification_failed, dont_filter=True,
                     meta={'dont_proxy': True})
         return r
@@ -85,6 +89,8 @@ class BaseAdbooxBrochureSpider(BaseAdbooxSpider):
     stores = ''
     download_warnsize = 0
     resource_sorted = False
+    # report every resource once it is finished instead of all at the end
+    progressive_reports = getattr(settings, 'REPORT_PROGRESSIVE', False)
 
     def __init__(self, *a, **kw):
         super(BaseAdbooxBrochureSpider, self).__init__(*a, **kw)
@@ -94,8 +100,13 @@ class BaseAdbooxBrochureSpider(BaseAdbooxSpider):
         stores = [s for s in stores if s]
         self.stores = stores
         self.total_stores = len(self.stores)
-        self.resources = {}
-        self.invalid_stores = []
+        # store ids of the crawl, interned to the bits of the StoreSets of resources
+        self.store_index = StoreIndex(self.stores)
+        self.all_stores = self.store_index.store_set(self.stores)
+        self.resources = ResourceRegistry()
+        self.invalid_stores = self.store_index.store_set()
+        # resource key -> ResourceId of the resources reported progressively
+        self.reported_resources = {}
 
         self.fileserver_url = urljoin(
             getattr(settings, 'FILESERVER_URL'), self.save_dir + '/')
@@ -109,79 +120,146 @@ class BaseAdbooxBrochureSpider(BaseAdbooxSpider):
         spider = super(BaseAdbooxBrochureSpider, cls).from_crawler(crawler, *a, **kw)
         # Most of task waiting will be done in spider_idle function.
         crawler.signals.connect(spider.spider_idle, signals.spider_idle)
+        crawler.signals.connect(spider.spider_closed, signals.spider_closed)
         return spider
 
+    def spider_closed(self, spider):
+        self.resources.clear()
+
     def spider_idle(self, spider):
         if not self.reports_send:
             # Resource collection is done, report it now.
-            results = self.get_resource_results()
+            results = self.get_resource_results(exclude=self.reported_resources)
             reports = self.gen_reports()
             reports.update(dict(Version='1.3', CrawlerType='SN'))
+            if self.progressive_reports:
+                reports['Reconciliation'] = self.gen_reconciliation()
             r = self.send_results(results, **reports)
             spider.crawler.engine.schedule(r, spider)
             self.resources.clear()
             raise DontCloseSpider
 
-    def get_resource_results(self):
+    def resource_finished(self, resource_key):
+        """
+        Called by the spiders and mixins once the urls and the validity dates
+         of a resource are known. With progressive reports the resource is
+         reported right away; stores which get it later are sent with the
+         reconciliation in the final report.
+        """
+        if not self.progressive_reports or resource_key in self.reported_resources:
+            return
+        resource = self.resources.get(resource_key)
+        result = resource and self.get_resource_result(resource)
+        if not result:
+            return
+
+        result['ResourceId'] = str(resource_key)
+        self.reported_resources[resource_key] = result['ResourceId']
+        data = {
+            'JobId': self.jobid,
+            'Status': 'partial',
+            'Results': [result],
+            'CrawlTime': self.started_at.isoformat(),
+            'Version': '1.3',
+            'CrawlerType': 'SN'
+        }
+        r = self.send_data(data)
+        self.crawler.engine.schedule(r, self)
+
+    def gen_reconciliation(self):
+        """
+        Returns the final stores of the resources reported progressively
+        """
+        reconciliation = []
+        for resource_key, resource_id in self.reported_resources.items():
+            resource = self.resources.get(resource_key)
+            stores = resource.stores if resource else self.store_index.store_set()
+            reconciliation.append({
+                'ResourceId': resource_id,
+                'Stores': list(stores),
+                'SelectAllStores': bool(stores) and stores == self.all_stores
+            })
+        return reconciliation
+
+    def get_resource_results(self, exclude=()):
         results = []
-        for resource in self.resources.values():
-            if len(resource.urls) <= 0:
-                logger.warn('Invalid resource is will not be reported %s', resource)
+        for resource_key, resource in self.resources.items():
+            if resource_key in exclude:
+                continue
+            result = self.get_resource_result(resource)
+            if result is None:
                 continue
+            if self.progressive_reports:
+                result['ResourceId'] = str(resource_key)
+            results.append(result)
+        return results
 
-            if len(resource.urls) == 1:
-                ext = get_ext_from_url(resource.urls[0])
-                result = {
-                    'Type': ext,
-                    'Path': resource.urls[0],
-                    'Stores': resource.stores,
-                    'SelectAllStores': set(resource.stores) == set(self.stores)
-                }
-            elif len(resource.urls) > 1:
-                try:
-                    exts = set([get_ext_from_url(u) for u in resource.urls])
-                    if len(exts) != 1:
-                        logger.warn('Resource with multiple extension types {} (resource: {})'.format(
-                            exts, resource))
-                    result_type = resource.type or list(exts)[0]
-                except IndexError:
-                    result_type = 'Unknown'
-
-                try:
-                    urls = resource.urls
-                    if not self.resource_sorted:
-                        urls = sorted(urls, key=lambda x: int(re.findall(r'(\d+)', x)[-1]))
-                except IndexError:
-                    logger.warn('Unable to sort urls {}'.format(resource))
-                    urls = resource.urls
-
-                pages = []
-                for n, url in enumerate(urls, start=1):
-                    page = {
-                        'PageNumber': n,
-                        'Path': url
-                    }
-                    pages.append(page)
-                result = {
-                    'Type': result_type,
-                    'Pages': pages,
-                    'Stores': resource.stores,
-                    'SelectAllStores': set(resource.stores) == set(self.stores)
+    def get_resource_result(self, resource):
+        if len(resource.urls) <= 0:
+            logger.warn('Invalid resource is will not be reported %s', resource)
+            return None
+
+        if len(resource.urls) == 1:
+            ext = get_ext_from_url(resource.urls[0])
+            result = {
+                'Type': ext,
+                'Path': resource.urls[0],
+                'Stores': list(resource.stores),
+                'SelectAllStores': resource.stores == self.all_stores
+            }
+        elif len(resource.urls) > 1:
+            try:
+                exts = set([get_ext_from_url(u) for u in resource.urls])
+                if len(exts) != 1:
+                    logger.warn('Resource with multiple extension types {} (resource: {})'.format(
+                        exts, resource))
+                result_type = resource.type or list(exts)[0]
+            except IndexError:
+                result_type = 'Unknown'
+
+            try:
+                urls = resource.urls
+                if not self.resource_sorted:
+                    urls = sorted(urls, key=lambda x: int(re.findall(r'(\d+)', x)[-1]))
+            except IndexError:
+                logger.warn('Unable to sort urls {}'.format(resource))
+                urls = resource.urls
+
+            pages = []
+            for n, url in enumerate(urls, start=1):
+                page = {
+                    'PageNumber': n,
+                    'Path': url
                 }
+                pages.append(page)
+            result = {
+                'Type': result_type,
+                'Pages': pages,
+                'Stores': list(resource.stores),
+                'SelectAllStores': resource.stores == self.all_stores
+            }
 
-            result.update(self.gen_resource_report(resource))
-            result['Items'] = [item.to_report() for item in resource.items]
-            results.append(result)
-        return results
+        result.update(self.gen_resource_report(resource))
+        result['Items'] = [item.to_report() for item in resource.items]
+        return result
 
     def gen_reports(self):
-        return {'FailedStores': self.invalid_stores}
+        return {'FailedStores': list(self.invalid_stores)}
 
     def gen_resource_report(self, resource):
-        return {
+        report = {
             'MemberOfGroup': self.get_member_of_group(resource=resource),
             'IsNational': False
         }
+        resource_key = self.resources.key_of(resource)
+        valid_between = self.resources.valid_between(resource_key)
+        if valid_between:
+            report['ValidBetween'] = {
+                'StartDate': valid_between[0],
+                'EndDate': valid_between[1]
+            }
+        report.update(self.resources.extras.get(resource_key, {}))
+        return report
 
     def save_asset(self, url, response):
         fname = hashlib.sha1(url).hexdigest() + '.' + url.split('.')[-1]
@@ -30,7 +30,7 @@ class EdekaBrochureSpider(BlaetterkatalogMixin, BaseAdbooxBrochureSpider):
             resource_key = store_id
             resource = self.resources.get(resource_key)
             if resource is None:
-                resource = Resource.from_kw(outfile='{}.pdf'.format(resource_key))
+                resource = Resource.from_kw(outfile='{}.pdf'.format(resource_key), store_index=self.store_index)
                 self.resources[resource_key] = resource
                 yield Request(
                     catalog_xml_url,
@@ -11,8 +11,6 @@ logger = logging.getLogger(__name__)
 
 class HitBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
     name = '17-brochure'
-    valid_between = {}
-    report_extras = {}
 
     def start_requests(self):
         url_tmpl = 'https://www.hit.de/1.0/api/store/setMy.json?store_id={}'
@@ -62,7 +60,8 @@ class HitBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
             self.get_valid_between(resource_key, response)
             pdf_url = urljoin(response.url, pdf_path)
             cj = response.meta['cookiejar']
-            return self.create_pdf_resource(pdf_url, resource_key, store, meta={'cookiejar': cj})
+            if self.create_pdf_resource(pdf_url, resource_key, store, meta={'cookiejar': cj}):
+                self.resource_finished(resource_key)
         else:
             resource.stores.append(store)
 
@@ -82,17 +81,16 @@ class HitBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
         if not resource:
             # fix image urls
             images = [urljoin(response.url, i) for i in images]
-            resource = Resource.from_kw(urls=images, stores=[store])
+            resource = Resource.from_kw(urls=images, stores=[store], store_index=self.store_index)
             self.resources[resource_key] = resource
+            self.resource_finished(resource_key)
         else:
             resource.stores.append(store)
 
     def parse_report_extras(self, key, response):
         title = response.xpath('//h1/text()').extract_first()
         if title:
-            extras = self.report_extras.get(key, {})
-            extras['Title'] = title
-            self.report_extras[key] = extras
+            self.resources.extras.setdefault(key, {})['Title'] = title
 
     def get_valid_between(self, resource_key, response):
         store = response.meta['store']
@@ -101,13 +99,8 @@ class HitBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
                 r'(\d+)\.(\d+)\.(\d+|)\s*-\s*(\d+)\.(\d+)\.(\d+|)', response.text, re.DOTALL).groups()
             if not (vb_year and ve_year):
                 vb_year = ve_year = (vb_year or ve_year) or '2016'
-            entry = {
-                'ValidBetween': {
-                    'StartDate': '.'.join([vb_day, vb_month, vb_year]),
-                    'EndDate': '.'.join([ve_day, ve_month, ve_year])
-                }
-            }
-            self.valid_between[resource_key] = entry
+            self.resources.set_valid_between(
+                resource_key, '.'.join([vb_day, vb_month, vb_year]), '.'.join([ve_day, ve_month, ve_year]))
         except AttributeError:
             logger.error('Unable to get valid between info for store {}'.format(store))
 
@@ -117,11 +110,3 @@ class HitBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
             return re.search(r'([A-Z_\d]+)', url).group(1)
         except (AttributeError, TypeError):
             pass
-
-    def gen_resource_report(self, resource):
-        report = super(HitBrochureSpider, self).gen_resource_report(resource)
-        url = resource.urls[0]
-        key = self.get_resource_key(url)
-        report.update(self.valid_between.get(key, {}))
-        report.update(self.report_extras.get(key, {}))
-        return report
@@ -5,10 +5,17 @@ from scrapy.http.request import Request
 from adboox.spiders.base import BaseAdbooxSpider
 from adboox.mixins.store import SendStoresWhenIdleMixin
 from adboox.items import StoreLoader
-from adboox.utils.calendar import de_day_to_abbr, abbr_to_day
+from adboox.utils.calendar import opening_days
+from adboox.utils.sections import split_sections
 
 logger = logging.getLogger(__name__)
 
+_COLUMN = '(//div[has-class("entry")]/div[has-class("text-col")])[{}]'
+CONTACT_COLUMN = _COLUMN.format(1)
+HOURS_ROWS = _COLUMN.format(2) + '/div[has-class("row")]'
+HOURS_DATES = './/div[has-class("col-md-4")]/text()'
+HOURS_TIMES = './/div[has-class("col-md-8")]/text()'
+
 
 class HitStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
     name = '17-stores'
@@ -24,7 +31,7 @@ class HitStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
     def parse(self, response):
         for elem in response.xpath('//li[has-class("item") and @data-uid]'):
             geo = {
-                'Lan': elem.xpath('@data-lat').extract_first(),
+                'Lat': elem.xpath('@data-lat').extract_first(),
                 'Lon': elem.xpath('@data-lng').extract_first()
             }
             sl = StoreLoader(selector=elem)
@@ -49,12 +56,9 @@ class HitStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             # 'adresse': self.address_handler,
             'telefonnummer': self.phone_handler,
         }
-        col_tmpl = '(//div[has-class("entry")]/div[has-class("text-col")])[{}]'
-        with sl.push_xpath(col_tmpl.format(1)):
-            for n, label in enumerate(sl.selector.xpath('h3/text()').extract(), 1):
-                label = label.lower()
-                value = ' '.join([x.strip() for x in sl.selector.xpath(
-                    'p[count(preceding-sibling::h3)={}]//text()'.format(n)).extract()])
+        with sl.push_xpath(CONTACT_COLUMN):
+            for label, blocks in split_sections(sl.selector, headings=('h3',), blocks=('p',)).items():
+                value = ' '.join(blocks)
                 handler = handlers.get(label.lower())
                 if handler:
                     handler(sl, value)
@@ -64,12 +68,9 @@ class HitStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
         for k, v in extras.items():
             store[k] = v
 
-        with sl.push_xpath(col_tmpl.format(2) + '/div[has-class("row")]'):
-            date_hours_tmpl = './/div[has-class("col-md-{}")]/text()'
-            label = date_hours_tmpl.format(4)
-            value = date_hours_tmpl.format(8)
+        with sl.push_xpath(HOURS_ROWS):
             for date, hours in zip(
-                    sl.selector.xpath(label).extract(), sl.selector.xpath(value).extract()):
+                    sl.selector.xpath(HOURS_DATES).extract(), sl.selector.xpath(HOURS_TIMES).extract()):
                 self.zeiten_handler(store, date, hours)
 
         self.stores[store.get('StoreId')] = store
@@ -87,14 +88,8 @@ class HitStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
         loader.add_value('PhoneNumber', value)
 
     def zeiten_handler(self, store, de_day, hours):
-        try:
-            open_hours, close_hours = re.search(
-                r'([\d:]+)\s*-\s*([\d:]+)', hours).groups()
-            abbr = de_day_to_abbr[de_day.title()]
-            day = abbr_to_day[abbr]
-            store[day] = {
-                'Open': open_hours, 'Close': close_hours
-            }
-        except (AttributeError, IndexError):
+        days = opening_days('{} {}'.format(de_day, hours))
+        store.update(days)
+        if not days:
             logger.warn('Cannot parse opening hours "{}" or invalid day "{}" (item: {})'.format(
                 hours, de_day, store))
@@ -1,25 +1,29 @@
 import re
 import logging
+from math import ceil
 import scrapy
 from adboox.items import StoreLoader
 from adboox.utils import calendar
-from adboox.utils import load_csv_data
 from adboox.spiders.base import BaseAdbooxSpider
 from adboox.mixins.store import SendStoresWhenIdleMixin
+from adboox.mixins.geo import GeoSweepMixin
 
 logger = logging.getLogger(__name__)
 
-class StoreSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
+class StoreSpider(GeoSweepMixin, SendStoresWhenIdleMixin, BaseAdbooxSpider):
     name = "925-stores"
     start_urls = ["https://www.klaas-und-kock.de/angebote/unsere-angebote/"]
+    search_radius = 50
+    snap_km = 10
+    fixed_radius = True
 
     def parse(self, response):
-        data = {"postcode": "", "radius": "50"}
-        zipcodes = [city['PostalCode'] for city in load_csv_data('de_cities.csv')]
-        for zipcode in zipcodes:
-            data["postcode"] = zipcode
-            yield scrapy.FormRequest(url="https://www.klaas-und-kock.de/angebote/unsere-angebote/", formdata=data,
-                                     callback=self.parse_stores)
+        return self.search_requests()
+
+    def make_search_request(self, location, n):
+        data = {"postcode": location.meta['zipcode'], "radius": str(int(ceil(location.radius)))}
+        return scrapy.FormRequest(url="https://www.klaas-und-kock.de/angebote/unsere-angebote/", formdata=data,
+                                  callback=self.parse_stores)
 
     def parse_stores(self, response):
         for store in response.css('div.col-md-6 > :first-child'):
@@ -38,15 +42,9 @@ class StoreSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
                 else:
                     address = ("{} {}".format(address_line1, address_line2))
                     work_hours = store_texts[11]
-                day_hours = work_hours.split(" ")
                 gmaps_url = store.css("a::attr(href)").get()
                 lat, lon = gmaps_url.split("!3d")[1].split("!4d")
 
-                try:
-                    store_open, store_close = day_hours[3].split("-")
-                except:
-                    store_open, store_close = day_hours[3], day_hours[5]
-
                 sl = StoreLoader(selector=store, response=response)
                 sl.add_css("Name", "strong::text")
                 sl.add_value("Address", address)
@@ -57,7 +55,6 @@ class StoreSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
                 item = sl.load_item()
                 item['GeoLocation'] = {"Lat": lat, "Lon": lon}
 
-                for _, day in calendar.iter_from_abbr_de(day_hours[0].lower(), day_hours[2].lower()):
-                    item[day] = {"Open": store_open, "Close": store_close}
+                item.update(calendar.opening_days(work_hours))
                 self.stores[item['PhoneNumber']] = item
                 yield item
@@ -7,15 +7,22 @@ from collections import defaultdict
 from adboox.spiders.base import BaseAdbooxBrochureSpider
 from adboox.utils.types import ResourceItem
 from adboox.mixins.brochure import DirectBrochureDownloadMixin
+from adboox.utils.memo import memoized_parse
 
 logger = logging.getLogger(__name__)
 
+
+@memoized_parse()
+def parse_overview(response):
+    """
+    Returns the flyer overview (de-DE.json)
+    """
+    return response.json()
+
 class LidlBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
     name = '1-brochure'
     allowed_domains = ['lidl.de', 'lidl-pageflip.com', 'lidl-flyer.com']
-    warehouse_resource_mapping = defaultdict(list)
     start_urls = ['https://endpoints.lidl-flyer.com/v1/overview/de-DE.json']
-    parsed_reports = {}
     today = datetime.today().date()
 
     def parse(self, response):
@@ -41,7 +48,7 @@ class LidlBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
 
     def parse_national_flyers(self, response):
         try:
-            data = response.json()
+            data = parse_overview(response)
         except:
             logger.warning("Unable to parse global flyerdata in %s", response.text)
             return
@@ -64,17 +71,19 @@ class LidlBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
                     if pdf_url and pdf_id:
                         resource_key = self.get_national_flyer_resource_key(pdf_id)
 
-                        for store in stores:
-                            self.create_pdf_resource(pdf_url, resource_key, store)
+                        if stores:
+                            self.create_pdf_resource(pdf_url, resource_key, stores[0])
+                            self.resources[resource_key].stores.update(stores)
 
-                        if resource_key not in self.parsed_reports:
+                        if resource_key not in self.resources.extras:
                             report = {
                                 'start_date': flyer.get('offerStartDate', flyer.get('startDate')),
                                 'end_date': flyer.get('offerEndDate', flyer.get('endDate')),
                                 'is_national': national,
                                 'title': flyer.get('title'),
                             }
-                            self.parsed_reports[resource_key] = report
+                            self.resources.extras[resource_key] = self.use_parsed_report(pdf_url, report)
+                        self.resource_finished(resource_key)
                     else:
                         logger.warning('Invalid global flyer entry %s', flyer)
 
@@ -133,7 +142,7 @@ class LidlBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
                     items.append(item)
         return items
 
-    def use_parsed_report(self, resource, report):
+    def use_parsed_report(self, url, report):
         def get_valid_between():
 
             def get_safe(key):
@@ -147,7 +156,7 @@ class LidlBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
             return {k: v for k, v in zip(['StartDate', 'EndDate'], [start_date, end_date]) if v}
 
         resource_report = {
-            'MemberOfGroup': self.get_member_of_group(url=resource.urls[0]),
+            'MemberOfGroup': self.get_member_of_group(url=url),
             'IsNational': report.get('is_national', False),
             'Title': report.get('title', ''),
         }
@@ -157,13 +166,12 @@ class LidlBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
         return resource_report
 
     def gen_resource_report(self, resource):
-        key = resource.key
-        parsed_report = self.parsed_reports.get(key)
-        if key and parsed_report:
-            return self.use_parsed_report(resource, parsed_report)
+        report = super(LidlBrochureSpider, self).gen_resource_report(resource)
+        if resource.key in self.resources.extras:
+            # the report of the flyer overview
+            return report
 
         url = resource.urls[0]
-        report = super(LidlBrochureSpider, self).gen_resource_report(resource)
         m = re.search(r'(\d{8})_(\d{8})', url)
         if m:
             def fix_dt_format(s):
@@ -1,52 +1,51 @@
 import re
 import logging
 import pprint
-import codecs
 from urllib.parse import urlencode, quote
 from scrapy.http import Request
 from adboox.spiders.base import BaseAdbooxSpider
 from adboox.mixins.store import SendStoresWhenIdleMixin
-from adboox.utils.js_parser import parse_variables
-from adboox.utils import load_csv_data
-from adboox.utils.geo import calculate_distance
+from adboox.mixins.geo import GeoSweepMixin
+from adboox.utils.js_parser import parse_variables, extract_js_value
+from adboox.utils.cities import de_cities_dataset
+from adboox.utils.calendar import opening_days
+from adboox.geolib.tools.geocircle import GeoCircle
 
 logger = logging.getLogger(__name__)
 
-class LidlStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
+
+def parse_bing_map(response):
+    """
+    Returns the bingMap object of storeFinder.js, None if it is missing.
+     Only parse_variables is memoized, so the object is cached once.
+    """
+    # only the bingMap object is decoded and parsed
+    text = extract_js_value(response.body, 'bingMap', response.encoding)
+    if not text:
+        return None
+    logger.info('Captured text: %s', text)
+    return parse_variables('var data = {};'.format(text)).get('data') or {}
+
+class LidlStoresSpider(GeoSweepMixin, SendStoresWhenIdleMixin, BaseAdbooxSpider):
     name = '1-stores'
     allowed_domains = ['lidl.de']
     test_zip = ''
+    search_radius = 150
+    # $top of the Bing spatial data query; results are capped at it, so
+    # capped searches are refined adaptively
+    max_results = 250
+    sweep_mode = 'adaptive'
 
     def start_requests(self):
         url = 'https://www.lidl.de/de/asset/other/storeFinder.js'
         yield Request(url=url, callback=self.parse_store_finder_js)
 
     def parse_store_finder_js(self, response):
-        m = re.search(r'bingMap:\s*{', response.text)
-        if not m:
+        data = parse_bing_map(response)
+        if data is None:
             logger.error('Unable to find bingMap data (url: %s)', response.url)
             return
 
-        stack = ['{']
-        text = '{'
-        pos = m.end()
-        while len(stack):
-            try:
-                c = response.text[pos]
-            except IndexError:
-                logger.warning('StoreFinder response is too short')
-                break
-            text += c
-            if c == '{':
-                stack.append('{')
-            elif c == '}':
-                stack.pop()
-
-            pos += 1
-        logger.info('Captured text: %s', text)
-        js_var = 'var data = {};'.format(text)
-        parsed = parse_variables(js_var)
-        data = parsed.get('data')
         if not data:
             logger.error('Unable to get map data')
             return
@@ -85,36 +84,36 @@ class LidlStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             logger.error('Unable to find session id from %s', pprint.pformat(parsed))
             return
 
-        cities = load_csv_data('de_cities.csv')
+        self.session_id = session_id
+        self.query_url = response.meta['query_url']
         if self.test_zip:
-            cities = [c for c in cities if c['PostalCode'] == self.test_zip]
-
-        last = (0, 0)
-        limit = 100  # in km
-        for city in cities:
-            loc = list(map(float, (city['Latitude'], city['Longitude'])))
-            dist = calculate_distance(loc, last)
-            if dist < limit:
-                continue
-
-            radius = limit * 1.5
-            logger.info('Searching lidl stores around %s (radius %s)', loc, radius)
-            last = loc
-            params = [
-                ('$select', '*'),
-                ('$filter', quote('Adresstyp Eq 1')),
-                ('key', session_id),
-                ('$format', 'json'),
-                ('jsonp', 'Microsoft_Maps_Network_QueryAPI_1'),
-                ('spatialFilter', 'nearby(%27{},{}%27,{})'.format(loc[0], loc[1], radius))
-            ]
-            query = '&'.join(['{}={}'.format(k, v) for k, v in params])
-            url = response.meta['query_url'] + '?' + query
-            meta = {
-                'location': loc,
-                'radius': radius
-            }
-            yield Request(url=url, callback=self.parse_stores, dont_filter=True, meta=meta)
+            cities = de_cities_dataset()
+            locations = [GeoCircle(float(cities.lats[n]), float(cities.lngs[n]), self.search_radius)
+                         for n in cities.rows_by_zipcode(self.test_zip)]
+            return [self.make_search_request(loc, n) for n, loc in enumerate(locations)]
+
+        return self.search_requests()
+
+    def make_search_request(self, location, n):
+        loc = [location.lat, location.lng]
+        radius = location.radius
+        logger.info('Searching lidl stores around %s (radius %s)', loc, radius)
+        params = [
+            ('$select', '*'),
+            ('$filter', quote('Adresstyp Eq 1')),
+            ('key', self.session_id),
+            ('$format', 'json'),
+            ('$top', self.max_results),
+            ('jsonp', 'Microsoft_Maps_Network_QueryAPI_1'),
+            ('spatialFilter', 'nearby(%27{},{}%27,{})'.format(loc[0], loc[1], radius))
+        ]
+        query = '&'.join(['{}={}'.format(k, v) for k, v in params])
+        url = self.query_url + '?' + query
+        meta = {
+            'location': loc,
+            'radius': radius
+        }
+        return Request(url=url, callback=self.parse_stores, dont_filter=True, meta=meta)
 
     def parse_stores(self, response):
         m = re.search(r'Microsoft_Maps_Network_QueryAPI_1\((.*)\)', response.text)
@@ -123,7 +122,7 @@ class LidlStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             return
 
         cb_data_raw = 'var cb_data = {};'.format(m.group(1))
-        cb_data = parse_variables(cb_data_raw)
+        cb_data = parse_variables(cb_data_raw, unescape=True)
         try:
             stores = cb_data['cb_data']['d']['results']
         except KeyError:
@@ -138,14 +137,17 @@ class LidlStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             self.stores[converted['StoreId']] = converted
             yield converted
 
+        for request in self.refine_search(response, len(stores)):
+            yield request
+
     def convert_store(self, store_js):
         address = ', '.join([store_js['AddressLine'], store_js['PostalCode'], store_js['Locality']])
         store = {
             'StoreId': store_js['EntityID'] + '-' + str(store_js['AR']),
-            'Name': codecs.decode(store_js['ShownStoreName'], 'unicode-escape'),
-            'Address': codecs.decode(address, 'unicode-escape'),
-            'Street': codecs.decode(store_js['AddressLine'], 'unicode-escape'),
-            'City': codecs.decode(store_js['Locality'], 'unicode-escape'),
+            'Name': store_js['ShownStoreName'],
+            'Address': address,
+            'Street': store_js['AddressLine'],
+            'City': store_js['Locality'],
             'PostCode': store_js['PostalCode'],
             'PhoneNumber': None,
             'FaxNumber': None,
@@ -156,18 +158,5 @@ class LidlStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
                 'Lon': store_js['Longitude']
             }
         }
-        mapping = {
-            'mo': 'Monday', 'di': 'Tuesday', 'mi': 'Wednesday', 'do': 'Thursday', 'fr': 'Friday',
-            'sa': 'Saturday', 'so': 'Sunday'
-        }
-        opening = store_js['OpeningTimes']
-        for opening_data in re.findall(r'([a-z]{2})\s+([\d:]+)-([\d:]+)', opening, re.I):
-            day_abbr, open_time, close_time = opening_data
-            day = mapping.get(day_abbr.lower())
-            if not day:
-                logger.warning('Unable to find day %s (opening days: %s)', day_abbr, opening)
-                continue
-            store[day] = {
-                'Open': open_time, 'Close': close_time
-            }
+        store.update(opening_days(store_js['OpeningTimes']))
         return store
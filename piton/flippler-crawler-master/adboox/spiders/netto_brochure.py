@@ -6,6 +6,7 @@ from scrapy.http import Request, FormRequest
 from adboox.spiders.base import BaseAdbooxBrochureSpider
 from adboox.utils.types import Resource
 from adboox.mixins.blaetter import BlaetterkatalogMixin
+from adboox.utils.js_parser import parse_js_value
 
 logger = logging.getLogger(__name__)
 
@@ -17,23 +18,10 @@ class NettoBrochureSpider(BlaetterkatalogMixin, BaseAdbooxBrochureSpider):
     stores_url = None
     total_stores = 0
     resource_sorted = True
-    report_extras = {}
 
     def parse(self, response):
-        token_name = token_value = None
-
-        for scr in response.xpath('//script[contains(@type, "javascript")]/text()').extract():
-            m = re.search(r'var SYNCHRONIZER_TOKEN_NAME\s*=\s*([^;]+);', scr)
-            if m:
-                token_name = m.group(1)[1:-1]
-
-            m = re.search(r'var SYNCHRONIZER_TOKEN_VALUE\s*=\s*([^;]+);', scr)
-            if m:
-                token_value = m.group(1)[1:-1]
-
-            if token_name and token_value:
-                break
-
+        token_name = parse_js_value(response.body, 'SYNCHRONIZER_TOKEN_NAME', response.encoding)
+        token_value = parse_js_value(response.body, 'SYNCHRONIZER_TOKEN_VALUE', response.encoding)
         if not (token_name and token_value):
             logger.warning('Unable to find synchronizer variables!')
             return
@@ -56,8 +44,6 @@ class NettoBrochureSpider(BlaetterkatalogMixin, BaseAdbooxBrochureSpider):
     async def store_set(self, response):
         storeid = response.meta.get('storeid')
         cookiejar = response.meta.get('cookiejar', 0)
-        # We're done with resource collection for this store.
-        self.stores.remove(storeid)
         del response  # no need anymore. better to remove to prevent misuse below.
 
         meta = {'cookiejar': cookiejar,
@@ -92,9 +78,9 @@ class NettoBrochureSpider(BlaetterkatalogMixin, BaseAdbooxBrochureSpider):
             key, xml_catalog_url = ret
             resource = self.resources.get(key)
             if not resource:
-                resource = Resource.from_kw(key=key)
+                resource = Resource.from_kw(key=key, store_index=self.store_index)
                 self.resources[key] = resource
-                self.add_valid_between(key, from_date, to_date)
+                self.resources.set_valid_between(key, from_date, to_date)
                 meta.update(resource_key=key)
                 yield Request(
                     url=xml_catalog_url,
@@ -106,12 +92,12 @@ class NettoBrochureSpider(BlaetterkatalogMixin, BaseAdbooxBrochureSpider):
             self.invalid_stores.append(storeid)
 
     def parse_xml_catalog_url(self, response):
-        catalogs_base_path = re.search("catalogsBasePath:\s*'(.+)'", response.text)
-        if catalogs_base_path:
-            catalogs_base_path = catalogs_base_path.group(1).replace("\\", "")
-            catalog = re.search("catalog:\s*'(.+)'", response.text)
-            if catalog:
-                catalog = catalog.group(1).replace("\\", "")
+        catalogs_base_path = parse_js_value(response.body, 'catalogsBasePath', response.encoding)
+        if isinstance(catalogs_base_path, str):
+            catalogs_base_path = catalogs_base_path.replace("\\", "")
+            catalog = parse_js_value(response.body, 'catalog', response.encoding)
+            if isinstance(catalog, str):
+                catalog = catalog.replace("\\", "")
                 path = catalogs_base_path + catalog + "/xml/catalog.xml"
                 return [catalog.split('/')[0], urljoin(response.url, path)]
 
@@ -132,18 +118,3 @@ class NettoBrochureSpider(BlaetterkatalogMixin, BaseAdbooxBrochureSpider):
                 return expires.strftime('%d.%m.%Y')
             except Exception as ex:
                 logger.error('Unable to parse {}'.format(expires), exc_info=ex)
-
-    def add_valid_between(self, key, from_date, to_date):
-        extras = self.report_extras.get(key, {})
-        extras['ValidBetween'] = {
-            'StartDate': from_date,
-            'EndDate': to_date
-        }
-        self.report_extras[key] = extras
-
-    def gen_resource_report(self, resource):
-        report = super(NettoBrochureSpider, self).gen_resource_report(resource)
-        extras = self.report_extras.get(resource.key)
-        if extras:
-            report.update(extras)
-        return report
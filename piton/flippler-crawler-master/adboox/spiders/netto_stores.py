@@ -1,8 +1,8 @@
-import re
 from scrapy.http.request.form import FormRequest
 from adboox.spiders.base import BaseAdbooxSpider
 from adboox.mixins.store import SendStoresWhenIdleMixin
 from adboox.utils import calendar
+from adboox.utils.memo import memoized_parse
 
 
 class NettoStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
@@ -28,10 +28,17 @@ class NettoStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             callback=self.parse_location, formdata=formdata)
 
     def parse_location(self, response):
-        stores = response.json()
-        for store_raw in stores:
-            store = self.convert_format(store_raw)
+        for store in self.parse_store_items(response):
             self.stores[store['StoreId']] = store
+            yield store
+
+    @staticmethod
+    @memoized_parse()
+    def parse_store_items(response):
+        """
+        Returns the converted stores of the GetStoreItems response
+        """
+        return [NettoStoresSpider.convert_format(store_raw) for store_raw in response.json()]
 
     @staticmethod
     def convert_format(store):
@@ -52,14 +59,5 @@ class NettoStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             }
         }
 
-        openings = store['store_opening']
-        try:
-            begin_date, end_date, open_, close = re.search(
-                r'\s*([^.]+)\.-([^.]+)\.:\s*([\d.]+)\s*-\s*([\d.]+)', openings).groups()
-            for date_tuple in calendar.iter_from_abbr_de(begin_date.lower(), end_date.lower()):
-                _, date = date_tuple
-                converted[date] = {'Open': open_, 'Close': close}
-        except AttributeError:
-            pass
-
+        converted.update(calendar.opening_days(store['store_opening']))
         return converted
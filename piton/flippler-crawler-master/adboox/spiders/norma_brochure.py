@@ -50,7 +50,8 @@ class NormaBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider)
             else:
                 try:
                     pdf_url = urljoin(response.url, link.url)
-                    yield self.create_pdf_resource(pdf_url, key, store)
+                    if self.create_pdf_resource(pdf_url, key, store):
+                        self.resource_finished(key)
                 except Exception as ex:
                     logger.error('Failed to download. Error: "{}" (store: {}, link: {})'.format(
                         ex, store, link.url))
@@ -1,36 +1,37 @@
-import re
 import logging
 from scrapy.http import FormRequest
 from adboox.spiders.base import BaseAdbooxSpider
 from adboox.mixins.store import SendStoresWhenIdleMixin
-from adboox.utils import de_cities
+from adboox.mixins.geo import GeoSweepMixin
 from adboox.items import StoreLoader
+from adboox.utils.sections import split_rows
+from adboox.utils.calendar import opening_days
 
 logger = logging.getLogger(__name__)
 
-WEEKDAYS_MAP = {
-    'montag': 'Monday', 'dienstag': 'Tuesday', 'mittwoch': 'Wednesday',
-    'donnerstag': 'Thursday', 'freitag': 'Friday', 'samstag': 'Saturday',
-    'sonntag': 'Sunday'}
-WEEKDAYS = list(WEEKDAYS_MAP.keys())
 
-class NormaStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
+class NormaStoresSpider(GeoSweepMixin, SendStoresWhenIdleMixin, BaseAdbooxSpider):
     name = '36-stores'
     key = 'filialfinder[suche][stadt]'
+    search_radius = 192
+    snap_km = 40
+    fixed_radius = True
 
     def start_requests(self):
-        url = 'https://www.norma-online.de/ext/ajax/validate.php'
+        return self.search_requests()
 
-        for n, city in enumerate(de_cities):
-            form = {
-                'action': 'ajax_validate_filialfinder__filialfinder_stadt',
-                self.key: city,
-                'lang': 'de'
-            }
-            yield FormRequest(
-                url=url, callback=self.post_search,
-                formdata=form, dont_filter=True,
-                meta={'city': city, 'cookiejar': n})
+    def make_search_request(self, location, n):
+        url = 'https://www.norma-online.de/ext/ajax/validate.php'
+        city = location.meta['city']
+        form = {
+            'action': 'ajax_validate_filialfinder__filialfinder_stadt',
+            self.key: city,
+            'lang': 'de'
+        }
+        return FormRequest(
+            url=url, callback=self.post_search,
+            formdata=form, dont_filter=True,
+            meta={'city': city, 'cookiejar': n, 'radius': location.radius})
 
     def post_search(self, response):
         validation = response.json()
@@ -41,7 +42,7 @@ class NormaStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             cookiejar = response.meta.get('cookiejar')
             params = {
                 'filialfinder[suche][land]': 'Deutschland',
-                'filialfinder[suche][radius]': '192000',
+                'filialfinder[suche][radius]': str(int(response.meta['radius'] * 1000)),
                 'filialfinder[suche][plz]': '',
                 'filialfinder[suche][strasse]': '',
                 self.key: city
@@ -71,23 +72,9 @@ class NormaStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
                     logger.warn('Store id clash between %r and %r', existing, item)
                 continue
 
-            def _parse_and_add(day, text):
-                store_open, store_close = re.search(r'([^-\s]+)\s*-\s*([^-\s]+)', text).groups()
-                key = WEEKDAYS_MAP.get(day)
-                item[key] = {'Open': store_open, 'Close': store_close}
-
-            for tr in store.xpath('.//table[has-class("shopHours")]//tr'):
-                try:
-                    days = tr.xpath('./th/text()').extract_first()
-                    hours = tr.xpath('./td/text()').extract_first()
-                    begin, end = re.search(r'(\w+)\s*-\s*(\w+)', days).groups()
-                    sindex = WEEKDAYS.index(begin.lower())
-                    eindex = WEEKDAYS.index(end.lower())
-                    for x in WEEKDAYS[sindex:eindex + 1]:
-                        _parse_and_add(x.lower(), hours)
-                except AttributeError as ex:
-                    single = re.search(r'(\w+)', days).group(1)
-                    _parse_and_add(single.lower(), hours)
+            for days, hours in split_rows(store.xpath('.//table[has-class("shopHours")]')).items():
+                for text in hours:
+                    item.update(opening_days('{} {}'.format(days, text)))
             self.stores[store_id] = item
             yield item
 
@@ -1,28 +1,31 @@
 from __future__ import unicode_literals
-import re
 import json
 import logging
 import pprint
 from scrapy.http.request.form import FormRequest
 from adboox.spiders.base import BaseAdbooxSpider
 from adboox.mixins.store import SendStoresWhenIdleMixin
-from adboox.utils import load_csv_data
-from adboox.utils.calendar import iter_from_abbr_de
+from adboox.mixins.geo import GeoSweepMixin
+from adboox.utils.calendar import opening_days
 
 logger = logging.getLogger(__name__)
 
 
-class PennyStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
+class PennyStoresSpider(GeoSweepMixin, SendStoresWhenIdleMixin, BaseAdbooxSpider):
     name = '37-stores'
+    # market search is made by zipcode, results are listed within ~25 km.
+    search_radius = 25
+    snap_km = 5
+    fixed_radius = True
 
     def start_requests(self):
+        return self.search_requests()
+
+    def make_search_request(self, location, n):
         tmpl = ('http://www.penny.de/marktsuche/?type=666&tx_pennyregionalization_googlemarket['
                 'location]=Deutschland,%20{}')
-        de_cities = load_csv_data('de_cities.csv')
-        zipcodes = {x['PostalCode'] for x in de_cities}
-        for n, zipcode in enumerate(zipcodes):
-            url = tmpl.format(zipcode)
-            yield FormRequest(url=url, callback=self.parse_stores, cookies={'cookiejar': n})
+        url = tmpl.format(location.meta['zipcode'])
+        return FormRequest(url=url, callback=self.parse_stores, cookies={'cookiejar': n})
 
     def parse_stores(self, response):
         data = json.loads(response.body)
@@ -45,15 +48,8 @@ class PennyStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             }
         }
 
-        try:
-            opening_time = store_raw['openingTime']
-            day_from, day_to, open_hour, close_hour = re.search(
-                r'(\w+)\s*-\s*(\w+)\s*:\s*([\d:]+)\s*-([\d:]+)', opening_time).groups()
-            for _, day in iter_from_abbr_de(day_from[:2].lower(), day_to[:2].lower()):
-                store[day] = {
-                    'Open': open_hour,
-                    'Close': close_hour
-                }
-        except AttributeError:
+        days = opening_days(store_raw['openingTime'])
+        if not days:
             logger.error('Unable to parse opening time {}'.format(pprint.pformat(store_raw)))
+        store.update(days)
         return store
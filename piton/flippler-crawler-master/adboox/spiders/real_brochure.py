@@ -42,7 +42,8 @@ class RealBrochureSpider(DirectBrochureDownloadMixin, BaseAdbooxBrochureSpider):
                 if not url:
                     logger.warn("Unable to get the pdflink from {}".format(brochure.extract()))
                     continue
-                yield self.create_pdf_resource(url, key, store)
+                if self.create_pdf_resource(url, key, store):
+                    self.resource_finished(key)
 
     def parse_brochure_valid_dates(self, response):
         if self.brochure_start_date or self.brochure_end_date:
@@ -15,9 +15,11 @@ class RealStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
         for store_data in data:
             try:
                 store = self.convert_store(store_data)
-                self.stores[store['StoreId']] = store
             except IndexError:
                 logger.warn('Unable to parse store data: "{}"'.format(store_data))
+                continue
+            self.stores[store['StoreId']] = store
+            yield store
 
     def convert_store(self, data):
         store = {
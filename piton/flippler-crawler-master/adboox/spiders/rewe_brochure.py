@@ -8,7 +8,6 @@ logger = logging.getLogger(__name__)
 
 class ReweBrochureSpider(BaseAdbooxBrochureSpider):
     name = '38-brochure'
-    report_extras = {}
     crawlera_enabled = True
     
     def start_requests(self):
@@ -33,7 +32,7 @@ class ReweBrochureSpider(BaseAdbooxBrochureSpider):
             id_ = brochure['id']
             resource = self.resources.get(key)
             if not resource:
-                resource = Resource.from_kw(key=key)
+                resource = Resource.from_kw(key=key, store_index=self.store_index)
                 self.add_valid_between(key, brochure)
                 self.resources[key] = resource
                 meta = {
@@ -55,16 +54,12 @@ class ReweBrochureSpider(BaseAdbooxBrochureSpider):
                 continue
             image_url = page['imageUrls']['zoom']
             resource.urls.append(image_url)
+        self.resource_finished(resource_id)
 
     def add_valid_between(self, key, brochure):
         valid_from = self.try_get_valid(brochure, "validFrom")
         valid_until = self.try_get_valid(brochure, "validUntil")
-        extras = self.report_extras.get(key, {})
-        extras['ValidBetween'] = {
-            'StartDate': valid_from,
-            'EndDate': valid_until,
-        }
-        self.report_extras[key] = extras
+        self.resources.set_valid_between(key, valid_from, valid_until)
 
     def try_get_valid(self, brochure, key):
         try:
@@ -78,10 +73,3 @@ class ReweBrochureSpider(BaseAdbooxBrochureSpider):
             return datetime.strptime(dt[:16], "%Y-%m-%dT%H:%M")
         except:
             logger.warn("Unable to parse: {}".format(dt))
-
-    def gen_resource_report(self, resource):
-        report = super(ReweBrochureSpider, self).gen_resource_report(resource)
-        extras = self.report_extras.get(resource.key)
-        if extras:
-            report.update(extras)
-        return report
\ No newline at end of file
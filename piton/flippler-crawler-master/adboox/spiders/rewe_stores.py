@@ -4,8 +4,8 @@ import urllib
 from scrapy.http import Request
 from adboox.spiders.base import BaseAdbooxSpider
 from adboox.mixins.store import SendStoresWhenIdleMixin
-from adboox.utils.js_parser import parse_variables
-from adboox.utils.calendar import abbr_to_day_de, iter_from_abbr_de
+from adboox.utils.js_parser import parse_js_value
+from adboox.utils.calendar import opening_days
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +14,11 @@ class ReweStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
     start_urls = ['https://marktsuche.rewe.de/']
 
     def parse(self, response):
-        data = response.xpath('//script[contains(text(), "gmapsTempData")]/text()').extract_first()
-        if not data:
+        gmaps_data = parse_js_value(response.body, 'gmapsTempData', response.encoding)
+        if gmaps_data is None:
             logger.error('Unable to find gmapsTempData variable!')
             return
 
-        variables = parse_variables(data)
-        gmaps_data = variables.get('gmapsTempData', [])
         if not gmaps_data:
             logger.error('Empty gmapsTempData or failed to be parsed!')
 
@@ -43,13 +41,12 @@ class ReweStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
 
     def parse_store(self, response):
         store = response.meta.get('store_data')
-        jscode = response.xpath('//script/text()[contains(., "marketData")]').extract_first()
-        if not jscode:
+        selector_data = parse_js_value(response.body, 'marketSelectorData', response.encoding)
+        if selector_data is None:
             logger.warn('Unable to query about store data: %s', store)
             return
 
-        variables = parse_variables(jscode)
-        market_data = variables.get('marketSelectorData', {}).get('marketData')
+        market_data = selector_data.get('marketData') if isinstance(selector_data, dict) else None
         if not market_data:
             logger.warn('Unable to get marketData from query made for %s', store)
             return
@@ -70,18 +67,6 @@ class ReweStoresSpider(SendStoresWhenIdleMixin, BaseAdbooxSpider):
             addr_keys = ['Street', 'PostCode', 'City']
             store['Address'] = ', '.join([x for x in [store.get(x) for x in addr_keys] if x])
             for opening in data['marketHours']:
-                days, times = opening['days'], opening['hours']
-                try:
-                    open_hour, close_hour = re.search(r'([\d:]+)\s*-\s*([\d:]+)', times).groups()
-                except AttributeError:
-                    continue
-                hours = {'Open': open_hour, 'Close': close_hour}
-                try:
-                    day_from, day_to = re.search(r'(\w+)\s*-\s*(\w+)', days).groups()
-                    for _, day in iter_from_abbr_de(day_from[:2].lower(), day_to[:2].lower()):
-                        store[day] = hours
-                except AttributeError:
-                    day = abbr_to_day_de.get(days[:2].lower())
-                    store[day] = hours
+                store.update(opening_days('{} {}'.format(opening['days'], opening['hours'])))
             self.stores[store['StoreId']] = store
             yield store
@@ -14,4 +14,11 @@ def load_csv_data(name):
     keys = next(sio).split(';')
     return [dict(zip(keys, line.strip().split(';'))) for line in sio.readlines()]
 
-de_cities = set([x['CityName'] for x in load_csv_data('de_cities.csv')])
+
+def __getattr__(name):
+    # de_cities (set of German city names) is read from the compiled
+    # dataset on first access, not at import time
+    if name == 'de_cities':
+        from adboox.utils.cities import de_cities_dataset
+        return de_cities_dataset().name_set
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
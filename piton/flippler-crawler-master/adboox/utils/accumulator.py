@@ -0,0 +1,216 @@
+"""
+Accumulators of the stores collected by store spiders (SendStoresWhenIdleMixin),
+ keyed by store id. Spiders use them like a dict: set, get and test stores
+ by key, then the mixin reports values() when the spider is idle.
+
+StoreAccumulator keeps the stores in memory. SqliteStoreAccumulator keeps
+ them JSON encoded in a temporary sqlite database once they came out of
+ the item pipelines, so memory does not grow with the stores a sweep
+ finds, and the outfile and the report are encoded from the stored JSON
+ (see adboox.utils.report.iter_json). Both give the same stores.
+
+The backend is chosen by the STORE_ACCUMULATOR setting (import path of the
+ class).
+"""
+import os
+import json
+import sqlite3
+import logging
+import tempfile
+from scrapy.utils.misc import load_object
+from adboox.utils.encoders import ItemEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACCUMULATOR = 'adboox.utils.accumulator.StoreAccumulator'
+
+
+def store_accumulator():
+    """
+    Returns a new accumulator of the backend configured by the settings
+    """
+    from adboox import settings
+    cls = load_object(getattr(settings, 'STORE_ACCUMULATOR', DEFAULT_ACCUMULATOR))
+    return cls.from_settings(settings)
+
+
+class StoreAccumulator(dict):
+    """
+    In memory accumulator: a dict whose values() is a list
+    """
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls()
+
+    def values(self):
+        return list(super(StoreAccumulator, self).values())
+
+    def item_scraped(self, item):
+        # the stored item is the object the pipelines updated
+        pass
+
+    def item_dropped(self, item):
+        pass
+
+    def close(self):
+        pass
+
+
+class StoredValues(object):
+    """
+    Lazy sequence of the stores of a SqliteStoreAccumulator. Iterating it
+     decodes the stores one by one; iter_json yields them as stored.
+    """
+
+    def __init__(self, accumulator):
+        self.accumulator = accumulator
+
+    def __len__(self):
+        return len(self.accumulator)
+
+    def __iter__(self):
+        for data in self.accumulator.iter_json():
+            yield json.loads(data)
+
+    def iter_json(self):
+        return self.accumulator.iter_json()
+
+
+class SqliteStoreAccumulator(object):
+    """
+    Accumulator backed by a temporary sqlite database, removed on close.
+     Stores are encoded when they are set, and encoded again when they
+     come out of the item pipelines, which may update them.
+
+    Until then a store is pending: the accumulator keeps the object and
+     returns it for its key, like StoreAccumulator does. Only the store
+     set last for a key is written when it comes out of the pipelines, or
+     is dropped by them. Stores which are never yielded stay pending
+     until values() is read, which writes the pending stores as they are.
+
+    :param directory: directory of the database (the temp directory if None)
+    """
+    # writes between commits
+    batch_size = 1000
+
+    @classmethod
+    def from_settings(cls, settings):
+        return cls(directory=getattr(settings, 'STORE_ACCUMULATOR_DIR', None))
+
+    def __init__(self, directory=None):
+        fd, self.path = tempfile.mkstemp(prefix='adboox-stores-', suffix='.sqlite', dir=directory)
+        os.close(fd)
+        # scratch data: no journal, no syncs
+        self.db = sqlite3.connect(self.path)
+        self.db.execute('PRAGMA journal_mode=OFF')
+        self.db.execute('PRAGMA synchronous=OFF')
+        self.db.execute('CREATE TABLE stores (key TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        self.encoder = ItemEncoder()
+        # id -> (store, keys) of the stores set and not out of the pipelines
+        # yet, and key -> id of the pending store set last for the key
+        self.pending = {}
+        self.latest = {}
+        self.writes = 0
+
+    @staticmethod
+    def _key(key):
+        # keys of the report are strings; None and numbers are kept apart
+        return repr(key)
+
+    def _write(self, key, value):
+        self.db.execute(
+            'INSERT INTO stores (key, data) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET data = excluded.data',
+            (self._key(key), self.encoder.encode(value)))
+        self.writes += 1
+        if self.writes % self.batch_size == 0:
+            self.db.commit()
+
+    def __setitem__(self, key, value):
+        self._write(key, value)
+        value_id = id(value)
+        if value_id not in self.pending:
+            self.pending[value_id] = (value, set())
+        self.pending[value_id][1].add(key)
+        self.latest[key] = value_id
+
+    def _settle(self, item):
+        """
+        Writes the item under the keys it is still the latest store of,
+         and forgets it
+        """
+        entry = self.pending.pop(id(item), None)
+        if entry is None or entry[0] is not item:
+            return
+        for key in entry[1]:
+            if self.latest.get(key) == id(item):
+                del self.latest[key]
+                self._write(key, item)
+
+    def flush(self):
+        """
+        Writes every pending store as it is now
+        """
+        for value, _ in list(self.pending.values()):
+            self._settle(value)
+
+    def __getitem__(self, key):
+        value_id = self.latest.get(key)
+        if value_id is not None:
+            return self.pending[value_id][0]
+        row = self.db.execute('SELECT data FROM stores WHERE key = ?', (self._key(key),)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.db.execute('SELECT 1 FROM stores WHERE key = ?', (self._key(key),)).fetchone() is not None
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM stores').fetchone()[0]
+
+    def __bool__(self):
+        return self.db.execute('SELECT 1 FROM stores LIMIT 1').fetchone() is not None
+
+    def item_scraped(self, item):
+        """
+        Stores the item again as the item pipelines updated it, unless
+         another store has been set for its key since
+        """
+        self._settle(item)
+
+    def item_dropped(self, item):
+        # pipelines may have updated the item before dropping it
+        self._settle(item)
+
+    def values(self):
+        self.flush()
+        return StoredValues(self)
+
+    def iter_json(self):
+        """
+        Yields the JSON encoded stores in the order they were first set
+        """
+        cursor = self.db.execute('SELECT data FROM stores ORDER BY rowid')
+        while True:
+            rows = cursor.fetchmany(self.batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row[0]
+
+    def close(self):
+        if self.db is None:
+            return
+        self.db.close()
+        self.db = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            logger.warning('Unable to remove %s', self.path)
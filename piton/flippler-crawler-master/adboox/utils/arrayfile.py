@@ -0,0 +1,129 @@
+"""
+Flat binary file format for named numpy arrays, opened with mmap.
+
+Layout: magic, header length (uint32 little endian), JSON header and the
+array data, every array aligned to ALIGNMENT bytes. The header holds the
+schema version, a hash of the source data the arrays were built from,
+free-form attributes and the dtype, shape and offset of every array.
+
+Files are written atomically (temporary file + rename), so concurrent
+processes either see the old or the new file. Opened arrays are read-only
+views of a shared mmap, so their pages are shared between processes.
+"""
+import os
+import json
+import mmap
+import struct
+import hashlib
+import tempfile
+import numpy as np
+
+MAGIC = b'ADBXARR1'
+ALIGNMENT = 64
+
+
+class ArrayFileError(ValueError):
+    pass
+
+
+def source_hash(data):
+    """ Returns hash of the source data (bytes) the arrays are built from. """
+    return hashlib.sha1(data).hexdigest()
+
+
+def _aligned(pos):
+    return (pos + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def write_arrays(path, arrays, version, source=None, attrs=None):
+    """
+    Atomically writes arrays (dict of name: ndarray) to path.
+    Object arrays are not supported; use fixed width string dtypes instead.
+    """
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+    for name, a in arrays.items():
+        if a.dtype.hasobject:
+            raise ArrayFileError('Array {} has object dtype'.format(name))
+
+    # offsets are relative to the start of the data section
+    index = {}
+    pos = 0
+    for name, a in arrays.items():
+        pos = _aligned(pos)
+        index[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': pos}
+        pos += a.nbytes
+
+    header = json.dumps({
+        'version': version,
+        'source': source,
+        'attrs': attrs or {},
+        'arrays': index,
+    }).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 4 + len(header))
+
+    dirname = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.tmp-', suffix='.arr')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<I', len(header)))
+            f.write(header)
+            for name, a in arrays.items():
+                f.seek(data_start + index[name]['offset'])
+                f.write(a.tobytes())
+            f.truncate(data_start + pos)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ArrayFile(object):
+    """
+    Arrays of a file written by write_arrays, mapped into memory.
+
+    :param version: if given, the schema version the file must have
+    :param source: if given, the source hash the file must have
+    Raises ArrayFileError if the file is invalid or outdated.
+    """
+
+    def __init__(self, path, version=None, source=None):
+        with open(path, 'rb') as f:
+            try:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise ArrayFileError('Empty file {}'.format(path))
+
+        buf = self._mmap
+        if buf[:len(MAGIC)] != MAGIC:
+            raise ArrayFileError('Not an array file: {}'.format(path))
+
+        header_len, = struct.unpack_from('<I', buf, len(MAGIC))
+        header_start = len(MAGIC) + 4
+        header = json.loads(bytes(buf[header_start:header_start + header_len]).decode('utf-8'))
+        if version is not None and header['version'] != version:
+            raise ArrayFileError('Schema version {} of {} is not {}'.format(
+                header['version'], path, version))
+        if source is not None and header['source'] != source:
+            raise ArrayFileError('Source of {} has changed'.format(path))
+
+        self.version = header['version']
+        self.source = header['source']
+        self.attrs = header['attrs']
+        data_start = _aligned(header_start + header_len)
+        self.arrays = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'], dtype=np.int64))
+            a = np.frombuffer(buf, dtype=dtype, count=count, offset=data_start + spec['offset'])
+            self.arrays[name] = a.reshape(spec['shape'])
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __contains__(self, name):
+        return name in self.arrays
@@ -8,8 +8,10 @@ def import_non_local(name, custom_name=None):
     return module
 
 std_calendar = import_non_local('calendar', 'std_calendar')
+import re
 from collections import OrderedDict
 from copy import copy
+from functools import lru_cache
 
 
 def _set_od(od, pairs, reverse=False):
@@ -74,3 +76,97 @@ def get_month_names(locale):
     with std_calendar.TimeEncoding(locale) as encoding:
         names = [mn for mn in std_calendar.month_name if mn]
         return [name.decode(encoding) for name in names]
+
+
+# names of the days in opening hours, by the index of the day (Monday is 0)
+_day_names = {}
+for _n, ((_en, _en_abbr), (_, _de_abbr), (_de, _)) in enumerate(zip(pairs_en, pairs_de, pairs_day_de)):
+    for _name in (_en, _en[:3], _en_abbr, _de, _de[:3], _de_abbr):
+        _day_names[_name.lower()] = _n
+_day_names.update({'tues': 1, 'thur': 3, 'thurs': 3})
+_days = list(day_to_abbr.keys())
+
+# short forms which are also ordinary German or English words; they are
+# days only when a day range, a list, a colon or times follow them, or
+# when they end a day range
+_ambiguous_day_names = {'die', 'mit', 'don', 'do', 'so', 'son', 'we', 'mon', 'sat', 'sun'}
+
+_TIME = r'\d{1,2}(?:[:.]\d{2})?'
+_RANGE = r'-|–|\bbis\b|\bto\b'
+_opening_tokens_re = re.compile(
+    r'(?P<open>{time})\s*(?:-|–|bis|to)\s*(?P<close>{time})'
+    r'|\b(?P<day>{days})\b\.?'
+    r'|\b(?P<ambiguous_day>{ambiguous})\b\.?'
+    r'(?=\s*(?:{range}|[:,&/]|\d|\bund\b|\band\b|\bgeschlossen\b|\bclosed\b))'
+    r'|\b(?P<word>{ambiguous})\b'
+    r'|(?P<range>{range})'
+    r'|(?P<closed>\bgeschlossen\b|\bclosed\b)'.format(
+        time=_TIME, range=_RANGE,
+        days='|'.join(sorted(set(_day_names) - _ambiguous_day_names, key=len, reverse=True)),
+        ambiguous='|'.join(sorted(_ambiguous_day_names, key=len, reverse=True))),
+    re.I)
+
+
+@lru_cache(maxsize=4096)
+def parse_opening_hours(text):
+    """
+    Parses opening hours in German or English, like 'Mo.-Sa.: 7.00 - 21.00',
+     'Montag bis Freitag 08:00-20:00 Uhr, Sa 8-14' or 'Mo 08:00-21:00 Di
+     08:00-21:00', into a tuple of (day, open, close), where day is the
+     English name of the day and open and close are the times as written.
+
+    Day ranges may wrap around the week; days followed by `closed` or
+     without times are left out. Time spans without days, like the second
+     one of 'Mo-Fr 08:00-12:30 und 14:00-18:00', extend the hours of the
+     days before them: they open at the first span and close at the last. Short forms which are ordinary words too
+     (like `die`, `mit` or `so`) are days only next to a day range, a
+     colon or times. Results are memoized by the text.
+    """
+    hours = []
+    days = []
+    # indices of the hours of the last time span, which later time spans
+    # without days extend
+    shift = ()
+    range_start = None
+    after_range = False
+    for m in _opening_tokens_re.finditer(text):
+        kind = m.lastgroup
+        if kind == 'word':
+            if not after_range:
+                continue
+            kind = 'day'
+        if kind == 'close':
+            if days:
+                shift = range(len(hours), len(hours) + len(days))
+                for day in days:
+                    hours.append((_days[day], m.group('open'), m.group('close')))
+            else:
+                # a split shift: the days close after the last time span
+                for n in shift:
+                    hours[n] = hours[n][:2] + (m.group('close'),)
+            days = []
+            range_start = None
+        elif kind in ('day', 'ambiguous_day'):
+            day = _day_names[m.group(m.lastgroup).lower()]
+            if after_range and range_start is not None:
+                count = (day - range_start) % 7
+                days.extend((range_start + n) % 7 for n in range(1, count + 1))
+                range_start = None
+            else:
+                days.append(day)
+                range_start = day
+        elif kind == 'closed':
+            days = []
+            shift = ()
+            range_start = None
+        after_range = kind == 'range'
+    return tuple(hours)
+
+
+def opening_days(text):
+    """
+    Returns dict of the English day name to {'Open': ..., 'Close': ...}
+     of the opening hours in the text (see parse_opening_hours). Later
+     times of a day replace earlier ones.
+    """
+    return {day: {'Open': open_, 'Close': close} for day, open_, close in parse_opening_hours(text)}
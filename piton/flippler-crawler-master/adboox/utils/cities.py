@@ -0,0 +1,162 @@
+"""
+Columnar dataset of German cities (data/de_cities.csv), compiled once into
+ a memory-mapped array file, so every process of a host shares one copy.
+
+Columns are float latitudes and longitudes, zipcodes and indexes into a
+ table of interned (unique, sorted) city names. Rows sorted by zipcode and
+ by name are stored as well, so lookups by either are binary searches.
+"""
+import pkgutil
+import numpy as np
+from io import StringIO
+from adboox import __version__
+from adboox.utils.arrayfile import source_hash
+from adboox.geolib.tools.cache import ArrayCache
+
+_dataset = None
+
+
+def de_cities_dataset():
+    """
+    Returns the CitiesDataset of de_cities.csv. It is opened (and built,
+     if the compiled file is missing or outdated) once per process.
+    """
+    global _dataset
+    if _dataset is None:
+        _dataset = CitiesDatasetCache('de_cities').get()
+    return _dataset
+
+
+class CitiesDataset(object):
+    """
+    Cities as columns of numpy arrays (possibly read-only memory maps).
+
+    :param lats: latitudes of the cities
+    :param lngs: longitudes of the cities
+    :param zipcodes: zipcodes of the cities (str, five digits)
+    :param names: table of unique city names, sorted
+    :param name_ids: index of the name of every city in the table
+    :param by_zipcode: rows sorted by zipcode
+    :param zipcode_keys: zipcodes of the rows sorted by zipcode
+    :param by_name: rows sorted by name
+    :param name_starts: position of the first row of every name in by_name
+     (plus the total count); rows of the n-th name are
+     by_name[name_starts[n]:name_starts[n + 1]]
+
+    The indexes are computed, if not given.
+    """
+
+    def __init__(self, lats, lngs, zipcodes, names, name_ids,
+                 by_zipcode=None, zipcode_keys=None, by_name=None, name_starts=None):
+        self.lats = lats
+        self.lngs = lngs
+        self.zipcodes = zipcodes
+        self.names = names
+        self.name_ids = name_ids
+        if by_zipcode is None:
+            by_zipcode = np.argsort(zipcodes, kind='stable')
+            zipcode_keys = zipcodes[by_zipcode]
+        if by_name is None:
+            by_name = np.argsort(name_ids, kind='stable')
+            counts = np.bincount(name_ids, minlength=len(names))
+            name_starts = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.by_zipcode = by_zipcode
+        self.zipcode_keys = zipcode_keys
+        self.by_name = by_name
+        self.name_starts = name_starts
+        self._name_set = None
+
+    @classmethod
+    def from_csv(cls, data):
+        """
+        Makes the dataset from the contents (bytes) of de_cities.csv
+        """
+        sio = StringIO(data.decode('utf-8'))
+        keys = next(sio).strip().split(';')
+        columns = list(zip(*[line.strip().split(';') for line in sio if line.strip()]))
+        columns = dict(zip(keys, columns)) if columns else {k: () for k in keys}
+        names, name_ids = np.unique(np.array(columns['CityName'], dtype=np.str_), return_inverse=True)
+        return cls(np.array(columns['Latitude'], dtype=np.float64),
+                   np.array(columns['Longitude'], dtype=np.float64),
+                   np.array(columns['PostalCode'], dtype='U5'),
+                   names, name_ids.astype(np.int32))
+
+    def __len__(self):
+        return len(self.lats)
+
+    def __iter__(self):
+        for n in range(len(self)):
+            yield self.row(n)
+
+    def name(self, n):
+        """
+        Returns the city name of the n-th row
+        """
+        return str(self.names[self.name_ids[n]])
+
+    def row(self, n):
+        """
+        Returns the n-th row as a dict with the keys of de_cities.csv
+        """
+        return {
+            'CityName': self.name(n),
+            'Latitude': float(self.lats[n]),
+            'Longitude': float(self.lngs[n]),
+            'PostalCode': str(self.zipcodes[n]),
+            'CountryCode': 'DE',
+        }
+
+    def rows_by_zipcode(self, zipcode):
+        """
+        Returns sorted array of the rows with given zipcode
+        """
+        start = np.searchsorted(self.zipcode_keys, zipcode, side='left')
+        end = np.searchsorted(self.zipcode_keys, zipcode, side='right')
+        return np.sort(self.by_zipcode[start:end])
+
+    def rows_by_name(self, name):
+        """
+        Returns sorted array of the rows with given city name
+        """
+        n = int(np.searchsorted(self.names, name))
+        if n >= len(self.names) or self.names[n] != name:
+            return np.empty(0, dtype=np.intp)
+        return np.sort(self.by_name[self.name_starts[n]:self.name_starts[n + 1]])
+
+    @property
+    def name_set(self):
+        """
+        Frozen set of all city names
+        """
+        if self._name_set is None:
+            self._name_set = frozenset(self.names.tolist())
+        return self._name_set
+
+
+class CitiesDatasetCache(ArrayCache):
+    """
+    Compiled CitiesDataset of a csv file in adboox/data. The file is
+     rebuilt when the csv or schema_version change.
+    """
+    schema_version = 1
+    columns = ('lats', 'lngs', 'zipcodes', 'names', 'name_ids',
+               'by_zipcode', 'zipcode_keys', 'by_name', 'name_starts')
+
+    def __init__(self, name, csv_name='de_cities.csv'):
+        super(CitiesDatasetCache, self).__init__('{}_{}'.format(name, __version__))
+        self.csv_name = csv_name
+
+    def _csv_data(self):
+        return pkgutil.get_data('adboox', 'data/' + self.csv_name)
+
+    def source_hash(self):
+        return source_hash(self._csv_data())
+
+    def make_new(self):
+        return CitiesDataset.from_csv(self._csv_data())
+
+    def to_arrays(self, obj):
+        return {name: getattr(obj, name) for name in self.columns}, {}
+
+    def from_arrays(self, arrays, attrs):
+        return CitiesDataset(**{name: arrays[name] for name in self.columns})
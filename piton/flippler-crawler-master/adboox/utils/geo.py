@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 
 def calculate_distance(p1, p2):
@@ -12,3 +13,17 @@ def calculate_distance(p1, p2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     d = r * c
     return d
+
+
+def calculate_distances(p, lats, lons):
+    """ Same as calculate_distance, from point p to arrays of latitudes and longitudes. """
+    lat1, lon1 = p
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    r = 6378.137  # Radius of earth in KM
+    dlat = np.radians(lats - lat1)
+    dlon = np.radians(lons - lon1)
+    a = np.sin(dlat / 2) ** 2 + math.cos(math.radians(lat1)) * np.cos(
+        np.radians(lats)) * np.sin(dlon / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return r * c
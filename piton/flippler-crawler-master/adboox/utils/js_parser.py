@@ -1,67 +1,417 @@
-from pyparsing import Suppress, Regex, Optional, Group, Literal, Word, Forward
-from pyparsing import alphas, alphanums, delimitedList, quotedString, cStyleComment
+"""
+Parser of javascript `var` statements assigning object, array, string,
+ number and boolean literals, e.g. data embedded in store finder pages.
 
+parse_variables uses a hand-written recursive descent parser. It follows
+ the pyparsing grammar it replaced token by token, so it returns the same
+ results, except that objects may have a trailing comma. Strings are
+ returned as written (escapes are kept), unless unescape is set. Whenever
+ the fast parser raises, the pyparsing grammar parses the text instead.
 
-LBR, RBR, LCUR, RCUR = [Suppress(x) for x in '[]{}']
-IDENTIFIER = Word(alphas + '_', alphanums + '_')
+find_js_value, extract_js_value and parse_js_value locate the literal
+ assigned to a name (`name = ...` or `name: ...`) in the undecoded body
+ of a response (bytes or a memoryview of them), so only that fragment is
+ decoded and parsed.
+"""
+import re
+import logging
+from functools import lru_cache
+from adboox.utils.memo import memoized_parse
 
-INT_DECIMAL = Regex('([+-]?(([1-9][0-9]*)|0+))')
-INT_DECIMAL.setParseAction(lambda x: int(x[0]))
+logger = logging.getLogger(__name__)
 
-INT_OCTAL = Regex('(0[0-7]*)')
-INT_OCTAL.setParseAction(lambda x: int(x[0], 8))
+# token patterns, shared by both parsers
+IDENTIFIER_RE = r'[A-Za-z_][A-Za-z0-9_]*'
+INT_DECIMAL_RE = r'([+-]?(([1-9][0-9]*)|0+))'
+INT_OCTAL_RE = r'(0[0-7]*)'
+INT_HEXADECIMAL_RE = r'(0[xX][0-9a-fA-F]*)'
+FLOAT_RE = r'[+-]?(((\d+\.\d*)|(\d*\.\d+))([eE][-+]?\d+)?)|(\d*[eE][+-]?\d+)'
+# same as pyparsing's quotedString (without the closing quote, which is
+# matched separately, so the body is never backtracked) and cStyleComment
+DBL_QUOTED_RE = r'"(?:[^"\n\r\\]+|""|\\(?:[^x]|x[0-9a-fA-F]+))*'
+SGL_QUOTED_RE = r"'(?:[^'\n\r\\]+|''|\\(?:[^x]|x[0-9a-fA-F]+))*"
+COMMENT_RE = r'/\*.*?\*/'
 
-INT_HEXADECIMAL = Regex('(0[xX][0-9a-fA-F]*)')
-INT_HEXADECIMAL.setParseAction(lambda x: int(x[0], 16))
+_IDENTIFIER = re.compile(IDENTIFIER_RE)
+_INT_DECIMAL = re.compile(INT_DECIMAL_RE)
+_INT_OCTAL = re.compile(INT_OCTAL_RE)
+_INT_HEXADECIMAL = re.compile(INT_HEXADECIMAL_RE)
+_FLOAT = re.compile(FLOAT_RE)
+_QUOTED = {'"': re.compile(DBL_QUOTED_RE), "'": re.compile(SGL_QUOTED_RE)}
+_IGNORED = re.compile(r'(?:[ \n\t\r]+|{})*'.format(COMMENT_RE), re.S)
+_STATEMENT_START = re.compile(r'var|/\*')
+_NUMBER_START = frozenset('0123456789+-.eE')
 
-INTEGER = INT_HEXADECIMAL | INT_OCTAL | INT_DECIMAL
+_ESCAPE = re.compile(r'\\(u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|\r\n|[\s\S])')
+_ESCAPED_CHARS = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0',
+                  '\n': '', '\r': '', '\r\n': '', '\u2028': '', '\u2029': ''}
+_SURROGATE = re.compile('[\ud800-\udfff]')
 
-FLOAT = Regex(r'[+-]?(((\d+\.\d*)|(\d*\.\d+))([eE][-+]?\d+)?)|(\d*[eE][+-]?\d+)')
-FLOAT.setParseAction(lambda x: float(x[0]))
+# tokens which matter when matching the brackets of a literal: brackets,
+# strings and comments (which may contain brackets)
+_BRACKET_TOKENS = re.compile(
+    rb'[{}\[\]]'
+    rb'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    rb"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    rb'|/\*.*?\*/'
+    rb'|//[^\n]*', re.S)
+# strings, numbers and booleans
+_SCALAR_TOKEN = re.compile(
+    rb'"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    rb"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    rb'|[-+.\w]+', re.S)
+_OPENING, _CLOSING = frozenset(b'{['), frozenset(b'}]')
 
-QUOTED_STRING = quotedString
-QUOTED_STRING.setParseAction(lambda x: x[0][1:-1])
+# texts shorter than this are parsed without the parse cache
+MEMO_MIN_SIZE = 32 * 1024
 
-TRUE = Literal('true')
-TRUE.setParseAction(lambda _: True)
+_JS_VAR = None
 
-FALSE = Literal('false')
-FALSE.setParseAction(lambda _: False)
 
-BOOLEAN = TRUE | FALSE
+def _build_grammar():
+    # pyparsing is imported and the grammar built on first use only,
+    # so importing spiders stays cheap
+    from pyparsing import Suppress, Regex, Optional, Group, Literal, Word, Forward
+    from pyparsing import alphas, alphanums, delimitedList, quotedString, cStyleComment
 
-JS_VALUE = Forward()
+    LBR, RBR, LCUR, RCUR = [Suppress(x) for x in '[]{}']
+    IDENTIFIER = Word(alphas + '_', alphanums + '_')
 
-DICT_ITEM = Group((IDENTIFIER | QUOTED_STRING) + Literal(':').suppress() + JS_VALUE)
+    INT_DECIMAL = Regex(INT_DECIMAL_RE)
+    INT_DECIMAL.setParseAction(lambda x: int(x[0]))
 
-DICT = LCUR + Optional(delimitedList(DICT_ITEM)) + RCUR
-DICT.setParseAction(lambda x: dict(x.asList()))
+    INT_OCTAL = Regex(INT_OCTAL_RE)
+    INT_OCTAL.setParseAction(lambda x: int(x[0], 8))
 
-LIST = LBR + delimitedList(Optional(JS_VALUE)) + RBR
-LIST.setParseAction(lambda x: [x.asList()])
+    INT_HEXADECIMAL = Regex(INT_HEXADECIMAL_RE)
+    INT_HEXADECIMAL.setParseAction(lambda x: int(x[0], 16))
 
-JS_VALUE << (DICT | LIST | QUOTED_STRING | FLOAT | INTEGER | BOOLEAN)
+    INTEGER = INT_HEXADECIMAL | INT_OCTAL | INT_DECIMAL
 
-ASSIGNMENT = Group(IDENTIFIER.setResultsName('variable') + Literal('=').suppress() + JS_VALUE.setResultsName('value'))
+    FLOAT = Regex(FLOAT_RE)
+    FLOAT.setParseAction(lambda x: float(x[0]))
 
-JS_VAR = Literal('var').suppress() + delimitedList(ASSIGNMENT) + Literal(';').suppress()
-JS_VAR.ignore(cStyleComment)
+    QUOTED_STRING = quotedString
+    QUOTED_STRING.setParseAction(lambda x: x[0][1:-1])
 
+    TRUE = Literal('true')
+    TRUE.setParseAction(lambda _: True)
 
-def parse_variables(text):
+    FALSE = Literal('false')
+    FALSE.setParseAction(lambda _: False)
+
+    BOOLEAN = TRUE | FALSE
+
+    JS_VALUE = Forward()
+
+    DICT_ITEM = Group((IDENTIFIER | QUOTED_STRING) + Literal(':').suppress() + JS_VALUE)
+
+    DICT = LCUR + Optional(delimitedList(DICT_ITEM)) + RCUR
+    DICT.setParseAction(lambda x: dict(x.asList()))
+
+    LIST = LBR + delimitedList(Optional(JS_VALUE)) + RBR
+    LIST.setParseAction(lambda x: [x.asList()])
+
+    JS_VALUE << (DICT | LIST | QUOTED_STRING | FLOAT | INTEGER | BOOLEAN)
+
+    ASSIGNMENT = Group(IDENTIFIER.setResultsName('variable') + Literal('=').suppress() + JS_VALUE.setResultsName('value'))
+
+    JS_VAR = Literal('var').suppress() + delimitedList(ASSIGNMENT) + Literal(';').suppress()
+    JS_VAR.ignore(cStyleComment)
+    return JS_VAR
+
+
+def _js_var():
+    global _JS_VAR
+    if _JS_VAR is None:
+        _JS_VAR = _build_grammar()
+    return _JS_VAR
+
+
+def unescape_js(text):
+    """
+    Decodes the escape sequences of a javascript string literal
+    """
+    if '\\' not in text:
+        return text
+
+    def replace(m):
+        seq = m.group(1)
+        if len(seq) > 1 and seq[0] in 'ux':
+            return chr(int(seq[1:], 16))
+        return _ESCAPED_CHARS.get(seq, seq)
+
+    text = _ESCAPE.sub(replace, text)
+    if _SURROGATE.search(text):
+        # \uXXXX pairs encoding characters outside of the BMP
+        text = text.encode('utf-16', 'surrogatepass').decode('utf-16', 'replace')
+    return text
+
+
+class _NoMatch(Exception):
+    pass
+
+
+class _FastParser(object):
+    """
+    Recursive descent parser of the grammar of _build_grammar. Like
+     pyparsing, it skips whitespace and /* */ comments before every token
+     and never backtracks into an alternative which has matched.
+    """
+
+    def __init__(self, text, unescape=False):
+        self.text = text
+        self.unescape = unescape
+
+    def skip(self, pos):
+        return _IGNORED.match(self.text, pos).end()
+
+    def expect(self, pos, literal):
+        pos = self.skip(pos)
+        if not self.text.startswith(literal, pos):
+            raise _NoMatch()
+        return pos + len(literal)
+
+    def variables(self):
+        """
+        Yields (name, value) of every `var` statement, scanning the text
+         like pyparsing's searchString
+        """
+        text = self.text
+        pos = 0
+        while True:
+            m = _STATEMENT_START.search(text, pos)
+            if m is None:
+                return
+            start = m.start()
+            if text.startswith('/*', start):
+                # text in comments is skipped, unless they are not closed
+                after = self.skip(start)
+                if after == start or not text.startswith('var', after):
+                    pos = start + 1 if after == start else after + 1
+                    continue
+                start = after
+
+            try:
+                assignments, pos = self.statement(start + 3)
+            except _NoMatch:
+                pos = start + 1
+                continue
+            for assignment in assignments:
+                yield assignment
+
+    def statement(self, pos):
+        assignments = []
+        while True:
+            name, pos = self.identifier(pos)
+            pos = self.expect(pos, '=')
+            value, pos = self.value(pos)
+            assignments.append((name, value))
+            try:
+                pos = self.expect(pos, ',')
+            except _NoMatch:
+                break
+        return assignments, self.expect(pos, ';')
+
+    def identifier(self, pos):
+        pos = self.skip(pos)
+        m = _IDENTIFIER.match(self.text, pos)
+        if m is None:
+            raise _NoMatch()
+        return m.group(), m.end()
+
+    def string(self, pos):
+        quote = self.text[pos]
+        end = _QUOTED[quote].match(self.text, pos).end()
+        if not self.text.startswith(quote, end):
+            raise _NoMatch()
+        value = self.text[pos + 1:end]
+        return unescape_js(value) if self.unescape else value, end + 1
+
+    def value(self, pos):
+        pos = self.skip(pos)
+        text = self.text
+        c = text[pos:pos + 1]
+        if c == '{':
+            return self.object(pos + 1)
+        if c == '[':
+            return self.array(pos + 1)
+        if c in _QUOTED:
+            return self.string(pos)
+        if c and c in _NUMBER_START:
+            m = _FLOAT.match(text, pos)
+            if m is not None:
+                return float(m.group()), m.end()
+            for pattern, base in ((_INT_HEXADECIMAL, 16), (_INT_OCTAL, 8), (_INT_DECIMAL, 10)):
+                m = pattern.match(text, pos)
+                if m is not None:
+                    return int(m.group(), base), m.end()
+        if text.startswith('true', pos):
+            return True, pos + 4
+        if text.startswith('false', pos):
+            return False, pos + 5
+        raise _NoMatch()
+
+    def key(self, pos):
+        pos = self.skip(pos)
+        if self.text[pos:pos + 1] in _QUOTED:
+            return self.string(pos)
+        return self.identifier(pos)
+
+    def object(self, pos):
+        obj = {}
+        while True:
+            try:
+                key, after = self.key(pos)
+            except _NoMatch:
+                # empty object or a trailing comma
+                break
+            after = self.expect(after, ':')
+            obj[key], pos = self.value(after)
+            try:
+                pos = self.expect(pos, ',')
+            except _NoMatch:
+                break
+        return obj, self.expect(pos, '}')
+
+    def array(self, pos):
+        items = []
+        while True:
+            # elements may be left out, e.g. [1,,2] or [1,]
+            try:
+                item, pos = self.value(pos)
+                items.append(item)
+            except _NoMatch:
+                pass
+            try:
+                pos = self.expect(pos, ',')
+            except _NoMatch:
+                break
+        return items, self.expect(pos, ']')
+
+
+def parse_variables_pyparsing(text, unescape=False):
+    """
+    parse_variables with the pyparsing grammar
+    """
     ret = {}
-    for tokens in JS_VAR.searchString(text):
+    for tokens in _js_var().searchString(text):
         for token in tokens:
             ret[token.variable] = token.value
+    if unescape:
+        ret = _unescape_all(ret)
     return ret
 
+
+def _unescape_all(value):
+    if isinstance(value, str):
+        return unescape_js(value)
+    if isinstance(value, dict):
+        return {_unescape_all(k): _unescape_all(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unescape_all(v) for v in value]
+    return value
+
+
+@memoized_parse(min_size=MEMO_MIN_SIZE)
+def parse_variables(text, unescape=False):
+    """
+    Returns dict of the variables assigned by the `var` statements of
+     the text. Statements which are not made of literals only are left out.
+
+    :param unescape: if set, escape sequences of strings are decoded
+    """
+    try:
+        return dict(_FastParser(text, unescape).variables())
+    except Exception:
+        logger.debug('Falling back to pyparsing grammar', exc_info=True)
+        return parse_variables_pyparsing(text, unescape)
+
+
+@lru_cache(maxsize=64)
+def _name_pattern(name):
+    # the name, possibly quoted as a key, followed by `=` or `:`
+    return re.compile(rb'(?<![\w$.])(["\']?)' + re.escape(name.encode('utf-8')) + rb'\1\s*(?:=(?!=)|:)\s*')
+
+
+def _literal_end(data, pos):
+    """
+    Returns the end of the literal starting at pos, or None if it is not
+     a literal or not closed. Brackets are matched in a single scan of
+     the tokens, skipping those in strings and comments.
+    """
+    if pos >= len(data):
+        return None
+    if data[pos] not in _OPENING:
+        m = _SCALAR_TOKEN.match(data, pos)
+        return m.end() if m else None
+
+    depth = 0
+    for m in _BRACKET_TOKENS.finditer(data, pos):
+        c = data[m.start()]
+        if c in _OPENING:
+            depth += 1
+        elif c in _CLOSING:
+            depth -= 1
+            if not depth:
+                return m.end()
+    return None
+
+
+def find_js_value(data, name, start=0):
+    """
+    Returns (start, end) of the first literal assigned to the name in the
+     data, or None if there is none
+
+    :param data: bytes, bytearray or memoryview, e.g. response.body
+    :param name: variable or key name
+    :param start: position where the search starts
+    """
+    for m in _name_pattern(name).finditer(data, start):
+        end = _literal_end(data, m.end())
+        if end is not None:
+            return m.end(), end
+    return None
+
+
+def extract_js_value(data, name, encoding='utf-8', start=0):
+    """
+    Returns the source of the first literal assigned to the name in the
+     data, decoded, or None if there is none
+    """
+    span = find_js_value(data, name, start)
+    if span is None:
+        return None
+    return str(data[span[0]:span[1]], encoding, 'replace')
+
+
+@memoized_parse(min_size=MEMO_MIN_SIZE)
+def parse_js_value(data, name, encoding='utf-8', unescape=False, start=0):
+    """
+    Returns the first literal assigned to the name in the data, parsed,
+     or None if there is none or it can not be parsed
+
+    :param data: bytes, bytearray or memoryview, e.g. response.body
+    :param encoding: encoding of the data, e.g. response.encoding
+    :param unescape: if set, escape sequences of strings are decoded
+    """
+    text = extract_js_value(data, name, encoding, start)
+    if text is None:
+        return None
+    try:
+        return _FastParser(text, unescape).value(0)[0]
+    except Exception:
+        logger.debug('Falling back to pyparsing grammar', exc_info=True)
+        return parse_variables_pyparsing('var value = {};'.format(text), unescape).get('value')
+
+
 def remove_commented_out_jscode(text):
     """
     Removes the commented out js code block from the given text.
     Example:
         'var x = 12; /* var x = 15; */ var y = 15;' becomes 'var x = 12;  var y = 15;'
     """
-    cleaned = ''
+    cleaned = []
     stack = []
     buffer = []
     chars = ['/', '*']
@@ -75,10 +425,10 @@ def remove_commented_out_jscode(text):
             elif in_buffer + c == close_seq:
                 stack.pop()
             else:
-                cleaned += in_buffer
+                cleaned.append(in_buffer)
         elif c in chars:
             buffer.append(c)
         if not (stack or buffer):
-            cleaned += c
-    return cleaned
+            cleaned.append(c)
+    return ''.join(cleaned)
 
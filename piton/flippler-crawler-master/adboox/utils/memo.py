@@ -0,0 +1,289 @@
+"""
+Disk-backed memo of parse results for upstream resources which rarely
+ change (store finder scripts, store lists, flyer overviews), so repeated
+ runs skip parsing them.
+
+Results are keyed by a hash of the parsed data (the body of a response,
+ plus its ETag and Last-Modified headers), the parser and its arguments,
+ and pickled into a file per key. Entries expire after a TTL; when the
+ cache directory grows over its size limit, the least recently used
+ entries are removed.
+
+The cache directory must be private to the user running the crawler
+ (pickles are code): it is made with mode 0700, and the cache is disabled
+ if it is owned by another user or writable by others.
+
+Parsers opt in with the memoized_parse decorator. The cache is configured
+ from the PARSE_CACHE_* settings of the crawler by ParseCacheExtension
+ (adboox.extensions); without it, parsers run uncached.
+"""
+import os
+import stat
+import time
+import struct
+import pickle
+import hashlib
+import logging
+import tempfile
+import functools
+from adboox import __version__
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ADBXMEM1'
+_HEADER = struct.Struct('<d')
+# eviction removes entries until the cache is this fraction of its limit,
+# so it does not run again on the next write
+LOW_WATERMARK = 0.8
+
+_cache = None
+
+
+def default_cache_dir():
+    """
+    Returns the parse cache directory in the cache home of the user
+    """
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'adboox', 'parse_cache')
+
+
+def parse_cache():
+    """
+    Returns the ParseCache of the running crawler, or None if it is
+     disabled or not configured
+    """
+    return _cache
+
+
+def configure_parse_cache(settings):
+    """
+    Makes the parse cache from the PARSE_CACHE_* values of settings (a
+     scrapy Settings object). Returns it, or None if it is disabled.
+    """
+    global _cache
+    if not settings.getbool('PARSE_CACHE_ENABLED'):
+        _cache = None
+    else:
+        ttl = settings.get('PARSE_CACHE_TTL', 7 * 24 * 3600)
+        _cache = ParseCache(settings.get('PARSE_CACHE_DIR') or default_cache_dir(),
+                            max_bytes=settings.getint('PARSE_CACHE_MAX_BYTES', 256 * 1024 * 1024),
+                            ttl=float(ttl) if ttl is not None else None)
+    return _cache
+
+
+def reset_parse_cache():
+    """
+    Disables the parse cache until it is configured again
+    """
+    global _cache
+    _cache = None
+
+
+class ParseCache(object):
+    """
+    Directory of pickled parse results, one file per key.
+
+    :param path: the cache directory, made (mode 0700) if missing
+    :param max_bytes: size limit of the cache files
+    :param ttl: seconds an entry is valid after it was stored (None for ever)
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024 * 1024, ttl=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._size = None
+        self._private = None
+
+    def is_private(self):
+        """
+        Makes the cache directory if missing, and checks it is owned by
+         the current user and not writable by others. Other directories
+         are not used, since anyone able to write a memo file there could
+         run code in the crawler.
+        """
+        if self._private is None:
+            try:
+                os.makedirs(self.path, mode=0o700, exist_ok=True)
+                st = os.lstat(self.path)
+            except OSError:
+                logger.warning('Unable to make the parse cache %s, it is disabled', self.path, exc_info=True)
+                self._private = False
+                return False
+            self._private = (stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid()
+                             and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH))
+            if not self._private:
+                logger.warning('The parse cache %s is not a private directory of this user, '
+                               'it is disabled', self.path)
+        return self._private
+
+    def _file_name(self, key):
+        return os.path.join(self.path, key + '.memo')
+
+    def get(self, key):
+        """
+        Returns (True, result) of the key, or (False, None) if it is not
+         cached or expired
+        """
+        if not self.is_private():
+            self.misses += 1
+            return False, None
+
+        path = self._file_name(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if not data.startswith(MAGIC):
+                raise ValueError('Invalid memo file')
+            created, = _HEADER.unpack_from(data, len(MAGIC))
+            if self.ttl is not None and time.time() - created > self.ttl:
+                self._remove(path)
+                self.misses += 1
+                return False, None
+            result = pickle.loads(data[len(MAGIC) + _HEADER.size:])
+        except FileNotFoundError:
+            self.misses += 1
+            return False, None
+        except Exception:
+            logger.debug('Unable to read memo %s', path, exc_info=True)
+            self._remove(path)
+            self.misses += 1
+            return False, None
+
+        try:
+            # the modification time orders entries for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return True, result
+
+    def set(self, key, result):
+        """
+        Stores the result of the key, evicting entries if the cache grows
+         over its limit
+        """
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            logger.warning('Unable to pickle the result of %s', key, exc_info=True)
+            return
+
+        size = len(MAGIC) + _HEADER.size + len(data)
+        if size > self.max_bytes or not self.is_private():
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.path, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(MAGIC)
+                f.write(_HEADER.pack(time.time()))
+                f.write(data)
+            os.replace(tmp_path, self._file_name(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += size
+        if self._size > self.max_bytes:
+            self.evict(int(self.max_bytes * LOW_WATERMARK))
+
+    def _entries(self):
+        """
+        Yields (modification time, size, path) of the cache files
+        """
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return
+        for name in names:
+            if not name.endswith('.memo'):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            yield st.st_mtime, st.st_size, path
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def evict(self, max_bytes):
+        """
+        Removes expired entries, then the least recently used ones until
+         the cache files take at most max_bytes
+        """
+        now = time.time()
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, path in entries:
+            expired = self.ttl is not None and now - mtime > self.ttl
+            if total <= max_bytes and not expired:
+                continue
+            self._remove(path)
+            total -= size
+        self._size = total
+
+
+def _data_bytes(data):
+    """
+    Returns (bytes of the data, validators) of a response, str or bytes
+    """
+    body = getattr(data, 'body', None)
+    if body is not None:
+        headers = data.headers
+        validators = b'\0'.join(headers.get(name) or b'' for name in (b'ETag', b'Last-Modified'))
+        return body, validators
+    if isinstance(data, str):
+        return data.encode('utf-8', 'surrogatepass'), b''
+    return data, b''
+
+
+def memoized_parse(namespace=None, version=1, min_size=0):
+    """
+    Decorator of a parser whose first argument is the parsed data (a
+     response, str, bytes or memoryview); its result is memoized in the
+     parse cache. Other arguments must have stable reprs and the result
+     must be picklable.
+
+    :param namespace: name of the parser in keys (the qualified function
+     name by default)
+    :param version: bump it when the parser returns other results
+    :param min_size: data shorter than this is parsed without the cache
+    """
+    def decorator(func):
+        prefix = '{}:{}:{}'.format(
+            namespace or '{}.{}'.format(func.__module__, func.__qualname__), version, __version__)
+
+        @functools.wraps(func)
+        def wrapper(data, *args, **kwargs):
+            cache = parse_cache()
+            if cache is None:
+                return func(data, *args, **kwargs)
+
+            body, validators = _data_bytes(data)
+            if len(body) < min_size:
+                return func(data, *args, **kwargs)
+
+            h = hashlib.sha1(prefix.encode('utf-8'))
+            h.update(repr((args, sorted(kwargs.items()))).encode('utf-8') + b'\0')
+            h.update(validators + b'\0')
+            h.update(body)
+            key = h.hexdigest()
+
+            found, result = cache.get(key)
+            if not found:
+                result = func(data, *args, **kwargs)
+                cache.set(key, result)
+            return result
+
+        return wrapper
+    return decorator
@@ -0,0 +1,178 @@
+"""
+Chunked delivery of crawl reports to the notification url.
+
+The report is encoded to JSON incrementally and compressed into a single
+ gzip stream, which is POSTed in chunks of at most REPORT_CHUNK_BYTES,
+ one after another. Every chunk carries the headers
+
+    X-Report-Id: <id of the report>
+    X-Report-Sequence: <number of the chunk, from 0>
+
+and is a piece of the gzip stream (Content-Type: application/gzip), not
+ decodable on its own. After the last chunk, a commit message is POSTed
+ (X-Report-Commit: 1) with a JSON body:
+
+    {"ReportId": ..., "JobId": ..., "Chunks": <count>, "Size": <bytes>,
+     "Sha1": <hex digest of the gzip stream>}
+
+The receiver joins the chunks in sequence order, checks size and digest,
+ and decompresses the report. Reports without a commit are incomplete.
+ `scrapy reportreceiver` is a receiver for local runs.
+"""
+import json
+import uuid
+import zlib
+import hashlib
+import logging
+from scrapy.http import Request
+from adboox.utils.encoders import ItemEncoder
+
+logger = logging.getLogger(__name__)
+
+# pieces of the encoded report are compressed in batches of this size
+ENCODE_BATCH = 64 * 1024
+
+
+def report_summary(data):
+    """
+    Returns one line describing the report, for logging
+    """
+    results = data.get('Results')
+    parts = ['JobId={}'.format(data.get('JobId')), 'Status={}'.format(data.get('Status'))]
+    if _is_array(results):
+        parts.append('Results={}'.format(len(results)))
+    elif results is not None:
+        parts.append('Results={}'.format(type(results).__name__))
+    extra = sorted(k for k in data if k not in ('JobId', 'Status', 'Results'))
+    if extra:
+        parts.append('keys={}'.format(','.join(extra)))
+    return ' '.join(parts)
+
+
+def _is_array(value):
+    # lists, and lazy sequences of encoded items (see adboox.utils.accumulator)
+    return isinstance(value, (list, tuple)) or hasattr(value, 'iter_json')
+
+
+def _iter_array(value, encoder):
+    if hasattr(value, 'iter_json'):
+        items = value.iter_json()
+    else:
+        items = (encoder.encode(item) for item in value)
+    yield '['
+    for n, item in enumerate(items):
+        yield ', ' + item if n else item
+    yield ']'
+
+
+def iter_json(data, encoder=None):
+    """
+    Yields the JSON encoding of the data in pieces: the items of arrays, at
+     the top level or in the top level dict, are encoded one by one,
+     everything else at once
+    """
+    encoder = encoder or ItemEncoder()
+    if _is_array(data):
+        yield from _iter_array(data, encoder)
+        return
+    if not isinstance(data, dict):
+        yield encoder.encode(data)
+        return
+
+    yield '{'
+    for n, (key, value) in enumerate(data.items()):
+        yield '{}{}: '.format(', ' if n else '', encoder.encode(str(key)))
+        if _is_array(value):
+            yield from _iter_array(value, encoder)
+        else:
+            yield encoder.encode(value)
+    yield '}'
+
+
+def iter_gzip_chunks(data, chunk_size):
+    """
+    Yields the gzip compressed JSON encoding of the data in chunks of
+     chunk_size bytes (the last one may be shorter). The JSON is encoded
+     and compressed as the chunks are consumed.
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    pending = bytearray()
+    batch, batch_size = [], 0
+    for piece in iter_json(data):
+        batch.append(piece)
+        batch_size += len(piece)
+        if batch_size < ENCODE_BATCH:
+            continue
+        pending += compressor.compress(''.join(batch).encode('utf-8'))
+        batch, batch_size = [], 0
+        while len(pending) >= chunk_size:
+            yield bytes(pending[:chunk_size])
+            del pending[:chunk_size]
+
+    pending += compressor.compress(''.join(batch).encode('utf-8'))
+    pending += compressor.flush()
+    while pending:
+        yield bytes(pending[:chunk_size])
+        del pending[:chunk_size]
+
+
+class ChunkedReport(object):
+    """
+    Sends a report in chunks, each request scheduled by the callback of
+     the previous one, so only one chunk is held at a time.
+
+    :param url: notification url
+    :param data: the report
+    :param chunk_size: maximum size of a chunk in bytes
+    :param errback: errback of the requests; a failed chunk ends the report
+    """
+
+    def __init__(self, url, data, chunk_size, errback=None):
+        self.url = url
+        self.job_id = data.get('JobId')
+        self.report_id = '{}-{}'.format(self.job_id, uuid.uuid4().hex)
+        self.chunk_size = chunk_size
+        self.errback = errback
+        self.chunks = iter_gzip_chunks(data, chunk_size)
+        self.sequence = 0
+        self.size = 0
+        self.sha1 = hashlib.sha1()
+
+    def _request(self, body, headers):
+        headers = dict(headers, **{'X-Report-Id': self.report_id})
+        return Request(url=self.url, method='POST', headers=headers, body=body,
+                       callback=self.chunk_sent, errback=self.errback, dont_filter=True,
+                       meta={'dont_proxy': True})
+
+    def next_request(self):
+        """
+        Returns the request of the next chunk, of the commit message after
+         the last chunk, or None after the commit message
+        """
+        if self.chunks is None:
+            return None
+        chunk = next(self.chunks, None)
+        if chunk is not None:
+            self.size += len(chunk)
+            self.sha1.update(chunk)
+            request = self._request(chunk, {'Content-Type': 'application/gzip',
+                                            'X-Report-Sequence': str(self.sequence)})
+            self.sequence += 1
+            return request
+
+        self.chunks = None
+        commit = {
+            'ReportId': self.report_id,
+            'JobId': self.job_id,
+            'Chunks': self.sequence,
+            'Size': self.size,
+            'Sha1': self.sha1.hexdigest(),
+        }
+        logger.info('Committing report %s: %s chunks, %s bytes', self.report_id, self.sequence, self.size)
+        return self._request(json.dumps(commit), {'Content-Type': 'application/json', 'X-Report-Commit': '1'})
+
+    def chunk_sent(self, response):
+        request = self.next_request()
+        if request is not None:
+            return [request]
+        return []
@@ -0,0 +1,75 @@
+"""
+Single pass splitters of definition-style markup: headings followed by
+ their text blocks, and tables of labelled rows.
+
+Both walk the elements once, where an XPath like
+ `p[count(preceding-sibling::h3)=n]` per heading is quadratic in the
+ number of siblings.
+"""
+HEADINGS = tuple('h{}'.format(x) for x in range(1, 7))
+
+
+def _roots(sel):
+    # lxml elements of a parsel Selector or SelectorList
+    if hasattr(sel, 'root'):
+        return [sel.root]
+    return [s.root for s in sel]
+
+
+def _text(element):
+    """
+    Returns the text nodes of the element, stripped and joined by spaces
+    """
+    return ' '.join(text.strip() for text in element.itertext())
+
+
+def split_sections(sel, headings=HEADINGS, blocks=None):
+    """
+    Returns dict (in document order) of the text of every heading among
+     the children of the selected elements to the texts of the children
+     following it, up to the next heading. Children before the first
+     heading and children without text nodes are left out; sections of
+     headings with the same text are merged.
+
+    :param sel: parsel Selector or SelectorList of the container(s)
+    :param headings: tags of the heading elements
+    :param blocks: tags of the block elements (all other elements if None)
+    """
+    sections = {}
+    for root in _roots(sel):
+        heading = None
+        for child in root:
+            tag = child.tag
+            if not isinstance(tag, str):
+                # comments and processing instructions
+                continue
+            if tag in headings:
+                heading = _text(child).strip()
+                sections.setdefault(heading, [])
+            elif heading is not None and (blocks is None or tag in blocks):
+                if next(child.itertext(), None) is not None:
+                    sections[heading].append(_text(child))
+    return sections
+
+
+def split_rows(sel):
+    """
+    Returns dict (in document order) of the header cell (th) text of every
+     table row of the selected elements to the texts of its data cells
+     (td). Rows without a header cell are left out; rows with the same
+     header are merged.
+
+    :param sel: parsel Selector or SelectorList of tables or their containers
+    """
+    rows = {}
+    for root in _roots(sel):
+        for tr in root.iter('tr'):
+            label, cells = None, []
+            for cell in tr:
+                if cell.tag == 'th' and label is None:
+                    label = _text(cell).strip()
+                elif cell.tag == 'td':
+                    cells.append(_text(cell).strip())
+            if label is not None:
+                rows.setdefault(label, []).extend(cells)
+    return rows
@@ -1,6 +1,12 @@
 from typing import List, Optional
+from itertools import compress
+from collections import defaultdict
+from collections.abc import MutableMapping
 from dataclasses import dataclass
 
+# translates the binary digits '0' and '1' to the bytes 0 and 1
+_BITS = bytes.maketrans(b'01', b'\x00\x01')
+
 @dataclass
 class ResourceItem:
     position_info: str
@@ -36,12 +42,120 @@ class ResourceItem:
 
         return {make_field(key): val for key, val in self._asdict().items() if val is not None}
 
+class StoreIndex(object):
+    """
+    Interns the store ids of a crawl to bit positions, in the order they are
+     first seen (the stores of the job first)
+    """
+
+    def __init__(self, stores=()):
+        self.ids = []
+        self.positions = {}
+        for store in stores:
+            self.intern(store)
+
+    def intern(self, store):
+        position = self.positions.get(store)
+        if position is None:
+            position = self.positions[store] = len(self.ids)
+            self.ids.append(store)
+        return position
+
+    def store_set(self, stores=()):
+        return StoreSet(self, stores)
+
+
+class StoreSet(object):
+    """
+    Set of store ids of a StoreIndex, held as a bitset (int). Iterates in
+     index order; append is add, for the code which kept stores in lists.
+
+    observer, if set, is called as observer(store_set, added, removed)
+     with the masks of the stores added and removed by add, update and
+     discard (ResourceRegistry indexes resources by store with it).
+    """
+    __slots__ = ('index', 'mask', 'observer')
+
+    def __init__(self, index, stores=(), mask=0):
+        self.index = index
+        self.mask = mask
+        self.observer = None
+        self.update(stores)
+
+    def _set_mask(self, mask):
+        old, self.mask = self.mask, mask
+        if self.observer is not None and mask != old:
+            self.observer(self, mask & ~old, old & ~mask)
+
+    def add(self, store):
+        self._set_mask(self.mask | 1 << self.index.intern(store))
+
+    append = add
+
+    def update(self, stores):
+        # the binary digits are set in a bytearray, so adding n stores is linear
+        known = self.index.positions
+        positions = [known[store] if store in known else self.index.intern(store) for store in stores]
+        if not positions:
+            return
+        digits = bytearray(b'0') * (max(positions) + 1)
+        for position in positions:
+            digits[position] = 49  # '1'
+        self._set_mask(self.mask | int(digits[::-1], 2))
+
+    def discard(self, store):
+        position = self.index.positions.get(store)
+        if position is not None:
+            self._set_mask(self.mask & ~(1 << position))
+
+    def __contains__(self, store):
+        position = self.index.positions.get(store)
+        return position is not None and bool(self.mask >> position & 1)
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __iter__(self):
+        # the binary digits from the lowest, as bytes 0 and 1
+        bits = bin(self.mask)[:1:-1].encode('ascii').translate(_BITS)
+        return compress(self.index.ids, bits)
+
+    def _other_mask(self, other):
+        if isinstance(other, StoreSet) and other.index is self.index:
+            return other.mask
+        return StoreSet(self.index, other).mask
+
+    def __or__(self, other):
+        return StoreSet(self.index, mask=self.mask | self._other_mask(other))
+
+    def __and__(self, other):
+        return StoreSet(self.index, mask=self.mask & self._other_mask(other))
+
+    def __sub__(self, other):
+        return StoreSet(self.index, mask=self.mask & ~self._other_mask(other))
+
+    def __eq__(self, other):
+        if isinstance(other, StoreSet) and other.index is self.index:
+            return self.mask == other.mask
+        if isinstance(other, (StoreSet, set, frozenset, list, tuple)):
+            return set(self) == set(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'StoreSet({!r})'.format(list(self))
+
+
 @dataclass
 class Resource:
     urls: List[str]
     files: List[str]
     outfile: Optional[str]
-    stores: List[str]
+    stores: StoreSet
     items: List[ResourceItem]
     key: Optional[str]
     type: Optional[str]
@@ -51,8 +165,149 @@ class Resource:
         urls = kw.get('urls', [])
         files = kw.get('files', [])
         outfile = kw.get('outfile')
-        stores = kw.get('stores', [])
+        # resources of a crawl share the StoreIndex of the spider
+        stores = StoreSet(kw.get('store_index') or StoreIndex(), kw.get('stores', []))
         items = kw.get('items', [])
         key = kw.get('key', None)
         type = kw.get('type', None)
         return cls(urls, files, outfile, stores, items, key, type)
+
+
+class ResourceRegistry(MutableMapping):
+    """
+    Resources of a crawl by key, indexed by identity (the keys of a
+     resource), by store and by validity window (start, end) of their
+     keys, with extra report fields of resource keys. Windows and extras
+     may be set before the resource is. clear() releases everything, it
+     is called when the spider closes.
+
+    The store index follows changes of the StoreSets of the resources
+     (see StoreSet.observer); a resource whose stores are replaced by
+     another StoreSet has to be set again.
+    """
+
+    def __init__(self):
+        self._resources = {}
+        # id(resource) -> keys, id(store set) -> keys (dicts keep the order)
+        self._keys = {}
+        self._store_set_keys = {}
+        # store -> keys of the resources of the store
+        self._store_keys = defaultdict(dict)
+        # key -> (start, end), (start, end) -> keys
+        self._windows = {}
+        self._window_keys = defaultdict(dict)
+        # key -> dict of fields added to the report of the resource
+        self.extras = {}
+
+    def __getitem__(self, key):
+        return self._resources[key]
+
+    def __setitem__(self, key, resource):
+        if key in self._resources:
+            self._unregister(key)
+        self._resources[key] = resource
+        self._keys.setdefault(id(resource), {})[key] = None
+        stores = resource.stores
+        self._store_set_keys.setdefault(id(stores), {})[key] = None
+        if isinstance(stores, StoreSet):
+            stores.observer = self._stores_changed
+        for store in stores:
+            self._store_keys[store][key] = None
+
+    def _unregister(self, key):
+        resource = self._resources.pop(key)
+        for index, obj in ((self._keys, resource), (self._store_set_keys, resource.stores)):
+            keys = index[id(obj)]
+            del keys[key]
+            if not keys:
+                del index[id(obj)]
+        if id(resource.stores) not in self._store_set_keys and isinstance(resource.stores, StoreSet):
+            resource.stores.observer = None
+        for store in resource.stores:
+            self._discard_store_key(store, key)
+
+    def _discard_store_key(self, store, key):
+        keys = self._store_keys.get(store)
+        if keys is not None:
+            keys.pop(key, None)
+            if not keys:
+                del self._store_keys[store]
+
+    def _stores_changed(self, stores, added, removed):
+        keys = self._store_set_keys.get(id(stores), ())
+        for store in StoreSet(stores.index, mask=added):
+            for key in keys:
+                self._store_keys[store][key] = None
+        for store in StoreSet(stores.index, mask=removed):
+            for key in keys:
+                self._discard_store_key(store, key)
+
+    def __delitem__(self, key):
+        self._unregister(key)
+        self.extras.pop(key, None)
+        window = self._windows.pop(key, None)
+        if window is not None:
+            self._discard_window_key(window, key)
+
+    def __iter__(self):
+        return iter(self._resources)
+
+    def __len__(self):
+        return len(self._resources)
+
+    def clear(self):
+        for resource in self._resources.values():
+            if isinstance(resource.stores, StoreSet):
+                resource.stores.observer = None
+        self._resources.clear()
+        self._keys.clear()
+        self._store_set_keys.clear()
+        self._store_keys.clear()
+        self._windows.clear()
+        self._window_keys.clear()
+        self.extras.clear()
+
+    def key_of(self, resource):
+        """
+        Returns the (first) key of the resource, or None if it is not
+         registered
+        """
+        keys = self._keys.get(id(resource))
+        return next(iter(keys)) if keys else None
+
+    def keys_of(self, resource):
+        """
+        Returns the keys the resource is registered under
+        """
+        return list(self._keys.get(id(resource), ()))
+
+    def keys_of_store(self, store):
+        """
+        Returns the keys of the resources of the store
+        """
+        return list(self._store_keys.get(store, ()))
+
+    def _discard_window_key(self, window, key):
+        keys = self._window_keys[window]
+        del keys[key]
+        if not keys:
+            del self._window_keys[window]
+
+    def set_valid_between(self, key, start, end):
+        window = self._windows.get(key)
+        if window is not None:
+            self._discard_window_key(window, key)
+        window = self._windows[key] = (start, end)
+        self._window_keys[window][key] = None
+
+    def valid_between(self, key):
+        """
+        Returns (start, end) of the key, or None if it has no window
+        """
+        return self._windows.get(key)
+
+    def keys_valid_between(self, start, end):
+        """
+        Returns the keys whose validity window is (start, end)
+        """
+        return list(self._window_keys.get((start, end), ()))
@@ -1,11 +1,19 @@
 from lxml import etree
-from scrapy.utils.misc import arg_to_iter
 
 _XPATH_FUNCS = {}
-_HASCLASS_EXPR = 'contains(concat(" ", @class, " "), " {} ")'
 _HEADINGS = ['h{}'.format(x) for x in range(1, 7)]
 
 
+def arg_to_iter(arg):
+    # same as scrapy.utils.misc.arg_to_iter for the values lxml passes,
+    # without importing scrapy along with the adboox package
+    if arg is None:
+        return []
+    if isinstance(arg, (list, tuple)):
+        return arg
+    return [arg]
+
+
 def register(func):
     fname = func.__name__.replace('_', '-')
     _XPATH_FUNCS[fname] = func
@@ -18,28 +26,43 @@ def setup():
         fns[name] = func
 
 
+def _string_value(s):
+    # elements of node-sets by their string value, as XPath compares them
+    return s if isinstance(s, str) else ''.join(s.itertext())
+
+
 @register
 def lower_case(context, s):
     """Native lowercase function."""
     sl = arg_to_iter(s)
-    return [s.lower() for s in sl]
+    return [_string_value(s).lower() for s in sl]
 
 
 @register
 def upper_case(context, s):
     """Native uppercase function."""
     sl = arg_to_iter(s)
-    return [s.upper() for s in sl]
+    return [_string_value(s).upper() for s in sl]
 
 
 @register
 def has_class(context, *classes):
-    """has-class function."""
-    expr = ' and '.join([_HASCLASS_EXPR.format(cls) for cls in classes])
-    xpath = 'self::*[%s]' % expr
-    return bool(context.context_node.xpath(xpath))
+    """
+    has-class function. Same as contains(concat(" ", @class, " "), " cls ")
+     for every class, but reads the class attribute of the node directly.
+    """
+    node = context.context_node
+    if not isinstance(node.tag, str):
+        # comments and processing instructions
+        return False
+    padded = ' {} '.format(node.get('class') or '')
+    for cls in classes:
+        if ' {} '.format(cls) not in padded:
+            return False
+    return True
 
 
 @register
 def is_heading(context):
     return context.context_node.tag in _HEADINGS
+
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import pytest
+from adboox.utils.calendar import opening_days, parse_opening_hours
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+
+def hours(days, open_, close):
+    return {day: {'Open': open_, 'Close': close} for day in days}
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Lidl: OpeningTimes of the store finder
+    ('Mo 08:00-21:00 Di 08:00-21:00 Mi 08:00-21:00 Do 08:00-21:00 Fr 08:00-21:00 Sa 08:00-20:00',
+     dict(hours(WEEKDAYS, '08:00', '21:00'), **hours(['Saturday'], '08:00', '20:00'))),
+    # Penny: openingTime of the market search
+    ('Mo - Sa: 07:00 - 22:00', hours(WEEKDAYS + ['Saturday'], '07:00', '22:00')),
+    ('Montag - Samstag: 7:00 -20:00', hours(WEEKDAYS + ['Saturday'], '7:00', '20:00')),
+    # Netto: store_opening
+    ('Mo.-Sa.: 7.00 - 21.00', hours(WEEKDAYS + ['Saturday'], '7.00', '21.00')),
+    # Rewe: days and hours of every opening
+    ('Mo - Sa 07:00 - 22:00 Uhr', hours(WEEKDAYS + ['Saturday'], '07:00', '22:00')),
+    ('So 10:00 - 18:00 Uhr', hours(['Sunday'], '10:00', '18:00')),
+    # Norma: rows of the shopHours table
+    ('Montag - Freitag 08:00 - 20:00', hours(WEEKDAYS, '08:00', '20:00')),
+    ('Samstag 08:00 - 18:00', hours(['Saturday'], '08:00', '18:00')),
+    # Hit: day and hours of the detail page
+    ('Donnerstag 07:00 - 21:00', hours(['Thursday'], '07:00', '21:00')),
+    # K+K: work hours of the store list
+    ('Mo - Sa 7-20', hours(WEEKDAYS + ['Saturday'], '7', '20')),
+    ('Mo - Fr 7:00 - 20:00', hours(WEEKDAYS, '7:00', '20:00')),
+])
+def test_spider_formats(text, expected):
+    assert opening_days(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Mo, Mi & Fr 8-12', hours(['Monday', 'Wednesday', 'Friday'], '8', '12')),
+    ('Montag bis Donnerstag 9-18', hours(WEEKDAYS[:4], '9', '18')),
+    ('Fr - Mo 10-14', hours(['Friday', 'Saturday', 'Sunday', 'Monday'], '10', '14')),
+    ('Mon - Sun 9-17', hours(WEEKDAYS + ['Saturday', 'Sunday'], '9', '17')),
+    ('Mo - Sa 8-20, So geschlossen', hours(WEEKDAYS + ['Saturday'], '8', '20')),
+    ('Mo - Do 8-20, Fr 8-22', dict(hours(WEEKDAYS[:4], '8', '20'), **hours(['Friday'], '8', '22'))),
+    ('Do. 8-12', hours(['Thursday'], '8', '12')),
+    ('Sat 9-14', hours(['Saturday'], '9', '14')),
+])
+def test_day_lists_and_ranges(text, expected):
+    assert opening_days(text) == expected
+
+
+def test_words_are_not_days():
+    assert opening_days('Mo - Fr 7:00 - 20:00, Sa mit Bäckerei 6:00 - 14:00') == dict(
+        hours(WEEKDAYS, '7:00', '20:00'), **hours(['Saturday'], '6:00', '14:00'))
+    assert opening_days('Sa 7-14, die Bäckerei Mo-Fr 06:00-18:00') == dict(
+        hours(['Saturday'], '7', '14'), **hours(WEEKDAYS, '06:00', '18:00'))
+    assert opening_days('So weit wie möglich: Mo-Fr 8-18') == hours(WEEKDAYS, '8', '18')
+    assert opening_days('we do open Mo-Fr 8-18') == hours(WEEKDAYS, '8', '18')
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('Mo-Fr 08:00-12:30 und 14:00-18:00', hours(WEEKDAYS, '08:00', '18:00')),
+    ('Mo-Fr 8-12, 14-18 Uhr, Sa 8-13', dict(hours(WEEKDAYS, '8', '18'), **hours(['Saturday'], '8', '13'))),
+    ('Mi 9-12 / 13-15 / 16-18', hours(['Wednesday'], '9', '18')),
+    ('So geschlossen 10-12', {}),
+])
+def test_split_shifts(text, expected):
+    assert opening_days(text) == expected
+
+
+def test_later_hours_replace_earlier_ones():
+    assert parse_opening_hours('Mo 8-12 Mo 14-18') == (('Monday', '8', '12'), ('Monday', '14', '18'))
+    assert opening_days('Mo 8-12 Mo 14-18') == hours(['Monday'], '14', '18')
+
+
+def test_unparseable():
+    assert opening_days('') == {}
+    assert opening_days('nach Vereinbarung') == {}
@@ -0,0 +1,103 @@
+from adboox.utils.types import Resource, ResourceRegistry, StoreIndex, StoreSet
+
+
+def make_resource(index, stores=()):
+    return Resource.from_kw(store_index=index, stores=list(stores))
+
+
+def test_store_set():
+    index = StoreIndex(['a', 'b'])
+    stores = StoreSet(index, ['c', 'a', 'a'])
+    assert len(stores) == 2
+    assert list(stores) == ['a', 'c']
+    stores.discard('a')
+    assert 'a' not in stores and 'c' in stores
+    assert len(StoreSet(index)) == 0
+
+
+def test_resource_under_two_keys():
+    index = StoreIndex()
+    registry = ResourceRegistry()
+    resource = make_resource(index, ['s1'])
+    registry['k1'] = resource
+    registry['k2'] = resource
+    assert registry.key_of(resource) == 'k1'
+    assert registry.keys_of(resource) == ['k1', 'k2']
+    assert registry.keys_of_store('s1') == ['k1', 'k2']
+
+    del registry['k1']
+    assert registry.key_of(resource) == 'k2'
+    assert registry.keys_of_store('s1') == ['k2']
+    resource.stores.append('s2')
+    assert registry.keys_of_store('s2') == ['k2']
+
+    del registry['k2']
+    assert registry.key_of(resource) is None
+    assert registry.keys_of_store('s1') == []
+    assert len(registry) == 0
+
+
+def test_replaced_resource():
+    index = StoreIndex()
+    registry = ResourceRegistry()
+    old, new = make_resource(index, ['s1']), make_resource(index, ['s2'])
+    registry['k'] = old
+    registry['k'] = new
+    assert registry.key_of(old) is None
+    assert registry.key_of(new) == 'k'
+    assert registry.keys_of_store('s1') == []
+    assert registry.keys_of_store('s2') == ['k']
+    # the replaced resource is not indexed any more
+    old.stores.append('s3')
+    assert registry.keys_of_store('s3') == []
+
+
+def test_store_index_follows_store_sets():
+    index = StoreIndex()
+    registry = ResourceRegistry()
+    a, b = make_resource(index), make_resource(index, ['s1'])
+    registry['a'] = a
+    registry['b'] = b
+    a.stores.append('s1')
+    a.stores.update(['s2', 's3'])
+    b.stores.update(['s3'])
+    assert registry.keys_of_store('s1') == ['b', 'a']
+    assert registry.keys_of_store('s2') == ['a']
+    assert registry.keys_of_store('s3') == ['a', 'b']
+    a.stores.discard('s3')
+    assert registry.keys_of_store('s3') == ['b']
+    assert registry.keys_of_store('unknown') == []
+
+
+def test_valid_between():
+    index = StoreIndex()
+    registry = ResourceRegistry()
+    registry.set_valid_between('a', '01-01-2026', '07-01-2026')
+    registry.set_valid_between('b', '01-01-2026', '07-01-2026')
+    registry['a'] = make_resource(index)
+    registry['b'] = make_resource(index)
+    assert registry.valid_between('a') == ('01-01-2026', '07-01-2026')
+    assert registry.keys_valid_between('01-01-2026', '07-01-2026') == ['a', 'b']
+
+    registry.set_valid_between('a', '08-01-2026', '14-01-2026')
+    assert registry.keys_valid_between('01-01-2026', '07-01-2026') == ['b']
+    assert registry.keys_valid_between('08-01-2026', '14-01-2026') == ['a']
+
+    del registry['b']
+    assert registry.valid_between('b') is None
+    assert registry.keys_valid_between('01-01-2026', '07-01-2026') == []
+
+
+def test_clear():
+    index = StoreIndex()
+    registry = ResourceRegistry()
+    resource = make_resource(index, ['s1'])
+    registry['k'] = resource
+    registry.set_valid_between('k', 'start', 'end')
+    registry.extras['k'] = {'Title': 'Flyer'}
+    registry.clear()
+    assert len(registry) == 0 and not registry.extras
+    assert registry.key_of(resource) is None
+    assert registry.keys_of_store('s1') == []
+    assert registry.keys_valid_between('start', 'end') == []
+    assert resource.stores.observer is None